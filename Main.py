@@ -1,8 +1,12 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
 from Utilities import ToolBox, YTPSettings
 from YTPGenerator import YTPGenerator
+from ytpplus.Cancellation import JobCancelled
+from ytpplus.EffectRegistry import effect_index
 
 
 class YTPDeluxeApp(tk.Tk):
@@ -18,6 +22,10 @@ class YTPDeluxeApp(tk.Tk):
         self.image_sources = []
         self.audio_sources = []
         self.url_sources = []
+        self.events = queue.SimpleQueue()
+        self.worker = None
+        self.generator = None
+        self.worker_error = None
 
         self._build_ui()
         self.tool_box.ensure_project_structure()
@@ -126,6 +134,12 @@ class YTPDeluxeApp(tk.Tk):
             row=1, column=1, sticky="w", padx=6
         )
 
+        ttk.Label(probabilities_frame, text="Max Effect Cost per Clip (0 = no limit)").grid(row=2, column=0, sticky="w")
+        self.max_effect_cost = tk.DoubleVar(value=self.settings.max_effect_cost)
+        ttk.Spinbox(
+            probabilities_frame, from_=0, to=20, increment=0.5, textvariable=self.max_effect_cost, width=6
+        ).grid(row=2, column=1, sticky="w", padx=6)
+
     def _build_output_tab(self):
         output_frame = ttk.LabelFrame(self.output_tab, text="Output Settings", padding=8)
         output_frame.pack(fill="x", pady=4)
@@ -158,6 +172,8 @@ class YTPDeluxeApp(tk.Tk):
 
         self.progress = ttk.Progressbar(self.output_tab, mode="determinate")
         self.progress.pack(fill="x", pady=6)
+        self.status = tk.StringVar(value="Idle")
+        ttk.Label(self.output_tab, textvariable=self.status).pack(fill="x")
 
         action_frame = ttk.Frame(self.output_tab)
         action_frame.pack(fill="x", pady=4)
@@ -165,19 +181,21 @@ class YTPDeluxeApp(tk.Tk):
         ttk.Button(action_frame, text="Preview (FFplay)", command=self._preview).pack(
             side="left", padx=4
         )
-        ttk.Button(action_frame, text="Generate YTP", command=self._generate).pack(
-            side="right", padx=4
-        )
+        self.cancel_button = ttk.Button(action_frame, text="Cancel", command=self._cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=4)
+        self.generate_buttons = []
+        self.generate_buttons.append(ttk.Button(action_frame, text="Generate YTP", command=self._generate))
+        self.generate_buttons[-1].pack(side="right", padx=4)
 
         mode_frame = ttk.Frame(self.output_tab)
         mode_frame.pack(fill="x", pady=4)
 
-        ttk.Button(mode_frame, text="Generate YTP+", command=self._generate_plus).pack(
-            side="left", padx=4
-        )
-        ttk.Button(mode_frame, text="Generate Chaos Small Export", command=self._generate_chaos).pack(
-            side="right", padx=4
+        self.generate_buttons.append(ttk.Button(mode_frame, text="Generate YTP+", command=self._generate_plus))
+        self.generate_buttons[-1].pack(side="left", padx=4)
+        self.generate_buttons.append(
+            ttk.Button(mode_frame, text="Generate Chaos Small Export", command=self._generate_chaos)
         )
+        self.generate_buttons[-1].pack(side="right", padx=4)
 
     def _build_advanced_tab(self):
         advanced_frame = ttk.LabelFrame(self.advanced_tab, text="Advanced Options", padding=8)
@@ -214,6 +232,106 @@ class YTPDeluxeApp(tk.Tk):
         self.preset_label.insert(0, self.settings.ytp_effects_name)
         self.preset_label.grid(row=4, column=1, sticky="w", padx=4)
 
+        self.timeline_render = tk.BooleanVar(value=self.settings.render_mode == "timeline")
+        ttk.Checkbutton(
+            advanced_frame,
+            text="Single-Process Timeline Render (one ffmpeg per chunk of clips)",
+            variable=self.timeline_render,
+        ).grid(row=5, column=0, sticky="w", pady=2)
+
+        self.streaming_concat = tk.BooleanVar(value=self.settings.streaming_concat)
+        ttk.Checkbutton(
+            advanced_frame,
+            text="Streaming Concat (mux clips in order as they finish)",
+            variable=self.streaming_concat,
+        ).grid(row=8, column=0, sticky="w", pady=2)
+
+        self.normalize_sources = tk.BooleanVar(value=self.settings.normalize_sources)
+        ttk.Checkbutton(
+            advanced_frame,
+            text="Normalize Sources (cached uniform mezzanine for frame-accurate cuts)",
+            variable=self.normalize_sources,
+        ).grid(row=9, column=0, sticky="w", pady=2)
+
+        ttk.Label(advanced_frame, text="CPU Core Budget (0 = all cores)").grid(row=6, column=0, sticky="w", pady=2)
+        self.cpu_budget = tk.IntVar(value=self.settings.cpu_budget)
+        ttk.Spinbox(advanced_frame, from_=0, to=256, textvariable=self.cpu_budget, width=8).grid(
+            row=6, column=1, sticky="w", padx=4
+        )
+
+        ttk.Label(advanced_frame, text="Threads per FFmpeg Process (0 = auto)").grid(
+            row=7, column=0, sticky="w", pady=2
+        )
+        self.threads_per_process = tk.IntVar(value=self.settings.threads_per_process)
+        ttk.Spinbox(advanced_frame, from_=0, to=64, textvariable=self.threads_per_process, width=8).grid(
+            row=7, column=1, sticky="w", padx=4
+        )
+
+        ttk.Label(advanced_frame, text="Failed Clips Allowed Before Abort").grid(row=10, column=0, sticky="w", pady=2)
+        self.max_failed_clips = tk.IntVar(value=self.settings.max_failed_clips)
+        ttk.Spinbox(advanced_frame, from_=0, to=70000, textvariable=self.max_failed_clips, width=8).grid(
+            row=10, column=1, sticky="w", padx=4
+        )
+
+        ttk.Label(advanced_frame, text="Seed (0 = random)").grid(row=11, column=0, sticky="w", pady=2)
+        self.seed = tk.IntVar(value=self.settings.seed)
+        ttk.Entry(advanced_frame, textvariable=self.seed, width=12).grid(row=11, column=1, sticky="w", padx=4)
+
+        self.clip_cache = tk.BooleanVar(value=self.settings.clip_cache)
+        ttk.Checkbutton(
+            advanced_frame,
+            text="Clip Cache (reuse rendered clips with the same source, cut and effects)",
+            variable=self.clip_cache,
+        ).grid(row=12, column=0, sticky="w", pady=2)
+
+        ttk.Label(advanced_frame, text="Scratch Folder (e.g. /dev/shm, blank = temp/)").grid(
+            row=13, column=0, sticky="w", pady=2
+        )
+        self.scratch_dir = ttk.Entry(advanced_frame)
+        self.scratch_dir.insert(0, self.settings.scratch_dir)
+        self.scratch_dir.grid(row=13, column=1, sticky="w", padx=4)
+
+        ttk.Label(advanced_frame, text="Scratch Budget MB (0 = unlimited)").grid(row=14, column=0, sticky="w", pady=2)
+        self.scratch_budget = tk.IntVar(value=self.settings.scratch_budget_mb)
+        ttk.Spinbox(advanced_frame, from_=0, to=1048576, textvariable=self.scratch_budget, width=8).grid(
+            row=14, column=1, sticky="w", padx=4
+        )
+
+        self.pyav_backend = tk.BooleanVar(value=self.settings.media_backend == "pyav")
+        ttk.Checkbutton(
+            advanced_frame,
+            text="In-Process Media Backend (PyAV, falls back to FFmpeg)",
+            variable=self.pyav_backend,
+        ).grid(row=15, column=0, sticky="w", pady=2)
+
+        self.numpy_audio = tk.BooleanVar(value=self.settings.audio_engine == "numpy")
+        ttk.Checkbutton(
+            advanced_frame,
+            text="NumPy Audio Effects (copies video, falls back to FFmpeg)",
+            variable=self.numpy_audio,
+        ).grid(row=16, column=0, sticky="w", pady=2)
+
+        self.overlay_cache = tk.BooleanVar(value=self.settings.overlay_cache)
+        ttk.Checkbutton(
+            advanced_frame,
+            text="Cache Pre-Scaled Overlays (temp/overlay_cache)",
+            variable=self.overlay_cache,
+        ).grid(row=17, column=0, sticky="w", pady=2)
+
+        self.scene_cuts = tk.BooleanVar(value=self.settings.scene_cuts)
+        ttk.Checkbutton(
+            advanced_frame,
+            text="Start Clips On Scene Cuts (temp/scenes)",
+            variable=self.scene_cuts,
+        ).grid(row=18, column=0, sticky="w", pady=2)
+
+        self.draft = tk.BooleanVar(value=self.settings.draft)
+        ttk.Checkbutton(
+            advanced_frame,
+            text="Draft Preview (small proxies, fastest encoder, same cuts as the full render)",
+            variable=self.draft,
+        ).grid(row=19, column=0, sticky="w", pady=2)
+
     def _add_videos(self):
         files = filedialog.askopenfilenames(
             title="Select Video Files",
@@ -285,6 +403,8 @@ class YTPDeluxeApp(tk.Tk):
         self._generate_with_mode(force_chaos=True)
 
     def _generate_with_mode(self, effect_probability=None, max_stack_level=None, force_chaos=False):
+        if self.worker is not None and self.worker.is_alive():
+            return
         if not self.sources:
             messagebox.showwarning("No Sources", "Please add at least one source video.")
             return
@@ -301,36 +421,75 @@ class YTPDeluxeApp(tk.Tk):
             self.max_stack.set(int(max_stack_level))
 
         effects = list(self.settings.effects_enabled)
-        if force_chaos and len(effects) > 29:
+        chaos = effect_index("effect_chaos_small_export")
+        if force_chaos and len(effects) > chaos:
             effects = [False] * len(effects)
-            effects[29] = True
-
-        generator = YTPGenerator(
-            util=self.tool_box,
-            output=output_file,
-            min_dur=self.settings.min_clip_duration,
-            max_dur=self.settings.max_clip_duration,
-            max_clips=self.settings.max_clips,
-            insert_transition_clips=self.settings.insert_transition_clips,
-            transition_probability=self.settings.transition_probability,
-            effect_probability=self.settings.effect_probability,
-            allow_effect_stacking=self.settings.allow_effect_stacking,
-            max_stack_level=self.settings.max_stack_level,
-            effects=effects,
-        )
+            effects[chaos] = True
+
+        self.tool_box.configure(self.settings)
+        generator = YTPGenerator.from_settings(self.tool_box, output_file, self.settings, effects=effects)
         for source in self.sources:
             generator.add_source(source)
 
         self.progress["value"] = 0
+        self.status.set("Starting...")
+        self.worker_error = None
+        self.generator = generator
+        for button in self.generate_buttons:
+            button.state(["disabled"])
+        self.cancel_button.state(["!disabled"])
+        self.worker = threading.Thread(target=self._run_generator, args=(generator,), name="ytp-generate", daemon=True)
+        self.worker.start()
+        self.after(100, self._poll_events)
+
+    def _cancel(self):
+        if self.generator is not None and self.worker is not None and self.worker.is_alive():
+            self.status.set("Cancelling...")
+            self.cancel_button.state(["disabled"])
+            self.generator.cancel()
+
+    def _run_generator(self, generator):
         try:
-            generator.go(progress_callback=self._update_progress)
-            messagebox.showinfo("YTP Deluxe", "Generation complete.")
+            generator.go(event_callback=self.events.put)
         except Exception as exc:
-            messagebox.showerror("YTP Deluxe", f"Generation failed: {exc}")
+            self.worker_error = exc
+
+    def _poll_events(self):
+        event = None
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+        if event is not None:
+            self._show_progress(event)
+
+        if self.worker.is_alive():
+            self.after(100, self._poll_events)
+            return
 
-    def _update_progress(self, value):
-        self.progress["value"] = value
-        self.update_idletasks()
+        for button in self.generate_buttons:
+            button.state(["!disabled"])
+        self.cancel_button.state(["disabled"])
+        self.generator = None
+        if isinstance(self.worker_error, JobCancelled):
+            self.status.set("Cancelled")
+        elif self.worker_error is not None:
+            self.status.set(f"Failed: {self.worker_error}")
+            messagebox.showerror("YTP Deluxe", f"Generation failed: {self.worker_error}")
+        else:
+            self.progress["value"] = 100
+            messagebox.showinfo("YTP Deluxe", "Generation complete.")
+
+    def _show_progress(self, event):
+        self.progress["value"] = event.percent
+        status = (
+            f"{event.stage.capitalize()}: {event.clips_done}/{event.clips_total} clips, "
+            f"{event.clips_per_second:.2f} clips/s, elapsed {event.elapsed:.0f}s"
+        )
+        if event.eta is not None:
+            status += f", ETA {event.eta:.0f}s"
+        self.status.set(status)
 
     def _sync_settings(self):
         self.settings.min_clip_duration = float(self.min_duration.get())
@@ -338,11 +497,27 @@ class YTPDeluxeApp(tk.Tk):
         self.settings.max_clips = int(self.clip_count.get())
         self.settings.effect_probability = int(self.effect_probability.get())
         self.settings.max_stack_level = int(self.max_stack.get())
+        self.settings.max_effect_cost = float(self.max_effect_cost.get())
         self.settings.insert_transition_clips = self.insert_transition.get()
         self.settings.allow_effect_stacking = self.allow_stacking.get()
         self.settings.transition_probability = int(self.transition_probability.get())
         self.settings.preserve_original_audio = self.preserve_audio.get()
         self.settings.ytp_effects_name = self.preset_label.get().strip() or "Default"
+        self.settings.render_mode = "timeline" if self.timeline_render.get() else "clips"
+        self.settings.streaming_concat = self.streaming_concat.get()
+        self.settings.normalize_sources = self.normalize_sources.get()
+        self.settings.cpu_budget = int(self.cpu_budget.get())
+        self.settings.threads_per_process = int(self.threads_per_process.get())
+        self.settings.max_failed_clips = int(self.max_failed_clips.get())
+        self.settings.seed = int(self.seed.get())
+        self.settings.clip_cache = self.clip_cache.get()
+        self.settings.scratch_dir = self.scratch_dir.get().strip()
+        self.settings.scratch_budget_mb = int(self.scratch_budget.get())
+        self.settings.media_backend = "pyav" if self.pyav_backend.get() else "subprocess"
+        self.settings.audio_engine = "numpy" if self.numpy_audio.get() else "ffmpeg"
+        self.settings.overlay_cache = self.overlay_cache.get()
+        self.settings.scene_cuts = self.scene_cuts.get()
+        self.settings.draft = self.draft.get()
         self.settings.effects_enabled = [var.get() for var in self.effect_vars]
 
 
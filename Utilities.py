@@ -1,10 +1,40 @@
+import copy
+import json
 import os
 import shutil
 import subprocess
+import threading
 import uuid
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field, fields
 from pathlib import Path
 
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+from ytpplus.AssetCatalog import AssetCatalog
+from ytpplus.Cancellation import CancelToken
+from ytpplus.EffectRegistry import EFFECTS, effect_names
+from ytpplus.KeyframeIndex import KeyframeIndex
+from ytpplus.MediaBackend import SubprocessBackend, create_backend
+from ytpplus.MezzanineCache import DRAFT_CRF, DRAFT_PRESET, MezzanineCache, MezzanineProfile
+from ytpplus.OverlayCache import OverlayCache
+from ytpplus.ProbeCache import ProbeCache
+from ytpplus.SceneIndex import SceneIndex
+from ytpplus.Scheduler import FFmpegScheduler
+from ytpplus.Scratch import ScratchBudget, ScratchSpace
+from ytpplus.Tracer import Tracer
+
+VIDEO_OUTPUTS = (".mp4", ".mkv", ".mov", ".avi")
+# The values each string-valued mode setting accepts.
+SETTING_CHOICES = {
+    "render_mode": ("clips", "timeline", "farm"),
+    "keyframe_mode": ("off", "snap", "smart"),
+    "media_backend": ("subprocess", "pyav"),
+    "audio_engine": ("ffmpeg", "numpy"),
+}
+
 
 @dataclass
 class YTPSettings:
@@ -16,43 +46,70 @@ class YTPSettings:
     effect_probability: int = 30
     allow_effect_stacking: bool = True
     max_stack_level: int = 3
+    max_effect_cost: float = 0.0
     preserve_original_audio: bool = True
     ytp_effects_name: str = "Default"
-    effects_enabled: list[bool] = field(default_factory=lambda: [True] * 30)
+    fuse_effects: bool = True
+    render_mode: str = "clips"
+    timeline_chunk_clips: int = 64
+    streaming_concat: bool = False
+    normalize_sources: bool = False
+    mezzanine_width: int = 1280
+    mezzanine_height: int = 720
+    mezzanine_fps: int = 30
+    mezzanine_gop: int = 1
+    draft: bool = False
+    draft_width: int = 640
+    draft_height: int = 360
+    draft_fps: int = 15
+    keyframe_mode: str = "off"
+    scene_cuts: bool = False
+    scene_threshold: float = 10.0
+    trace_file: str = ""
+    scratch_dir: str = ""
+    scratch_budget_mb: int = 0
+    media_backend: str = "subprocess"
+    audio_engine: str = "ffmpeg"
+    overlay_cache: bool = True
+    farm_address: str = "127.0.0.1:7878"
+    farm_secret: str = ""
+    farm_task_timeout: float = 60.0
+    farm_local_workers: int = 0
+    max_failed_clips: int = 0
+    seed: int = 0
+    clip_cache: bool = False
+    clip_cache_mb: int = 2048
+    cpu_budget: int = 0
+    threads_per_process: int = 0
+    effects_enabled: list[bool] = field(default_factory=lambda: [True] * len(EFFECTS))
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {item.name for item in fields(cls)}
+        unknown = sorted(set(data) - known)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(unknown)}")
+        for name, choices in SETTING_CHOICES.items():
+            if name in data and data[name] not in choices:
+                raise ValueError(f"Invalid {name} {data[name]!r}, expected one of: {', '.join(choices)}")
+        return cls(**data)
+
+    @classmethod
+    def from_file(cls, path):
+        path = Path(path)
+        if path.suffix.lower() == ".toml":
+            if tomllib is None:
+                raise RuntimeError("TOML settings need Python 3.11+ (tomllib)")
+            with open(path, "rb") as file_handle:
+                return cls.from_dict(tomllib.load(file_handle))
+        with open(path, encoding="utf-8") as file_handle:
+            return cls.from_dict(json.load(file_handle))
+
+    def to_dict(self):
+        return asdict(self)
 
     def effect_names(self):
-        return [
-            "Random Sound",
-            "Random Sound (Mute OG)",
-            "Reverse Clip",
-            "Speed Up",
-            "Slow Down",
-            "Chorus Effect",
-            "Vibrato / Pitch Bend",
-            "High Pitch",
-            "Low Pitch",
-            "Dance Mode",
-            "Squidward Mode",
-            "Invert Colors",
-            "Rainbow Overlay",
-            "Flip / Mirror",
-            "Mirror Mode",
-            "Sus Effect",
-            "Stutter Loop",
-            "Loop Frames",
-            "Shuffle Frames",
-            "Audio Crust",
-            "Image Overlay (resources/images)",
-            "Meme Overlay (resources/memes)",
-            "Meme Sound (resources/meme_sounds)",
-            "Resource Sound Mix (resources/sounds)",
-            "Overlay Video (resources/overlay_videos)",
-            "Advert Overlay (resources/adverts)",
-            "Error/Glitch Overlay (resources/errors)",
-            "Spadinner Overlay (resources/spadinner)",
-            "Spadinner Sound (resources/spadinner_sounds)",
-            "YTP Generated Chaos (small export)",
-        ]
+        return effect_names()
 
 
 class ToolBox:
@@ -66,6 +123,22 @@ class ToolBox:
         self.music_dir = self.base_dir / "music"
         self.resources_dir = self.base_dir / "resources"
         self.output_dir = self.base_dir / "output"
+        self.tracer = Tracer()
+        self.cancel_token = CancelToken()
+        self.probe_cache = ProbeCache(self.temp_root / "probe_cache.json", tracer=self.tracer)
+        self.asset_catalog = AssetCatalog(self.probe_cache)
+        self.scheduler = FFmpegScheduler(temp_dir=self.temp_root)
+        self.scratch = ScratchSpace()
+        self.backend = SubprocessBackend(self)
+        self.keyframes = KeyframeIndex(self.temp_root / "keyframes")
+        self.scenes = SceneIndex(self.temp_root / "scenes")
+        self.overlay_cache = OverlayCache(self.temp_root / "overlay_cache")
+        self.use_overlay_cache = True
+        self.overlay_target = None
+        self.draft = False
+        self.mezzanines = {}
+        self.scratch_budgets = {}
+        self.shared_lock = threading.Lock()
 
         self.resource_subfolders = [
             "images",
@@ -79,6 +152,57 @@ class ToolBox:
             "spadinner_sounds",
         ]
 
+    def configure(self, settings):
+        self.scheduler.configure(settings.cpu_budget, settings.threads_per_process)
+        self.configure_job(settings)
+
+    def configure_job(self, settings):
+        self.scratch.configure(self.scratch_budget(settings.scratch_dir or None, settings.scratch_budget_mb * 1024**2))
+        if settings.media_backend != self.backend.name:
+            self.backend.close()
+            self.backend = create_backend(settings.media_backend, self)
+            self.probe_cache.prober = self.backend.probe
+        self.draft = settings.draft
+        self.overlay_target = None
+        if settings.draft:
+            self.overlay_target = (settings.draft_width, settings.draft_height)
+        elif settings.normalize_sources:
+            self.overlay_target = (settings.mezzanine_width, settings.mezzanine_height)
+        self.use_overlay_cache = settings.overlay_cache
+
+    def fork(self):
+        """A ToolBox for a job running next to this one's.
+
+        The fork has its own job folder, scratch space, cancel token, tracer
+        and media backend, and shares the probe cache, asset catalog,
+        keyframe and scene indexes, overlay cache, mezzanines, the scratch
+        budget and the ffmpeg scheduler.
+        """
+        tool_box = copy.copy(self)
+        tool_box.job_dir = None
+        tool_box.job_id = None
+        tool_box.tracer = Tracer()
+        tool_box.cancel_token = CancelToken()
+        tool_box.scratch = ScratchSpace(self.scratch.budget)
+        tool_box.backend = SubprocessBackend(tool_box)
+        return tool_box
+
+    def scratch_budget(self, root, limit):
+        """The ScratchBudget shared by every fork that places files on ``root`` with this limit."""
+        with self.shared_lock:
+            budget = self.scratch_budgets.get((root, limit))
+            if budget is None:
+                budget = self.scratch_budgets[(root, limit)] = ScratchBudget(root, limit)
+        return budget
+
+    def mezzanine_cache(self, profile=None):
+        profile = profile or MezzanineProfile()
+        with self.shared_lock:
+            cache = self.mezzanines.get(profile.tag())
+            if cache is None:
+                cache = self.mezzanines[profile.tag()] = MezzanineCache(self.temp_root / "mezzanine", profile)
+        return cache
+
     def ensure_project_structure(self):
         for folder in [
             self.sources_dir,
@@ -98,10 +222,14 @@ class ToolBox:
             if not path.exists():
                 path.touch()
 
-    def start_job(self):
-        self.job_id = int(uuid.uuid4().int % 1000000)
-        self.job_dir = self.temp_root / f"job_{self.job_id}"
+    def job_path(self, job_id):
+        return self.temp_root / f"job_{job_id}"
+
+    def start_job(self, job_id=None):
+        self.job_id = int(job_id) if job_id is not None else int(uuid.uuid4().int % 1000000)
+        self.job_dir = self.job_path(self.job_id)
         self.job_dir.mkdir(parents=True, exist_ok=True)
+        self.scratch.start(self.job_dir)
         return str(self.job_dir)
 
     def get_temp(self):
@@ -109,9 +237,16 @@ class ToolBox:
             self.start_job()
         return str(self.job_dir)
 
-    def getTempVideoName(self):
-        temp_dir = Path(self.get_temp())
-        return str(temp_dir / f"temp_{uuid.uuid4().hex}.mp4")
+    def getTempVideoName(self, beside=None):
+        name = f"temp_{uuid.uuid4().hex}.mp4"
+        if beside is not None:
+            return str(Path(beside).parent / name)
+        return self.scratch_file(name)
+
+    def scratch_file(self, name):
+        if self.job_dir is None:
+            self.start_job()
+        return str(self.scratch.path(name))
 
     def getSOURCES(self):
         return str(self.sources_dir)
@@ -128,21 +263,28 @@ class ToolBox:
     def get_resource_subdir(self, name):
         return str(self.resources_dir / name)
 
-    def build_concat_file(self, clip_paths, include_intro_outro=True):
+    def intro_outro(self, conform=None):
+        clips = []
+        for file_name in ["intro.mp4", "outro.mp4"]:
+            path = self.resources_dir / file_name
+            if path.exists() and path.stat().st_size > 0:
+                clips.append(conform(str(path)) if conform is not None else str(path))
+            else:
+                clips.append(None)
+        return clips
+
+    def build_concat_file(self, clip_paths, include_intro_outro=True, conform=None):
         concat_file = Path(self.get_temp()) / "concat.txt"
+        intro, outro = self.intro_outro(conform) if include_intro_outro else (None, None)
         with open(concat_file, "w", encoding="utf-8") as file_handle:
-            if include_intro_outro:
-                intro = self.resources_dir / "intro.mp4"
-                if intro.exists() and intro.stat().st_size > 0:
-                    file_handle.write(f"file '{intro.as_posix()}'\n")
+            if intro:
+                file_handle.write(f"file '{Path(intro).as_posix()}'\n")
 
             for clip_path in clip_paths:
                 file_handle.write(f"file '{Path(clip_path).as_posix()}'\n")
 
-            if include_intro_outro:
-                outro = self.resources_dir / "outro.mp4"
-                if outro.exists() and outro.stat().st_size > 0:
-                    file_handle.write(f"file '{outro.as_posix()}'\n")
+            if outro:
+                file_handle.write(f"file '{Path(outro).as_posix()}'\n")
         return str(concat_file)
 
     def preview(self, output_file):
@@ -151,104 +293,161 @@ class ToolBox:
     def copy_video(self, source, dest):
         shutil.copyfile(source, dest)
 
+    def ffmpeg_command(self, *args, threads=None):
+        *options, output = args
+        return [
+            "ffmpeg",
+            "-y",
+            "-nostdin",
+            *self.scheduler.global_args(threads),
+            *options,
+            *self.encoder_args(options, output),
+            *self.scheduler.output_args(threads),
+            output,
+        ]
+
+    def encoder_options(self):
+        """x264 options for encodes that do not pick their own codec; the fastest preset in draft mode."""
+        if not self.draft:
+            return {}
+        return {"preset": DRAFT_PRESET, "crf": str(DRAFT_CRF)}
+
+    def encoder_args(self, options, output):
+        if "-c" in options or "-c:v" in options or Path(output).suffix.lower() not in VIDEO_OUTPUTS:
+            return []
+        return [arg for name, value in self.encoder_options().items() for arg in (f"-{name}", value)]
+
+    def run_ffmpeg(self, *args, threads=None, stage="ffmpeg"):
+        command = self.ffmpeg_command(*args, threads=threads)
+        self.cancel_token.check()
+        with self.scheduler.slot(), self.tracer.span(stage, cmd=subprocess.list2cmdline(command)):
+            self.cancel_token.run(command)
+
+    def scaled_overlay(self, asset, wait=True):
+        """The cached pre-scaled copy of ``asset``, or None to scale the original; ``wait=False`` only starts it."""
+        if not self.use_overlay_cache:
+            return None
+        if not wait:
+            self.overlay_cache.prefetch(self, asset, self.overlay_target)
+            return None
+        return self.overlay_cache.get(self, asset, self.overlay_target)
+
+    def overlay_tag(self):
+        if not self.use_overlay_cache:
+            return None
+        return "x".join(map(str, self.overlay_target)) if self.overlay_target else "native"
+
     def snip_video(self, source, start, end, dest):
+        self.backend.snip(source, start, end, dest)
+
+    def filter_video(self, source, dest, video_filter=None, audio_filter=None):
+        self.backend.filter(source, dest, video_filter, audio_filter)
+
+    def encode_video(self, source, start, end, dest):
         duration = max(0.01, end - start)
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
+        self.run_ffmpeg("-ss", str(start), "-t", str(duration), "-i", source, dest, stage="snip_encode")
+
+    def smart_snip(self, source, start, end, dest):
+        keyframe = self.keyframes.next_keyframe(self, source, start)
+        if keyframe is not None and keyframe - start < 0.001:
+            self.snip_video(source, start, end, dest)
+            return
+        info = self.probe(source)
+        if keyframe is None or keyframe >= end or info.video_codec != "h264" or info.audio_codec not in (None, "aac"):
+            self.encode_video(source, start, end, dest)
+            return
+
+        head = Path(self.getTempVideoName()).with_suffix(".head.ts")
+        tail = Path(self.getTempVideoName()).with_suffix(".tail.ts")
+        try:
+            self.run_ffmpeg(
                 "-ss",
                 str(start),
                 "-t",
-                str(duration),
+                str(keyframe - start),
+                "-i",
+                source,
+                "-c:v",
+                "libx264",
+                "-c:a",
+                "aac",
+                "-f",
+                "mpegts",
+                str(head),
+                stage="smart_snip_head",
+            )
+            self.run_ffmpeg(
+                "-ss",
+                str(keyframe),
+                "-t",
+                str(end - keyframe),
                 "-i",
                 source,
                 "-c",
                 "copy",
-                dest,
-            ],
-            check=True,
-        )
-
-    def concat_demuxer(self, output_file, concat_file=None):
-        concat_path = concat_file or str(Path(self.get_temp()) / "concat.txt")
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
+                "-output_ts_offset",
+                str(keyframe - start),
                 "-f",
-                "concat",
-                "-safe",
-                "0",
+                "mpegts",
+                str(tail),
+                stage="smart_snip_tail",
+            )
+            self.run_ffmpeg(
                 "-i",
-                concat_path,
+                f"concat:{head}|{tail}",
                 "-c",
                 "copy",
-                output_file,
-            ],
-            check=True,
+                "-bsf:a",
+                "aac_adtstoasc",
+                dest,
+                stage="smart_snip_join",
+            )
+        finally:
+            head.unlink(missing_ok=True)
+            tail.unlink(missing_ok=True)
+
+    def concat_demuxer(self, output_file, concat_file=None):
+        concat_path = concat_file or str(Path(self.get_temp()) / "concat.txt")
+        self.run_ffmpeg(
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            concat_path,
+            "-c",
+            "copy",
+            output_file,
+            stage="concat",
         )
         if not self.has_audio_stream(output_file):
             self.add_silent_audio(output_file)
 
+    def probe(self, source):
+        return self.probe_cache.get(source)
+
     def get_length(self, source):
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                source,
-            ],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        return result.stdout.strip()
+        return str(self.probe(source).duration)
 
     def has_audio_stream(self, source):
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "error",
-                "-select_streams",
-                "a",
-                "-show_entries",
-                "stream=codec_type",
-                "-of",
-                "csv=p=0",
-                source,
-            ],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        return bool(result.stdout.strip())
+        return self.probe(source).has_audio
 
     def add_silent_audio(self, source):
         temp_path = Path(source).with_suffix(".audio.mp4")
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                source,
-                "-f",
-                "lavfi",
-                "-i",
-                "anullsrc=channel_layout=stereo:sample_rate=44100",
-                "-shortest",
-                "-c:v",
-                "copy",
-                "-c:a",
-                "aac",
-                str(temp_path),
-            ],
-            check=True,
+        self.run_ffmpeg(
+            "-i",
+            source,
+            "-f",
+            "lavfi",
+            "-i",
+            "anullsrc=channel_layout=stereo:sample_rate=44100",
+            "-shortest",
+            "-c:v",
+            "copy",
+            "-c:a",
+            "aac",
+            str(temp_path),
+            stage="silent_audio",
         )
         Path(source).unlink(missing_ok=True)
         temp_path.replace(source)
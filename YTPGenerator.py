@@ -1,9 +1,47 @@
 import os
 import random
 import shutil
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
 
+from Utilities import ToolBox, YTPSettings
+from ytpplus.AudioDSP import AudioDSP
+from ytpplus.Cancellation import JobCancelled
+from ytpplus.ClipCache import ClipCache
+from ytpplus.EffectCompiler import EffectCompiler
+from ytpplus.EffectRegistry import EFFECTS, chain_cost, order_steps
 from ytpplus.EffectsFactory import EffectsFactory
+from ytpplus.JobManifest import JobManifest
+from ytpplus.MezzanineCache import MezzanineProfile
+from ytpplus.Progress import ProgressTracker
+from ytpplus.RenderFarm import FarmCoordinator
+from ytpplus.SourceIndex import SourceIndex
+from ytpplus.StreamingConcat import StreamingConcat
+from ytpplus.TimelineRenderer import TimelineRenderer
+
+
+@dataclass
+class ClipPlan:
+    index: int
+    source: str
+    start: float = None
+    end: float = None
+    steps: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "source": self.source,
+            "start": self.start,
+            "end": self.end,
+            "steps": [[effect, list(assets)] for effect, assets in self.steps],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        steps = [(effect, tuple(assets)) for effect, assets in data["steps"]]
+        return cls(index=data["index"], source=data["source"], start=data["start"], end=data["end"], steps=steps)
 
 
 class YTPGenerator:
@@ -19,10 +57,33 @@ class YTPGenerator:
         effect_probability=30,
         allow_effect_stacking=True,
         max_stack_level=3,
+        max_effect_cost=0.0,
         effects=None,
+        fuse_effects=True,
+        render_mode="clips",
+        timeline_chunk_clips=64,
+        streaming_concat=False,
+        normalize_sources=False,
+        mezzanine_profile=None,
+        draft=False,
+        draft_profile=None,
+        keyframe_mode="off",
+        scene_cuts=False,
+        scene_threshold=10.0,
+        trace_file=None,
+        max_failed_clips=0,
+        seed=None,
+        clip_cache=False,
+        clip_cache_mb=2048,
+        audio_engine="ffmpeg",
+        farm_address="127.0.0.1:7878",
+        farm_secret="",
+        farm_task_timeout=60.0,
+        farm_local_workers=0,
     ):
         self.toolBox = util
         self.effectsFactory = EffectsFactory(util)
+        self.effectCompiler = EffectCompiler(self.effectsFactory, self.apply_effect)
         self.sourceList = []
 
         self.OUTPUT_FILE = output
@@ -36,137 +97,490 @@ class YTPGenerator:
 
         self.allowEffectStacking = allow_effect_stacking
         self.maxEffectStackLevel = max_stack_level
+        self.maxEffectCost = max_effect_cost
 
-        self.effects = effects or [True] * 30
+        self.effects = effects or [True] * len(EFFECTS)
         self.effects_count = len(self.effects)
+        self.fuseEffects = fuse_effects
+        self.renderMode = render_mode
+        self.timelineChunkClips = timeline_chunk_clips
+        self.streamingConcat = streaming_concat
+
+        self.keyframeMode = keyframe_mode
+        self.sceneCuts = scene_cuts
+        self.sceneThreshold = scene_threshold
+        self.traceFile = trace_file
+        self.normalizeSources = normalize_sources
+        self.draft = draft
+        self.mezzanine = None
+        self.sourceMap = {}
+        if draft:
+            self.mezzanine = util.mezzanine_cache(draft_profile or MezzanineProfile.proxy())
+        elif normalize_sources:
+            self.mezzanine = util.mezzanine_cache(mezzanine_profile)
+        if self.mezzanine is not None:
+            profile = self.mezzanine.profile
+            self.effectCompiler.conform = (profile.video_filter(), profile.audio_filter())
+
+        self.audioEngine = audio_engine
+        if audio_engine == "numpy":
+            if AudioDSP.available():
+                sample_rate = self.mezzanine.profile.sample_rate if self.mezzanine is not None else 44100
+                self.effectCompiler.audio_dsp = AudioDSP(util, sample_rate=sample_rate)
+            else:
+                self.audioEngine = "ffmpeg"
+                print("YTPGEN AUDIO: NumPy is not installed, using ffmpeg audio filters")
+
+        self.farmAddress = farm_address
+        self.farmSecret = farm_secret
+        self.farmTaskTimeout = farm_task_timeout
+        self.farmLocalWorkers = farm_local_workers
+
+        self.jobSeed = seed
+        self.clipCache = None
+        if clip_cache:
+            self.clipCache = ClipCache(util.probe_cache, util.temp_root / "clip_cache", clip_cache_mb * 1024**2)
+
+        self.sourceIndex = None
+        self.settings = None
+        self.resumeJob = None
+        self.manifest = None
+        self.seed = None
 
         self.done = False
-        self.doneCount = 0
+        self.progress = ProgressTracker(self.MAX_CLIPS)
+        self.maxFailedClips = max_failed_clips
+        self.failedClips = 0
+        self.failLock = threading.Lock()
         self.ex = None
-        self.progress_callback = None
+
+    @classmethod
+    def from_settings(cls, util, output, settings, effects=None):
+        generator = cls(
+            util=util,
+            output=output,
+            min_dur=settings.min_clip_duration,
+            max_dur=settings.max_clip_duration,
+            max_clips=settings.max_clips,
+            insert_transition_clips=settings.insert_transition_clips,
+            transition_probability=settings.transition_probability,
+            effect_probability=settings.effect_probability,
+            allow_effect_stacking=settings.allow_effect_stacking,
+            max_stack_level=settings.max_stack_level,
+            max_effect_cost=settings.max_effect_cost,
+            effects=list(effects if effects is not None else settings.effects_enabled),
+            fuse_effects=settings.fuse_effects,
+            render_mode=settings.render_mode,
+            timeline_chunk_clips=settings.timeline_chunk_clips,
+            streaming_concat=settings.streaming_concat,
+            normalize_sources=settings.normalize_sources,
+            mezzanine_profile=MezzanineProfile(
+                width=settings.mezzanine_width,
+                height=settings.mezzanine_height,
+                fps=settings.mezzanine_fps,
+                gop=settings.mezzanine_gop,
+            ),
+            draft=settings.draft,
+            draft_profile=MezzanineProfile.proxy(
+                width=settings.draft_width,
+                height=settings.draft_height,
+                fps=settings.draft_fps,
+            ),
+            keyframe_mode=settings.keyframe_mode,
+            scene_cuts=settings.scene_cuts,
+            scene_threshold=settings.scene_threshold,
+            trace_file=settings.trace_file or None,
+            max_failed_clips=settings.max_failed_clips,
+            seed=settings.seed or None,
+            clip_cache=settings.clip_cache,
+            clip_cache_mb=settings.clip_cache_mb,
+            audio_engine=settings.audio_engine,
+            farm_address=settings.farm_address,
+            farm_secret=settings.farm_secret,
+            farm_task_timeout=settings.farm_task_timeout,
+            farm_local_workers=settings.farm_local_workers,
+        )
+        generator.settings = settings
+        return generator
+
+    @classmethod
+    def resume(cls, util, job_id, output=None):
+        manifest = JobManifest.load(util.job_path(job_id))
+        if not manifest.header.get("settings"):
+            raise ValueError(f"Job {job_id} was not started from YTPSettings and cannot be resumed")
+        settings = YTPSettings.from_dict(manifest.header["settings"])
+        generator = cls.from_settings(
+            util, output or manifest.header["output"], settings, effects=manifest.header["effects"]
+        )
+        for source in manifest.header["sources"]:
+            generator.add_source(source)
+        generator.resumeJob = job_id
+        return generator
 
     def add_source(self, source_name):
         self.sourceList.append(source_name)
 
-    def go(self, progress_callback=None):
+    @property
+    def doneCount(self):
+        return self.progress.fraction
+
+    def go(self, progress_callback=None, event_callback=None):
         if not self.sourceList:
             print("No sources added...")
             return
 
-        self.progress_callback = progress_callback
-        self.toolBox.start_job()
+        listeners = [event_callback]
+        if progress_callback:
+            listeners.append(lambda event: progress_callback(event.percent))
+        self.progress = ProgressTracker(self.MAX_CLIPS, listeners)
+        self.failedClips = 0
+        self.ex = None
+        self.toolBox.cancel_token.reset()
+        try:
+            self.run_job()
+        except Exception as exc:
+            if isinstance(exc, JobCancelled) and os.path.exists(self.OUTPUT_FILE):
+                os.remove(self.OUTPUT_FILE)
+            self.progress.finish(exc)
+            raise
+        self.progress.finish()
+
+    def run_job(self):
+        self.toolBox.start_job(self.resumeJob)
+        if self.traceFile:
+            self.toolBox.tracer.start()
         if os.path.exists(self.OUTPUT_FILE):
             os.remove(self.OUTPUT_FILE)
 
-        num_effects = self.number_effects_selected()
         job_dir = self.toolBox.get_temp()
         print(f"poop_{self.toolBox.job_id}")
         os.makedirs(job_dir, exist_ok=True)
 
+        if self.resumeJob is not None:
+            self.manifest = JobManifest.load(job_dir)
+            self.seed = self.manifest.header["seed"]
+            print(f"YTPGEN RESUME: job {self.resumeJob}, {len(self.manifest.completed)} clips already rendered")
+        else:
+            self.seed = self.jobSeed or random.randrange(1, 2**32)
+            self.manifest = JobManifest.create(
+                job_dir,
+                {
+                    "job_id": self.toolBox.job_id,
+                    "seed": self.seed,
+                    "output": self.OUTPUT_FILE,
+                    "sources": self.sourceList,
+                    "effects": self.effects,
+                    "settings": self.settings.to_dict() if self.settings else None,
+                },
+            )
+
+        print(f"YTPGEN SEED: {self.seed}")
+        self.index_sources()
+
+        succeeded = False
+        try:
+            if self.mezzanine is not None:
+                self.progress.set_stage("ingest")
+                if self.draft:
+                    print(f"YTPGEN INGEST: building draft proxies of {len(set(self.sourceList))} sources")
+                else:
+                    print(f"YTPGEN INGEST: normalizing {len(set(self.sourceList))} sources")
+                sources = list(self.sourceList)
+                if self.renderMode != "timeline":
+                    # Clips are concatenated by stream copy, so the intro and outro need the clips' format too.
+                    sources += [path for path in self.toolBox.intro_outro() if path]
+                self.sourceMap = self.mezzanine.ingest(self.toolBox, sources)
+
+            if self.renderMode == "timeline":
+                self.render_timeline()
+            elif self.renderMode == "farm":
+                self.render_farm()
+            else:
+                self.render_clips()
+            succeeded = True
+        finally:
+            self.manifest.close()
+            user_cancelled = self.toolBox.cancel_token.cancelled and self.ex is None
+            self.finish_job(
+                "TIMELINE" if self.renderMode == "timeline" else "CONCAT",
+                keep_job=not succeeded and not user_cancelled,
+            )
+
+    def render_clips(self):
+        token = self.toolBox.cancel_token
+        tracer = self.toolBox.tracer
+        assembler = None
+        if self.streamingConcat:
+            assembler = StreamingConcat(self.toolBox, self.OUTPUT_FILE, self.MAX_CLIPS, conform=self.resolve_source)
+            assembler.start()
+
         def process_clip(i):
-            nonlocal num_effects
-            if self.ex is not None:
+            if token.cancelled:
                 return
 
-            try:
-                clip_to_work_with = os.path.join(job_dir, f"video{i}.mp4")
+            clip_to_work_with = self.clip_path(i)
+            if self.manifest.is_complete(i, clip_to_work_with):
+                self.progress.clip_done(i, 1.0 / (self.MAX_CLIPS + 1))
+                if assembler is not None:
+                    assembler.add(i, clip_to_work_with)
+                return
 
-                if (
-                    random.randint(1, self.transitionProbability) == self.transitionProbability
-                    and self.insertTransitionClips
-                ):
-                    self.toolBox.copy_video(self.effectsFactory.pick_source(), clip_to_work_with)
-                else:
-                    source_to_pick = random.choice(self.sourceList)
-                    source_length = float(self.toolBox.get_length(source_to_pick))
-                    start = random.uniform(0, max(0, source_length - self.MAX_STREAM_DURATION))
-                    end = start + random.uniform(self.MIN_STREAM_DURATION, self.MAX_STREAM_DURATION)
-                    self.toolBox.snip_video(source_to_pick, start, end, clip_to_work_with)
-
-                self._update_progress(0.5 / (self.MAX_CLIPS + 1))
-
-                if random.randint(0, 99) < self.effectProbability and num_effects > 0:
-                    stack_level = 1
-                    if self.allowEffectStacking:
-                        stack_level = random.randint(1, min(num_effects, self.maxEffectStackLevel))
-
-                    visited = [False] * self.effects_count
-                    for _ in range(stack_level):
-                        invalid_effect = True
-                        while invalid_effect:
-                            effect = random.randint(0, self.effects_count - 1)
-                            if self.effects[effect] and not visited[effect]:
-                                self.apply_effect(clip_to_work_with, effect)
-                                visited[effect] = True
-                                invalid_effect = False
-
-            except Exception as exc:
-                print(f"YTPGEN CLIP {i} ERROR: Could not be created")
-                self.ex = exc
+            with tracer.clip(i), tracer.span("clip"):
+                try:
+                    with tracer.span("plan"):
+                        plan = self.recorded_plan(i)
+                    cache_key = None
+                    if self.clipCache is not None:
+                        cache_key = self.clipCache.key(plan, self.render_options())
+                    if cache_key is not None and self.clipCache.fetch(cache_key, clip_to_work_with):
+                        self.progress.advance(0.5 / (self.MAX_CLIPS + 1))
+                    else:
+                        self.render_plan(
+                            plan, clip_to_work_with, snipped=lambda: self.progress.advance(0.5 / (self.MAX_CLIPS + 1))
+                        )
+                        if cache_key is not None:
+                            self.clipCache.store(cache_key, clip_to_work_with)
+                    self.manifest.record_done(i)
 
-            self._update_progress(0.5 / (self.MAX_CLIPS + 1))
+                except JobCancelled:
+                    return
+                except Exception as exc:
+                    self.clip_failed(i, exc)
+                    if os.path.exists(clip_to_work_with):
+                        os.remove(clip_to_work_with)
+
+            self.progress.clip_done(i, 0.5 / (self.MAX_CLIPS + 1))
             print(f"YTPGEN CLIP {i} DONE: {round(self.doneCount*100)}% Complete")
+            if assembler is not None:
+                assembler.add(i, clip_to_work_with)
+
+        self.progress.set_stage("clips")
+        workers = self.toolBox.scheduler.max_processes
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for i in range(self.MAX_CLIPS):
+                if token.cancelled:
+                    break
+                if len(pending) >= workers * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(process_clip, i))
+
+        if token.cancelled:
+            if assembler is not None:
+                assembler.abort()
+            raise self.ex if self.ex is not None else JobCancelled(token.reason)
 
-        with ThreadPoolExecutor() as executor:
-            executor.map(process_clip, range(self.MAX_CLIPS))
+        self.progress.set_stage("concat")
+        if assembler is not None:
+            assembler.finish()
+        else:
+            self.concat_clips()
 
+    def render_plan(self, plan, dest, snipped=None):
+        self.snip_clip(plan, dest)
+        if snipped is not None:
+            snipped()
+        if plan.steps:
+            with self.toolBox.tracer.span("effects"):
+                self.apply_steps(dest, plan.steps)
+
+    def render_farm(self):
+        token = self.toolBox.cancel_token
+        remote = []
+        for i in range(self.MAX_CLIPS):
+            clip_path = self.clip_path(i)
+            if self.manifest.is_complete(i, clip_path):
+                self.progress.clip_done(i, 1.0 / (self.MAX_CLIPS + 1))
+                continue
+            plan = self.recorded_plan(i)
+            cache_key = self.clipCache.key(plan, self.render_options()) if self.clipCache is not None else None
+            if cache_key is not None and self.clipCache.fetch(cache_key, clip_path):
+                self.manifest.record_done(i)
+                self.progress.clip_done(i, 1.0 / (self.MAX_CLIPS + 1))
+                continue
+            remote.append(i)
+
+        self.progress.set_stage("clips")
+        coordinator = FarmCoordinator(
+            self,
+            self.farmAddress,
+            secret=self.farmSecret,
+            task_timeout=self.farmTaskTimeout,
+            local_workers=self.farmLocalWorkers,
+        )
+        coordinator.run(remote)
+        if token.cancelled:
+            raise self.ex if self.ex is not None else JobCancelled(token.reason)
+
+        self.progress.set_stage("concat")
+        self.concat_clips()
+
+    def clip_failed(self, index, exc):
+        print(f"YTPGEN CLIP {index} ERROR: Could not be created ({exc})")
+        with self.failLock:
+            self.failedClips += 1
+            if self.failedClips <= self.maxFailedClips:
+                return
+            if self.ex is None:
+                self.ex = exc
+        self.toolBox.cancel_token.cancel(f"{self.failedClips} clips failed (max_failed_clips={self.maxFailedClips})")
+
+    def cancel(self):
+        self.toolBox.cancel_token.cancel("cancelled by user")
+
+    def clip_path(self, i):
+        name = f"video{i}.mp4"
+        found = self.toolBox.scratch.find(name)
+        return str(found) if found is not None else self.toolBox.scratch_file(name)
+
+    def concat_clips(self):
         clip_paths = []
         for i in range(self.MAX_CLIPS):
-            clip_path = os.path.join(job_dir, f"video{i}.mp4")
-            if os.path.exists(clip_path):
-                clip_paths.append(clip_path)
+            clip_path = self.toolBox.scratch.find(f"video{i}.mp4")
+            if clip_path is not None:
+                clip_paths.append(str(clip_path))
 
-        concat_file = self.toolBox.build_concat_file(clip_paths, include_intro_outro=True)
+        self.toolBox.scratch.sample(force=True)
+        concat_file = self.toolBox.build_concat_file(clip_paths, include_intro_outro=True, conform=self.resolve_source)
+        self.toolBox.concat_demuxer(self.OUTPUT_FILE, concat_file=concat_file)
+        for clip_path in clip_paths:
+            os.remove(clip_path)
 
-        try:
-            self.toolBox.concat_demuxer(self.OUTPUT_FILE, concat_file=concat_file)
-        finally:
-            self.clean_up()
-            self._update_progress(1.0 / (self.MAX_CLIPS + 1))
-            print(f"YTPGEN CONCAT DONE: {round(self.doneCount*100)}% Complete")
-            self.done = True
-
-        if self.ex is not None:
-            raise self.ex
-
-    def apply_effect(self, clip, effect):
-        effect_map = {
-            0: self.effectsFactory.effect_random_sound,
-            1: self.effectsFactory.effect_random_sound_mute,
-            2: self.effectsFactory.effect_reverse,
-            3: self.effectsFactory.effect_speed_up,
-            4: self.effectsFactory.effect_slow_down,
-            5: self.effectsFactory.effect_chorus,
-            6: self.effectsFactory.effect_vibrato,
-            7: self.effectsFactory.effect_high_pitch,
-            8: self.effectsFactory.effect_low_pitch,
-            9: self.effectsFactory.effect_dance,
-            10: self.effectsFactory.effect_squidward,
-            11: self.effectsFactory.effect_invert,
-            12: self.effectsFactory.effect_rainbow,
-            13: self.effectsFactory.effect_flip,
-            14: self.effectsFactory.effect_mirror,
-            15: self.effectsFactory.effect_sus,
-            16: self.effectsFactory.effect_stutter_loop,
-            17: self.effectsFactory.effect_loop_frames,
-            18: self.effectsFactory.effect_shuffle_frames,
-            19: self.effectsFactory.effect_audio_crust,
-            20: self.effectsFactory.effect_overlay_image,
-            21: self.effectsFactory.effect_overlay_meme,
-            22: self.effectsFactory.effect_meme_sound,
-            23: self.effectsFactory.effect_resource_sound,
-            24: self.effectsFactory.effect_overlay_video,
-            25: self.effectsFactory.effect_advert_overlay,
-            26: self.effectsFactory.effect_error_overlay,
-            27: self.effectsFactory.effect_spadinner_overlay,
-            28: self.effectsFactory.effect_spadinner_sound,
-            29: self.effectsFactory.effect_chaos_small_export,
+    def recorded_plan(self, i):
+        recorded = self.manifest.plans.get(i)
+        if recorded is not None:
+            return ClipPlan.from_dict(recorded)
+        plan = self.plan_clip(i, self.clip_rng(i))
+        self.manifest.record_plan(i, plan.to_dict())
+        return plan
+
+    def clip_rng(self, i):
+        return random.Random(f"{self.seed}:{i}")
+
+    def render_options(self):
+        return {
+            "mezzanine": self.mezzanine.profile.tag() if self.mezzanine is not None else None,
+            "keyframe_mode": self.keyframeMode,
+            "draft": self.draft,
+            "fuse_effects": self.fuseEffects,
+            "audio_engine": self.audioEngine,
+            "overlay_cache": self.toolBox.overlay_tag(),
         }
-        func = effect_map.get(effect)
-        if func:
-            func(clip)
+
+    def render_timeline(self):
+        plans = [self.recorded_plan(i) for i in range(self.MAX_CLIPS)]
+        plans = [replace(plan, source=self.resolve_source(plan.source)) for plan in plans]
+        renderer = TimelineRenderer(self.toolBox, self.effectCompiler, max_segments=self.timelineChunkClips)
+
+        def chunk_done(fraction):
+            self.progress.advance(fraction * self.MAX_CLIPS / (self.MAX_CLIPS + 1), clips=round(fraction * len(plans)))
+
+        self.progress.set_stage("timeline")
+        renderer.render(plans, self.OUTPUT_FILE, chunk_done)
+
+    def finish_job(self, stage, keep_job=False):
+        self.toolBox.probe_cache.save()
+        self.toolBox.backend.close()
+        print(f"YTPGEN SCRATCH: {self.toolBox.scratch.report()}")
+        if keep_job:
+            print(f"YTPGEN JOB {self.toolBox.job_id} KEPT: resume with --resume {self.toolBox.job_id}")
+        else:
+            self.clean_up()
+        self.progress.advance(1.0 / (self.MAX_CLIPS + 1))
+        print(f"YTPGEN {stage} DONE: {round(self.doneCount*100)}% Complete")
+        if self.traceFile:
+            self.toolBox.tracer.stop()
+            self.toolBox.tracer.export(self.traceFile)
+            print(self.toolBox.tracer.summary())
+            print(f"YTPGEN TRACE: {self.traceFile}")
+        self.done = True
+
+    def snip_clip(self, plan, dest):
+        source = self.resolve_source(plan.source)
+        if plan.start is None:
+            self.toolBox.copy_video(source, dest)
+        elif self.keyframeMode == "smart" and self.mezzanine is None:
+            self.toolBox.smart_snip(source, plan.start, plan.end, dest)
+        else:
+            self.toolBox.snip_video(source, plan.start, plan.end, dest)
+
+    def index_sources(self):
+        self.sourceIndex = SourceIndex.build(self.toolBox, self.sourceList, self.MAX_STREAM_DURATION)
+        if self.sourceIndex.excluded:
+            print(
+                f"YTPGEN SOURCES: skipping {len(self.sourceIndex.excluded)} of {len(self.sourceList)} sources"
+                f" shorter than {self.MAX_STREAM_DURATION}s or unreadable"
+            )
+        if not len(self.sourceIndex):
+            print("YTPGEN SOURCES: no source is long enough, cutting from the short ones")
+            self.sourceIndex = SourceIndex.build(self.toolBox, self.sourceList, self.MAX_STREAM_DURATION, 0.0)
+        if self.sceneCuts:
+            for source in self.sourceIndex.sources:
+                self.toolBox.scenes.prefetch(self.toolBox, source, self.sceneThreshold)
+
+    def resolve_source(self, source):
+        if self.mezzanine is None:
+            return source
+        return self.sourceMap.get(source) or self.mezzanine.get(self.toolBox, source)
+
+    def possible_effects(self, source):
+        """Enabled effects whose assets exist and, if they only touch audio, for which ``source`` has audio."""
+        has_audio = self.normalizeSources or self.toolBox.has_audio_stream(source)
+        possible = []
+        for effect, spec in enumerate(EFFECTS[: self.effects_count]):
+            if not self.effects[effect] or (spec.audio_only and not has_audio):
+                continue
+            if all(self.effectsFactory.has_asset(need) for need in spec.assets):
+                possible.append(effect)
+        return possible
+
+    def plan_clip(self, i, rng=None):
+        rng = rng or random
+        if (
+            rng.randint(1, self.transitionProbability) == self.transitionProbability
+            and self.insertTransitionClips
+        ):
+            plan = ClipPlan(index=i, source=self.effectsFactory.pick_source(rng))
+        else:
+            source_to_pick, start, source_length = self.sourceIndex.pick(rng)
+            end = min(start + rng.uniform(self.MIN_STREAM_DURATION, self.MAX_STREAM_DURATION), source_length)
+            if self.sceneCuts:
+                duration = end - start
+                start = self.toolBox.scenes.nearest(
+                    self.toolBox, source_to_pick, start, self.sceneThreshold, latest=max(0, source_length - duration)
+                )
+                end = start + duration
+            if self.keyframeMode == "snap" and not self.normalizeSources:
+                duration = end - start
+                start = self.toolBox.keyframes.nearest(
+                    self.toolBox, source_to_pick, start, latest=max(0, source_length - duration)
+                )
+                end = start + duration
+            plan = ClipPlan(index=i, source=source_to_pick, start=start, end=end)
+
+        candidates = self.possible_effects(plan.source)
+        if rng.randint(0, 99) < self.effectProbability and candidates:
+            stack_level = 1
+            if self.allowEffectStacking:
+                stack_level = rng.randint(1, min(len(candidates), self.maxEffectStackLevel))
+            for effect in rng.sample(candidates, stack_level):
+                if self.maxEffectCost and chain_cost(plan.steps + [(effect, ())]) > self.maxEffectCost:
+                    continue
+                plan.steps.append((effect, self.effectCompiler.resolve(effect, rng)))
+            plan.steps = order_steps(plan.steps)
+        return plan
+
+    def apply_steps(self, clip, steps):
+        self.effectCompiler.render(clip, steps, fuse=self.fuseEffects)
+
+    def apply_effect(self, clip, effect, assets=()):
+        if 0 <= effect < len(EFFECTS):
+            handler = EFFECTS[effect].handler
+            with self.toolBox.tracer.span("effect", effect=handler):
+                getattr(self.effectsFactory, handler)(clip, *assets)
 
     def clean_up(self):
+        self.toolBox.scratch.remove()
         job_dir = self.toolBox.job_dir
         if job_dir and os.path.exists(job_dir):
             shutil.rmtree(job_dir)
@@ -174,7 +588,27 @@ class YTPGenerator:
     def number_effects_selected(self):
         return sum(self.effects)
 
-    def _update_progress(self, increment):
-        self.doneCount += increment
-        if self.progress_callback:
-            self.progress_callback(min(100, self.doneCount * 100))
+
+def generate(
+    sources,
+    output,
+    settings=None,
+    base_dir=None,
+    progress_callback=None,
+    event_callback=None,
+    cancel_token=None,
+    resume_job=None,
+):
+    tool_box = ToolBox(base_dir)
+    if cancel_token is not None:
+        tool_box.cancel_token = cancel_token
+    tool_box.ensure_project_structure()
+    if resume_job is not None:
+        generator = YTPGenerator.resume(tool_box, resume_job, output)
+    else:
+        generator = YTPGenerator.from_settings(tool_box, output, settings or YTPSettings())
+        for source in sources:
+            generator.add_source(str(source))
+    tool_box.configure(generator.settings)
+    generator.go(progress_callback=progress_callback, event_callback=event_callback)
+    return generator
@@ -0,0 +1,51 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Utilities import ToolBox  # noqa: E402
+from ytpplus.Benchmark import lavfi  # noqa: E402
+
+
+@pytest.fixture
+def tool_box(tmp_path):
+    tool_box = ToolBox(tmp_path)
+    tool_box.ensure_project_structure()
+    return tool_box
+
+
+@pytest.fixture
+def make_video(tmp_path):
+    """Builds small lavfi test videos; skips the test when ffmpeg is not installed."""
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        pytest.skip("needs ffmpeg and ffprobe")
+
+    def make(name, frequency=440, seconds=2):
+        path = tmp_path / "fixtures" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lavfi(
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size=160x120:rate=15:duration={seconds}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency={frequency}:sample_rate=44100:duration={seconds}",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "ultrafast",
+            "-g",
+            "15",
+            "-c:a",
+            "aac",
+            "-shortest",
+            str(path),
+        )
+        return str(path)
+
+    return make
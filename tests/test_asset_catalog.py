@@ -0,0 +1,37 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from ytpplus.EffectRegistry import SOUND
+from ytpplus.EffectsFactory import EffectsFactory
+from ytpplus.ProbeCache import MediaInfo
+
+
+def test_folders_are_bucketed_by_media_type(tool_box):
+    folder = Path(tool_box.get_resource_subdir("errors"))
+    for name in ("a.PNG", "b.mp4", "c.wav", "notes.txt"):
+        (folder / name).write_bytes(b"x")
+    catalog = tool_box.asset_catalog
+    assert catalog.files_of_type(folder, "image") == [str(folder / "a.PNG")]
+    assert catalog.files_of_type(folder, "video") == [str(folder / "b.mp4")]
+    assert catalog.files_of_type(folder, "audio") == [str(folder / "c.wav")]
+    assert catalog.files_of_type(folder, "other") == [str(folder / "notes.txt")]
+
+
+def test_sounds_without_audio_are_never_picked(tool_box):
+    sounds = Path(tool_box.getSOUNDS())
+    for name in ("silent.mp3", "sound.mp3"):
+        (sounds / name).write_bytes(name.encode())
+    tool_box.probe_cache.prober = lambda path: MediaInfo(streams=[] if "silent" in path else ["audio"])
+    factory = EffectsFactory(tool_box)
+
+    assert factory.has_asset(SOUND)
+    picks = {factory.pick_asset(SOUND, rng=random.Random(seed)) for seed in range(20)}
+    assert picks == {str(sounds / "sound.mp3")}
+
+    (sounds / "sound.mp3").unlink()
+    tool_box.asset_catalog.refresh_interval = 0
+    assert not factory.has_asset(SOUND)
+    with pytest.raises(FileNotFoundError):
+        factory.pick_asset(SOUND)
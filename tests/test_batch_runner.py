@@ -0,0 +1,67 @@
+import threading
+from pathlib import Path
+
+from Utilities import YTPSettings
+from ytpplus.BatchRunner import BatchRunner, parse_seeds
+from ytpplus.Cancellation import JobCancelled
+from ytpplus.EffectRegistry import effect_index
+from ytpplus.TimeIndex import TimeIndex
+
+
+def test_parse_seeds():
+    assert parse_seeds("1,5,10-12") == [1, 5, 10, 11, 12]
+    assert parse_seeds(" 3 ,") == [3]
+
+
+def test_failed_job_does_not_cancel_the_next_jobs_ingest(tool_box, make_video, tmp_path):
+    first = make_video("first.mp4", frequency=440)
+    second = make_video("second.mp4", frequency=660)
+    # A corrupt overlay makes every clip of the first job fail, which cancels that job's token.
+    (tool_box.resources_dir / "images" / "broken.png").write_bytes(b"not media")
+    effects = [False] * len(YTPSettings().effects_enabled)
+    effects[effect_index("effect_overlay_image")] = True
+    common = dict(normalize_sources=True, insert_transition_clips=False, max_clips=2, seed=1)
+    failing = YTPSettings(effect_probability=100, effects_enabled=effects, **common)
+    passing = YTPSettings(effect_probability=0, **common)
+
+    runner = BatchRunner(tool_box, max_jobs=1)
+    failed_job = runner.submit(tmp_path / "failed.mp4", failing, [first], priority=1)
+    next_job = runner.submit(tmp_path / "next.mp4", passing, [second])
+    runner.run()
+
+    assert failed_job.status in ("failed", "cancelled")
+    assert next_job.status == "done", next_job.error
+    assert Path(next_job.output).stat().st_size > 0
+
+
+class _BlockingIndex(TimeIndex):
+    suffix = ".t"
+    label = "test"
+
+    def __init__(self, index_dir):
+        super().__init__(index_dir)
+        self.started = threading.Event()
+        self.builds_run = 0
+
+    def build(self, tool_box, source, option, log):
+        self.builds_run += 1
+        if self.builds_run == 1:
+            self.started.set()
+            tool_box.cancel_token.event.wait(5)
+            tool_box.cancel_token.check()
+        return [2.0, 1.0]
+
+
+def test_index_build_cancelled_with_one_job_is_rebuilt_for_another(tool_box, tmp_path):
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"frames")
+    index = _BlockingIndex(tmp_path / "index")
+    cancelled, other = tool_box.fork(), tool_box.fork()
+
+    future = index.prefetch(cancelled, str(source))
+    index.started.wait(5)
+    cancelled.cancel_token.cancel("job failed")
+
+    assert list(index.get(other, str(source))) == [1.0, 2.0]
+    assert isinstance(future.exception(), JobCancelled)
+    assert index.builds_run == 2
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from ytpplus.Cancellation import CancelToken, JobCancelled
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+
+def test_check_raises_with_the_reason_until_reset():
+    token = CancelToken()
+    token.check()
+    token.cancel("clip failed")
+    token.cancel("second reason is ignored")
+    with pytest.raises(JobCancelled, match="clip failed"):
+        token.check()
+    token.reset()
+    token.check()
+    assert not token.cancelled
+
+
+def test_cancel_stops_a_running_process():
+    token = CancelToken(grace=1.0)
+    threading.Timer(0.2, token.cancel, args=("stop",)).start()
+    started = time.monotonic()
+    with pytest.raises(JobCancelled, match="stop"):
+        token.run(SLEEP)
+    assert time.monotonic() - started < 10
+    assert not token.processes
+
+
+def test_process_attached_after_cancel_is_stopped():
+    token = CancelToken()
+    token.cancel()
+    process = token.attach(subprocess.Popen(SLEEP))
+    assert process.wait(timeout=10) != 0
+
+
+def test_run_reports_failures():
+    token = CancelToken()
+    with pytest.raises(subprocess.CalledProcessError):
+        token.run([sys.executable, "-c", "raise SystemExit(3)"])
+    assert token.run([sys.executable, "-c", "raise SystemExit(3)"], check=False).returncode == 3
@@ -0,0 +1,49 @@
+import os
+
+from YTPGenerator import ClipPlan
+from ytpplus.ClipCache import ClipCache
+
+
+def _file(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_key_covers_source_cut_steps_assets_and_options(tool_box, tmp_path):
+    cache = ClipCache(tool_box.probe_cache, tmp_path / "cache")
+    source = _file(tmp_path / "source.mp4", b"source")
+    renamed = _file(tmp_path / "renamed.mp4", b"source")
+    sound = _file(tmp_path / "sound.mp3", b"sound")
+    other_sound = _file(tmp_path / "other.mp3", b"other sound")
+    plan = ClipPlan(index=0, source=source, start=1.0, end=2.0, steps=[(0, (sound,))])
+    key = cache.key(plan, {"fps": 30})
+
+    # Clip index and file names do not matter, only content.
+    same = ClipPlan(index=7, source=renamed, start=1.0, end=2.0, steps=[(0, (sound,))])
+    assert cache.key(same, {"fps": 30}) == key
+    for changed, options in [
+        (ClipPlan(index=0, source=source, start=1.5, end=2.0, steps=[(0, (sound,))]), {"fps": 30}),
+        (ClipPlan(index=0, source=source, start=1.0, end=2.0, steps=[(1, (sound,))]), {"fps": 30}),
+        (ClipPlan(index=0, source=source, start=1.0, end=2.0, steps=[(0, (other_sound,))]), {"fps": 30}),
+        (plan, {"fps": 25}),
+    ]:
+        assert cache.key(changed, options) != key
+
+
+def test_store_evicts_least_recently_used(tool_box, tmp_path):
+    cache = ClipCache(tool_box.probe_cache, tmp_path / "cache", max_bytes=250)
+    clips = {name: _file(tmp_path / f"{name}.mp4", name.encode() * 100) for name in "abc"}
+    cache.store("aa" * 32, clips["a"])
+    cache.store("bb" * 32, clips["b"])
+    os.utime(cache.path_for("aa" * 32), ns=(1000, 1000))
+    os.utime(cache.path_for("bb" * 32), ns=(2000, 2000))
+    os.utime(clips["c"], ns=(3000, 3000))
+    # Fetching "a" makes it the most recently used entry.
+    assert cache.fetch("aa" * 32, tmp_path / "fetched.mp4")
+
+    cache.store("cc" * 32, clips["c"])
+
+    assert cache.path_for("aa" * 32).exists()
+    assert not cache.path_for("bb" * 32).exists()
+    assert cache.path_for("cc" * 32).exists()
+    assert not cache.fetch("bb" * 32, tmp_path / "missing.mp4")
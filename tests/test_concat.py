@@ -0,0 +1,12 @@
+from pathlib import Path
+
+
+def test_concat_file_conforms_intro_and_outro(tool_box):
+    intro = Path(tool_box.get_resources_dir()) / "intro.mp4"
+    intro.write_bytes(b"intro")
+    (Path(tool_box.get_resources_dir()) / "outro.mp4").write_bytes(b"")
+
+    concat_file = tool_box.build_concat_file(["video0.mp4"], conform=lambda path: path + ".mezzanine.mp4")
+
+    lines = Path(concat_file).read_text(encoding="utf-8").splitlines()
+    assert lines == [f"file '{intro.as_posix()}.mezzanine.mp4'", "file 'video0.mp4'"]
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from ytpplus.EffectCompiler import EffectCompiler
+from ytpplus.EffectRegistry import chain_cost, effect_index, order_steps
+
+CONFORM = ("scale=640:360", "aformat=sample_rates=48000")
+
+
+def _compiler(tool_box, conform=None):
+    calls = []
+    factory = SimpleNamespace(
+        tool_box=tool_box,
+        filter_video=lambda clip, video_filter=None, audio_filter=None: calls.append(
+            ("conform", video_filter, audio_filter)
+        ),
+    )
+    compiler = EffectCompiler(factory, lambda clip, effect, assets: calls.append(("effect", effect)), conform)
+    return compiler, calls
+
+
+def test_unfused_steps_are_conformed_once(tool_box):
+    compiler, calls = _compiler(tool_box, CONFORM)
+    mirror, dance = effect_index("effect_mirror"), effect_index("effect_dance")
+    compiler.render("clip.mp4", [(mirror, []), (dance, [])], has_audio=True, fuse=False)
+    assert calls == [("effect", mirror), ("effect", dance), ("conform", *CONFORM)]
+
+
+def test_unfused_steps_without_conform_are_left_alone(tool_box):
+    compiler, calls = _compiler(tool_box)
+    mirror = effect_index("effect_mirror")
+    compiler.render("clip.mp4", [(mirror, [])], has_audio=True, fuse=False)
+    assert calls == [("effect", mirror)]
+
+
+def test_compile_chains_stage_labels(tool_box):
+    compiler, _ = _compiler(tool_box)
+    invert, speed_up = effect_index("effect_invert"), effect_index("effect_speed_up")
+    graph = compiler.compile([(invert, ()), (speed_up, ())])
+    assert graph.filters == ["[0:v]negate[fx0v]", "[fx0v]setpts=0.5*PTS[fx1v]", "[0:a]atempo=2.0[fx1a]"]
+    assert (graph.video, graph.audio, graph.inputs, graph.input_count) == ("fx1v", "fx1a", [], 0)
+    assert not graph.shortest
+
+
+def test_compile_numbers_asset_inputs_after_the_clip(tool_box):
+    compiler, _ = _compiler(tool_box)
+    chorus, sound = effect_index("effect_chorus"), effect_index("effect_resource_sound")
+    graph = compiler.compile([(sound, ("a.mp3",)), (chorus, ()), (sound, ("b.mp3",))], input_offset=1)
+    assert graph.inputs == ["-i", "a.mp3", "-i", "b.mp3"]
+    assert graph.input_count == 2
+    assert graph.filters == [
+        "[0:a][1:a]amix=inputs=2:duration=shortest[fx0a]",
+        "[fx0a]aecho=0.8:0.88:60:0.4[fx1a]",
+        "[fx1a][2:a]amix=inputs=2:duration=shortest[fx2a]",
+    ]
+    assert (graph.video, graph.audio) == ("0:v", "fx2a")
+    assert graph.shortest
+
+
+def test_order_steps_groups_audio_only_runs():
+    chorus, invert, sus = effect_index("effect_chorus"), effect_index("effect_invert"), effect_index("effect_sus")
+    vibrato, speed_up = effect_index("effect_vibrato"), effect_index("effect_speed_up")
+    steps = [(chorus, ()), (invert, ()), (vibrato, ())]
+    assert order_steps(steps) == [(invert, ()), (chorus, ()), (vibrato, ())]
+    # Steps that change duration keep their place.
+    assert order_steps([(sus, ()), (invert, ())]) == [(sus, ()), (invert, ())]
+    assert order_steps([(chorus, ()), (speed_up, ())]) == [(chorus, ()), (speed_up, ())]
+
+
+def test_chain_cost_weighs_steps_by_the_length_they_see():
+    invert, slow_down, speed_up = (
+        effect_index("effect_invert"),
+        effect_index("effect_slow_down"),
+        effect_index("effect_speed_up"),
+    )
+    assert chain_cost([]) == 0
+    assert chain_cost([(invert, ())]) == 1.0
+    assert chain_cost([(slow_down, ()), (invert, ())]) == 1.8 + 2.0
+    assert chain_cost([(speed_up, ()), (invert, ())]) == 0.7 + 0.5
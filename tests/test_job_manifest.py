@@ -0,0 +1,42 @@
+from ytpplus.JobManifest import CLIP_LOG_NAME, JobManifest
+
+
+def test_replay_restores_plans_and_completed_clips(tmp_path):
+    manifest = JobManifest.create(tmp_path, {"seed": 5, "output": "out.mp4"})
+    manifest.record_plan(0, {"source": "a.mp4"})
+    manifest.record_plan(1, {"source": "b.mp4"})
+    manifest.record_done(0)
+    manifest.record_done(1)
+    # A clip planned again after it finished has to be rendered again.
+    manifest.record_plan(1, {"source": "c.mp4"})
+    manifest.close()
+
+    loaded = JobManifest.load(tmp_path)
+    assert loaded.header["seed"] == 5
+    assert loaded.plans == {0: {"source": "a.mp4"}, 1: {"source": "c.mp4"}}
+    assert loaded.completed == {0}
+
+
+def test_is_complete_needs_the_clip_file(tmp_path):
+    manifest = JobManifest.create(tmp_path, {})
+    manifest.record_done(0)
+    manifest.close()
+    clip = tmp_path / "clip_0.mp4"
+
+    loaded = JobManifest.load(tmp_path)
+    assert not loaded.is_complete(0, clip)
+    clip.write_bytes(b"video")
+    assert loaded.is_complete(0, clip)
+    assert not loaded.is_complete(1, clip)
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    manifest = JobManifest.create(tmp_path, {})
+    manifest.record_plan(0, {"source": "a.mp4"})
+    manifest.record_done(0)
+    manifest.close()
+    with open(tmp_path / CLIP_LOG_NAME, "a", encoding="utf-8") as file_handle:
+        file_handle.write('{"event": "done", "ind')
+
+    loaded = JobManifest.load(tmp_path)
+    assert loaded.completed == {0}
@@ -0,0 +1,71 @@
+import socket
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from Utilities import YTPSettings
+from YTPGenerator import YTPGenerator
+from ytpplus.RenderFarm import MAX_RESPAWNS, PROTOCOL_VERSION, FarmCoordinator, local_file, recv_message, send_message
+
+FINGERPRINT = "0123456789abcdef" * 4
+
+
+def _generator(tool_box, secret=""):
+    return SimpleNamespace(toolBox=tool_box, settings=YTPSettings(farm_secret=secret))
+
+
+def test_coordinator_off_loopback_needs_a_secret(tool_box):
+    with pytest.raises(ValueError, match="farm_secret"):
+        FarmCoordinator(_generator(tool_box), "0.0.0.0:0")
+    FarmCoordinator(_generator(tool_box), "127.0.0.1:0")
+    FarmCoordinator(_generator(tool_box, "s3cret"), "0.0.0.0:0", secret="s3cret")
+
+
+def test_non_ascii_secret_is_rejected(tool_box):
+    coordinator = FarmCoordinator(_generator(tool_box), "127.0.0.1:0", secret="s3cret")
+    ours, theirs = socket.socketpair()
+    server = threading.Thread(target=coordinator._serve, args=(theirs, ("worker", 0)))
+    server.start()
+    with ours:
+        send_message(ours, {"type": "hello", "version": PROTOCOL_VERSION, "name": "w", "secret": "s3crét"})
+        assert recv_message(ours) == {"type": "bye", "reason": "rejected"}
+    server.join(5)
+    assert not server.is_alive()
+
+
+def test_local_file_stays_in_files_dir(tmp_path):
+    path = local_file(tmp_path, FINGERPRINT, ".MP4")
+    assert path == tmp_path.resolve() / f"{FINGERPRINT[:32]}.mp4"
+    assert local_file(tmp_path, FINGERPRINT, "/../../x.sh").name == FINGERPRINT[:32]
+    for fingerprint in ("../" + FINGERPRINT[3:], FINGERPRINT.upper(), "", None):
+        with pytest.raises(ValueError):
+            local_file(tmp_path, fingerprint, ".mp4")
+
+
+def test_farm_with_local_workers_renders_the_video(tool_box, make_video, tmp_path):
+    output = tmp_path / "farm.mp4"
+    settings = YTPSettings(
+        render_mode="farm",
+        farm_address="127.0.0.1:0",
+        farm_local_workers=2,
+        insert_transition_clips=False,
+        effect_probability=0,
+        max_clips=4,
+        seed=1,
+    )
+    generator = YTPGenerator.from_settings(tool_box, str(output), settings)
+    generator.add_source(make_video("source.mp4"))
+    generator.go()
+
+    assert output.stat().st_size > 0
+    assert tool_box.probe(str(output)).duration > 0
+
+
+def test_run_fails_once_local_workers_keep_exiting(tool_box, monkeypatch):
+    coordinator = FarmCoordinator(_generator(tool_box), "127.0.0.1:0", task_timeout=0.5, local_workers=1)
+    monkeypatch.setattr(coordinator, "worker_command", lambda n: [sys.executable, "-c", "raise SystemExit(1)"])
+    with pytest.raises(RuntimeError, match="no farm worker connected"):
+        coordinator.run([0, 1])
+    assert coordinator.respawns == MAX_RESPAWNS
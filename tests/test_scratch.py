@@ -0,0 +1,54 @@
+from Utilities import YTPSettings
+
+
+def _fork(tool_box, settings):
+    fork = tool_box.fork()
+    fork.configure_job(settings)
+    fork.start_job()
+    return fork
+
+
+def test_forks_share_one_scratch_budget(tool_box, tmp_path):
+    settings = YTPSettings(scratch_dir=str(tmp_path / "shm"), scratch_budget_mb=1)
+    first, second = _fork(tool_box, settings), _fork(tool_box, settings)
+    assert first.scratch.budget is second.scratch.budget
+
+    big = first.scratch.path("big.bin")
+    assert big.parent.parent == tmp_path / "shm"
+    big.write_bytes(b"x" * 1024**2)
+    first.scratch.sample(force=True)
+
+    # The other job's file uses up the budget this job would have had too.
+    assert second.scratch.path("clip.mp4").parent == second.job_dir
+    assert second.scratch.spills == 1
+
+
+def test_finished_job_stops_counting_against_the_budget(tool_box, tmp_path):
+    settings = YTPSettings(scratch_dir=str(tmp_path / "shm"), scratch_budget_mb=1)
+    first, second = _fork(tool_box, settings), _fork(tool_box, settings)
+    first.scratch.path("big.bin").write_bytes(b"x" * 1024**2)
+    first.scratch.remove()
+
+    second.scratch.sample(force=True)
+    assert second.scratch.path("clip.mp4").parent.parent == tmp_path / "shm"
+
+
+def test_allocations_between_samples_are_charged(tool_box, tmp_path):
+    settings = YTPSettings(scratch_dir=str(tmp_path / "shm"), scratch_budget_mb=3)
+    job = _fork(tool_box, settings)
+    job.scratch.budget.sample_interval = 3600
+
+    paths = [job.scratch.path(f"clip{n}.mp4") for n in range(5)]
+
+    on_root = [path for path in paths if path.parent.parent == tmp_path / "shm"]
+    assert len(on_root) == 3
+    assert job.scratch.spills == 2
+
+    # Files seen on disk and then deleted free their charges again.
+    for path in on_root:
+        path.write_bytes(b"x" * 1024)
+    job.scratch.sample(force=True)
+    for path in on_root:
+        path.unlink()
+    job.scratch.sample(force=True)
+    assert job.scratch.path("next.mp4").parent.parent == tmp_path / "shm"
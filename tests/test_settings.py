@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from Utilities import YTPSettings
+from ytpplus.__main__ import build_parser, build_settings
+from ytpplus.EffectRegistry import effect_index
+
+
+def test_settings_round_trip_through_dict_and_file(tmp_path):
+    settings = YTPSettings(max_clips=7, seed=42, render_mode="timeline", effects_enabled=[False, True] * 15)
+    assert YTPSettings.from_dict(settings.to_dict()) == settings
+
+    path = tmp_path / "preset.json"
+    path.write_text(json.dumps(settings.to_dict()), encoding="utf-8")
+    assert YTPSettings.from_file(path) == settings
+
+
+def test_unknown_settings_are_rejected():
+    with pytest.raises(ValueError, match="max_clip\\b"):
+        YTPSettings.from_dict({"max_clip": 3})
+
+
+def _settings(*argv):
+    return build_settings(build_parser().parse_args(list(argv)))
+
+
+def test_effects_accepts_numbers_and_handler_names():
+    settings = _settings("--effects", "3, effect_invert,")
+    enabled = {index for index, on in enumerate(settings.effects_enabled) if on}
+    assert enabled == {3, effect_index("effect_invert")}
+    assert len(settings.effects_enabled) == len(YTPSettings().effects_enabled)
+
+
+def test_unknown_effect_name_is_an_error():
+    with pytest.raises(KeyError):
+        _settings("--effects", "effect_nope")
+
+
+def test_command_line_overrides_config_file(tmp_path):
+    path = tmp_path / "preset.json"
+    path.write_text(json.dumps({"max_clips": 9, "seed": 1}), encoding="utf-8")
+    settings = _settings("--config", str(path), "--seed", "2")
+    assert (settings.max_clips, settings.seed) == (9, 2)
+
+
+def test_mode_settings_are_validated(tmp_path):
+    with pytest.raises(ValueError, match="render_mode 'timline'"):
+        YTPSettings.from_dict({"render_mode": "timline"})
+    path = tmp_path / "preset.json"
+    path.write_text(json.dumps({"audio_engine": "numpy", "keyframe_mode": "snp"}), encoding="utf-8")
+    with pytest.raises(ValueError, match="keyframe_mode"):
+        YTPSettings.from_file(path)
+
+
+def test_mode_flags_only_accept_known_values():
+    assert _settings("--media-backend", "pyav").media_backend == "pyav"
+    with pytest.raises(SystemExit):
+        _settings("--render-mode", "timline")
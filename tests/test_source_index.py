@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from ytpplus.SourceIndex import SourceIndex
+
+
+def test_pick_stays_inside_usable_footage():
+    index = SourceIndex(["a.mp4", "b.mp4", "short.mp4", "broken.mp4"], [30.0, 5.0, 1.0, None], 4.0)
+    assert index.sources == ["a.mp4", "b.mp4"]
+    assert index.excluded == ["short.mp4", "broken.mp4"]
+    assert index.total == pytest.approx(26.0 + 1.0)
+
+    rng = random.Random(7)
+    picks = [index.pick(rng) for _ in range(2000)]
+    for source, start, length in picks:
+        assert length == {"a.mp4": 30.0, "b.mp4": 5.0}[source]
+        assert 0.0 <= start <= length - 4.0
+    share = sum(source == "a.mp4" for source, _, _ in picks) / len(picks)
+    assert share == pytest.approx(26 / 27, abs=0.03)
+
+
+def test_pick_without_usable_sources_raises():
+    index = SourceIndex(["short.mp4"], [1.0], 4.0)
+    assert len(index) == 0
+    with pytest.raises(ValueError):
+        index.pick(random.Random(1))
+
+
+def test_source_exactly_min_length_can_still_be_picked():
+    index = SourceIndex(["a.mp4"], [4.0], 4.0)
+    source, start, length = index.pick(random.Random(3))
+    assert (source, length) == ("a.mp4", 4.0)
+    assert 0.0 <= start <= 0.001
+
+
+def test_sources_shorter_than_a_clip_start_at_zero():
+    # The generator's fallback when no source is as long as the longest clip.
+    index = SourceIndex(["a.mp4", "b.mp4"], [0.3, 2.0], 4.0, min_length=0.0)
+    assert index.excluded == []
+    rng = random.Random(5)
+    assert {index.pick(rng)[1] for _ in range(100)} == {0.0}
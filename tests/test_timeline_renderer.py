@@ -0,0 +1,50 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from ytpplus.EffectCompiler import EffectCompiler
+from ytpplus.TimelineRenderer import TimelineRenderer
+
+
+def _renderer(tool_box, max_inputs=32):
+    compiler = EffectCompiler(SimpleNamespace(tool_box=tool_box), apply_effect=None)
+    return TimelineRenderer(tool_box, compiler, max_inputs=max_inputs)
+
+
+def test_nearby_clips_share_a_seeked_input():
+    segments = [
+        ("a.mp4", 100.0, 102.0, []),
+        ("b.mp4", 5.0, 6.0, []),
+        ("a.mp4", 104.0, 105.0, []),
+        ("a.mp4", 900.0, 901.0, []),
+        ("intro.mp4", None, None, []),
+    ]
+    inputs, assignment = TimelineRenderer.plan_inputs(segments)
+    assert inputs == [
+        ["a.mp4", 100.0, 105.0],
+        ["b.mp4", 5.0, 6.0],
+        ["a.mp4", 900.0, 901.0],
+        ["intro.mp4", None, None],
+    ]
+    assert assignment == [0, 1, 0, 2, 3]
+
+
+def test_chunk_seeks_inputs_and_trims_relative_to_them(tool_box, monkeypatch):
+    renderer = _renderer(tool_box)
+    monkeypatch.setattr(tool_box, "probe", lambda source: SimpleNamespace(has_audio=True, duration=1000.0))
+    commands = []
+    monkeypatch.setattr(tool_box, "run_ffmpeg", lambda *args, **kwargs: commands.append(args))
+    segments = [("a.mp4", 100.0, 102.0, []), ("a.mp4", 104.0, 105.0, [])]
+
+    renderer.render_chunk(segments, "out.mp4", 640, 360, 30, "timeline_test")
+
+    args = list(commands[0])
+    assert args[args.index("-i") - 4 : args.index("-i") + 2] == ["-ss", "100.0", "-t", "5.0", "-i", "a.mp4"]
+    graph = (Path(tool_box.get_temp()) / "timeline_test.filtergraph").read_text(encoding="utf-8")
+    assert "[0:v]trim=start=0.0:end=2.0" in graph
+    assert "[0:a]atrim=start=4.0:end=5.0" in graph
+
+
+def test_split_counts_seeked_inputs(tool_box):
+    renderer = _renderer(tool_box, max_inputs=2)
+    segments = [("a.mp4", 0.0, 1.0, []), ("a.mp4", 2.0, 3.0, []), ("a.mp4", 500.0, 501.0, []), ("b.mp4", 0, 1, [])]
+    assert renderer.split(segments) == [segments[:3], segments[3:]]
@@ -0,0 +1,102 @@
+import fnmatch
+import os
+import subprocess
+import threading
+import time
+
+MEDIA_TYPES = {
+    ".mp4": "video",
+    ".webm": "video",
+    ".mov": "video",
+    ".mkv": "video",
+    ".wmv": "video",
+    ".avi": "video",
+    ".png": "image",
+    ".jpg": "image",
+    ".jpeg": "image",
+    ".webp": "image",
+    ".gif": "image",
+    ".mp3": "audio",
+    ".wav": "audio",
+    ".ogg": "audio",
+}
+
+
+def media_type(file_path):
+    return MEDIA_TYPES.get(os.path.splitext(file_path)[1].lower(), "other")
+
+
+class FolderIndex:
+    def __init__(self, path, mtime, names):
+        self.path = path
+        self.mtime = mtime
+        self.checked = time.monotonic()
+        self.files = [os.path.join(path, name) for name in sorted(names)]
+        self.by_type = {}
+        for file_path in self.files:
+            self.by_type.setdefault(media_type(file_path), []).append(file_path)
+        self.by_patterns = {}
+
+    def matching(self, patterns):
+        key = tuple(patterns)
+        files = self.by_patterns.get(key)
+        if files is None:
+            files = [
+                file_path
+                for file_path in self.files
+                if any(fnmatch.fnmatch(os.path.basename(file_path), pattern) for pattern in patterns)
+            ]
+            self.by_patterns[key] = files
+        return files
+
+
+class AssetCatalog:
+    """Directory listings for the asset folders, shared by every picker.
+
+    Each folder is scanned once and re-scanned only when its mtime changes,
+    which is checked at most every ``refresh_interval`` seconds. Picks are a
+    random choice from a cached list, so they cost O(1) on the hot path.
+    Files are also bucketed by media type, and ``info`` reads their metadata
+    from the shared probe cache, so each asset is probed once across runs.
+    """
+
+    def __init__(self, probe_cache=None, refresh_interval=2.0):
+        self.probe_cache = probe_cache
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.folders = {}
+
+    def folder(self, path):
+        path = os.path.abspath(path)
+        with self.lock:
+            index = self.folders.get(path)
+            if index and time.monotonic() - index.checked < self.refresh_interval:
+                return index
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if index and index.mtime == mtime:
+                index.checked = time.monotonic()
+                return index
+            names = []
+            if mtime is not None:
+                names = [entry.name for entry in os.scandir(path) if entry.is_file()]
+            index = FolderIndex(path, mtime, names)
+            self.folders[path] = index
+            return index
+
+    def files(self, path, patterns):
+        return self.folder(path).matching(patterns)
+
+    def files_of_type(self, path, media_type):
+        return self.folder(path).by_type.get(media_type, [])
+
+    def info(self, file_path):
+        """The asset's MediaInfo, or None without a probe cache or when it cannot be probed."""
+        if self.probe_cache is None:
+            return None
+        try:
+            return self.probe_cache.get(file_path)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
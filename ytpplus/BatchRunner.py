@@ -0,0 +1,223 @@
+import argparse
+import heapq
+import itertools
+import sys
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+from Utilities import ToolBox, YTPSettings
+from YTPGenerator import YTPGenerator
+from ytpplus.Cancellation import JobCancelled
+
+
+@dataclass
+class BatchJob:
+    name: str
+    output: str
+    settings: YTPSettings
+    sources: list
+    priority: int = 0
+    status: str = "queued"
+    seed: int = None
+    seconds: float = None
+    error: str = None
+
+
+@dataclass(order=True)
+class _QueueEntry:
+    priority: int
+    order: int
+    job: BatchJob = field(compare=False)
+
+
+class BatchRunner:
+    """Renders many YTPs from one warm ToolBox, highest priority first.
+
+    Up to ``max_jobs`` jobs run at once, each on a ``ToolBox.fork()`` so they
+    share the probe cache, asset catalog, keyframe index, overlay cache,
+    mezzanines and the ffmpeg scheduler. The scheduler's CPU budget bounds
+    the ffmpeg processes of all jobs together, so a batch keeps every core
+    busy whether it holds two jobs or two hundred. Jobs can be submitted
+    while the batch runs; ``cancel`` stops queued and running jobs.
+    """
+
+    def __init__(self, tool_box, max_jobs=2, event_callback=None):
+        self.tool_box = tool_box
+        self.max_jobs = max(1, max_jobs)
+        self.event_callback = event_callback
+        self.lock = threading.Lock()
+        self.queue = []
+        self.order = itertools.count()
+        self.jobs = []
+        self.running = {}
+        self.workers = []
+        self.cancelled = False
+
+    def submit(self, output, settings, sources, priority=0, name=None):
+        job = BatchJob(
+            name=name or Path(output).stem,
+            output=str(output),
+            settings=settings,
+            sources=[str(source) for source in sources],
+            priority=priority,
+        )
+        with self.lock:
+            self.jobs.append(job)
+            heapq.heappush(self.queue, _QueueEntry(-priority, next(self.order), job))
+        return job
+
+    def submit_seeds(self, output_dir, settings, sources, seeds, priority=0, prefix="ytp"):
+        return [
+            self.submit(
+                Path(output_dir) / f"{prefix}_seed{seed}.mp4",
+                replace(settings, seed=seed),
+                sources,
+                priority=priority,
+                name=f"{prefix}_seed{seed}",
+            )
+            for seed in seeds
+        ]
+
+    def run(self):
+        self.start()
+        return self.wait()
+
+    def start(self):
+        self.tool_box.ensure_project_structure()
+        self.workers = [
+            threading.Thread(target=self._work, name=f"batch-{n}", daemon=True) for n in range(self.max_jobs)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def wait(self):
+        for worker in self.workers:
+            worker.join()
+        return self.jobs
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            running = list(self.running.values())
+        for tool_box in running:
+            tool_box.cancel_token.cancel("batch cancelled")
+        self.tool_box.cancel_token.cancel("batch cancelled")
+
+    def _next(self):
+        with self.lock:
+            while self.queue:
+                job = heapq.heappop(self.queue).job
+                if self.cancelled:
+                    job.status = "cancelled"
+                    continue
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            self._run_job(job)
+
+    def _run_job(self, job):
+        tool_box = self.tool_box.fork()
+        tool_box.configure_job(job.settings)
+        generator = YTPGenerator.from_settings(tool_box, job.output, job.settings)
+        for source in job.sources:
+            generator.add_source(source)
+
+        with self.lock:
+            if self.cancelled:
+                job.status = "cancelled"
+                return
+            self.running[job.name] = tool_box
+        job.status = "running"
+        started = time.perf_counter()
+        listener = None
+        if self.event_callback is not None:
+            listener = lambda event: self.event_callback(job, event)
+        try:
+            generator.go(event_callback=listener)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as exc:
+            job.status = "failed"
+            job.error = str(exc)
+            print(f"YTPGEN BATCH JOB FAILED: {job.name} ({exc})")
+        finally:
+            with self.lock:
+                self.running.pop(job.name, None)
+            job.seed = generator.seed
+            job.seconds = round(time.perf_counter() - started, 3)
+
+
+def parse_seeds(text):
+    """``"1,5,10-12"`` as ``[1, 5, 10, 11, 12]``."""
+    seeds = []
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        if first:
+            seeds.extend(range(int(first), int(last or first) + 1))
+    return seeds
+
+
+def _split_priority(config):
+    path, _, priority = config.rpartition(":")
+    if path and priority.isdigit():
+        return path, int(priority)
+    return config, 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ytpplus.BatchRunner", description="Render many YTP variants from one source set."
+    )
+    parser.add_argument("sources", nargs="+", help="source videos")
+    parser.add_argument(
+        "-c",
+        "--config",
+        action="append",
+        default=[],
+        help="JSON/TOML settings file, repeatable; append :N to give it priority N (higher runs first)",
+    )
+    parser.add_argument("--seeds", default="1", help="seeds to render per config, e.g. 1-50 or 3,7,9")
+    parser.add_argument("--out-dir", default="output", help="folder for the rendered variants")
+    parser.add_argument("--base-dir", help="project folder holding sources/, resources/, temp/")
+    parser.add_argument("--jobs", type=int, default=2, help="jobs rendered at the same time")
+    args = parser.parse_args(argv)
+
+    tool_box = ToolBox(args.base_dir)
+    configs = args.config or [""]
+    first, _ = _split_priority(configs[0])
+    tool_box.configure(YTPSettings.from_file(first) if first else YTPSettings())
+    runner = BatchRunner(tool_box, max_jobs=args.jobs)
+    Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+    seeds = parse_seeds(args.seeds)
+    for config in configs:
+        path, priority = _split_priority(config)
+        settings = YTPSettings.from_file(path) if path else YTPSettings()
+        prefix = Path(path).stem if path else "ytp"
+        runner.submit_seeds(args.out_dir, settings, args.sources, seeds, priority=priority, prefix=prefix)
+
+    started = time.perf_counter()
+    runner.start()
+    try:
+        jobs = runner.wait()
+    except KeyboardInterrupt:
+        runner.cancel()
+        runner.wait()
+        return 130
+    elapsed = time.perf_counter() - started
+    done = [job for job in jobs if job.status == "done"]
+    for job in jobs:
+        print(f"{job.name:40} {job.status:10} {job.seconds or 0:8.2f}s {job.error or ''}")
+    print(f"YTPGEN BATCH: {len(done)}/{len(jobs)} done in {elapsed:.1f}s")
+    return 0 if len(done) == len(jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
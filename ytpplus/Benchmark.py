@@ -0,0 +1,276 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from Utilities import ToolBox, YTPSettings
+from YTPGenerator import YTPGenerator
+from ytpplus.EffectRegistry import EFFECTS, effect_index
+
+SOURCE_SECONDS = 12
+
+
+def lavfi(*args):
+    subprocess.run(["ffmpeg", "-v", "error", "-nostdin", "-y", *args], check=True)
+
+
+def make_fixture(base_dir, sources=3):
+    """Deterministic sources and a small resources/ tree built from lavfi."""
+    tool_box = ToolBox(base_dir)
+    tool_box.ensure_project_structure()
+    base = Path(base_dir)
+
+    source_paths = []
+    for n in range(sources):
+        path = base / "bench_sources" / f"source{n}.mp4"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        audio = f"sine=frequency={220 * (n + 1)}:sample_rate=44100" if n % 3 != 2 else "anullsrc=r=44100:cl=stereo"
+        if not path.exists():
+            lavfi(
+                "-f",
+                "lavfi",
+                "-i",
+                f"testsrc2=size=640x360:rate=30:duration={SOURCE_SECONDS}",
+                "-f",
+                "lavfi",
+                "-i",
+                audio,
+                "-t",
+                str(SOURCE_SECONDS),
+                "-c:v",
+                "libx264",
+                "-preset",
+                "ultrafast",
+                "-g",
+                "30",
+                "-c:a",
+                "aac",
+                "-shortest",
+                str(path),
+            )
+        source_paths.append(str(path))
+
+    stills = [tool_box.resources_dir / folder / "still.png" for folder in ("images", "memes", "errors", "spadinner")]
+    for path in stills:
+        if not path.exists():
+            lavfi("-f", "lavfi", "-i", "testsrc2=size=320x240", "-frames:v", "1", str(path))
+
+    clips = [
+        tool_box.sources_dir / "transition.mp4",
+        tool_box.resources_dir / "overlay_videos" / "overlay.mp4",
+        tool_box.resources_dir / "adverts" / "advert.mp4",
+    ]
+    for path in clips:
+        if not path.exists():
+            lavfi(
+                "-f",
+                "lavfi",
+                "-i",
+                "testsrc2=size=320x240:rate=30:duration=2",
+                "-f",
+                "lavfi",
+                "-i",
+                "sine=frequency=880:sample_rate=44100:duration=2",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "ultrafast",
+                "-c:a",
+                "aac",
+                "-shortest",
+                str(path),
+            )
+
+    sounds = [
+        tool_box.sounds_dir / "sound.mp3",
+        tool_box.resources_dir / "meme_sounds" / "meme.wav",
+        tool_box.resources_dir / "sounds" / "sound.wav",
+        tool_box.resources_dir / "spadinner_sounds" / "spadinner.wav",
+    ]
+    for n, path in enumerate(sounds):
+        if not path.exists():
+            lavfi("-f", "lavfi", "-i", f"sine=frequency={300 + 100 * n}:sample_rate=44100:duration=1", str(path))
+    return source_paths
+
+
+class DiskSampler(threading.Thread):
+    def __init__(self, path, interval=0.1):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, folder_size(self.path))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.peak = max(self.peak, folder_size(self.path))
+
+
+def folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def run_case(base_dir, sources, settings, seed):
+    tool_box = ToolBox(base_dir)
+    tool_box.configure(settings)
+    settings.seed = seed
+    generator = YTPGenerator.from_settings(tool_box, str(Path(base_dir) / "output" / "bench.mp4"), settings)
+    for source in sources:
+        generator.add_source(source)
+
+    sampler = DiskSampler(tool_box.temp_root)
+    sampler.start()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.go()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+    return {
+        "clips": settings.max_clips,
+        "seconds": round(elapsed, 3),
+        "clips_per_second": round(settings.max_clips / elapsed, 3),
+        "peak_temp_bytes": sampler.peak,
+        "peak_scratch_bytes": tool_box.scratch.peak,
+    }
+
+
+def measure_case(base_dir, sources, settings, seed):
+    """``run_case`` in a fresh process, so the peak RSS figures belong to this case alone."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_isolated_case, base_dir, sources, settings, seed).result()
+
+
+def _isolated_case(base_dir, sources, settings, seed):
+    case = run_case(base_dir, sources, settings, seed)
+    case["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    case["peak_ffmpeg_rss_kb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return case
+
+
+def build_cases(clip_counts, stack_levels, effects):
+    cases = {}
+    for clips in clip_counts:
+        cases[f"snip_only/clips={clips}"] = YTPSettings(max_clips=clips, effect_probability=0)
+        for stack in stack_levels:
+            cases[f"stack={stack}/clips={clips}"] = YTPSettings(
+                max_clips=clips, effect_probability=100, max_stack_level=stack
+            )
+    names = YTPSettings().effect_names()
+    for effect in effects:
+        enabled = [idx == effect for idx in range(len(names))]
+        cases[f"effect={effect}:{names[effect]}/clips={clip_counts[0]}"] = YTPSettings(
+            max_clips=clip_counts[0],
+            effect_probability=100,
+            max_stack_level=1,
+            effects_enabled=enabled,
+        )
+    for settings in cases.values():
+        settings.insert_transition_clips = False
+    return cases
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, case in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous and case["seconds"] > previous["seconds"] * (1 + tolerance):
+            regressions.append(f"{name}: {previous['seconds']}s -> {case['seconds']}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ytpplus.Benchmark", description="Offline YTP throughput benchmark."
+    )
+    parser.add_argument("--workdir", help="fixture/project folder (default: a new temp folder)")
+    parser.add_argument("--clips", default="10,40", help="comma-separated clip counts")
+    parser.add_argument("--stack", default="1,3,5", help="comma-separated max stack levels")
+    parser.add_argument("--effects", default="all", help="'all', 'none' or comma-separated effect numbers")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="bench_results.json", help="results JSON")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    base_dir = args.workdir or tempfile.mkdtemp(prefix="ytp_bench_")
+    clip_counts = [int(n) for n in args.clips.split(",")]
+    stack_levels = [int(n) for n in args.stack.split(",")]
+    if args.effects == "all":
+        effects = list(range(len(YTPSettings().effect_names())))
+    elif args.effects == "none":
+        effects = []
+    else:
+        effects = [int(n) for n in args.effects.split(",")]
+
+    sources = make_fixture(base_dir)
+    results = {
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "seed": args.seed,
+        "cases": {},
+    }
+    for name, settings in build_cases(clip_counts, stack_levels, effects).items():
+        case = measure_case(base_dir, sources, settings, args.seed)
+        results["cases"][name] = case
+        print(
+            f"{name:60} {case['seconds']:8.2f}s {case['clips_per_second']:7.2f} clips/s"
+            f" {case['peak_rss_kb'] // 1024:6} MB peak RSS"
+        )
+
+    snip_only = results["cases"].get(f"snip_only/clips={clip_counts[0]}")
+    for name, case in results["cases"].items():
+        if name.startswith("effect=") and snip_only:
+            case["effect_seconds_per_clip"] = round((case["seconds"] - snip_only["seconds"]) / case["clips"], 4)
+    # EffectSpec.cost is relative to Invert Colors, so its values can be refreshed from these.
+    invert = effect_index("effect_invert")
+    reference = results["cases"].get(f"effect={invert}:{EFFECTS[invert].name}/clips={clip_counts[0]}", {})
+    if reference.get("effect_seconds_per_clip", 0) > 0:
+        for name, case in results["cases"].items():
+            if "effect_seconds_per_clip" in case:
+                case["cost"] = round(case["effect_seconds_per_clip"] / reference["effect_seconds_per_clip"], 2)
+                print(f"{name:60} cost {case['cost']:.2f}")
+
+    with open(args.out, "w", encoding="utf-8") as file_handle:
+        json.dump(results, file_handle, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file_handle:
+            regressions = compare(results, json.load(file_handle), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
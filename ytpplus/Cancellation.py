@@ -0,0 +1,85 @@
+import subprocess
+import threading
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Cooperative cancellation for one job and the processes it spawned.
+
+    Every external process the job starts is attached while it runs. ``cancel``
+    flips the token, terminates the attached processes and kills whatever is
+    still alive after ``grace`` seconds; workers poll ``check`` between steps so
+    no new work starts once the token is set.
+    """
+
+    def __init__(self, grace=3.0):
+        self.grace = grace
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.processes = set()
+        self.reason = ""
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def reset(self):
+        with self.lock:
+            self.event.clear()
+            self.reason = ""
+
+    def cancel(self, reason="cancelled"):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            processes = list(self.processes)
+        for process in processes:
+            self._stop(process)
+
+    def check(self):
+        if self.event.is_set():
+            raise JobCancelled(self.reason)
+
+    def attach(self, process):
+        with self.lock:
+            self.processes.add(process)
+            cancelled = self.event.is_set()
+        if cancelled:
+            self._stop(process)
+        return process
+
+    def detach(self, process):
+        with self.lock:
+            self.processes.discard(process)
+
+    def run(self, command, check=True, **kwargs):
+        self.check()
+        process = self.attach(subprocess.Popen(command, **kwargs))
+        try:
+            return_code = process.wait()
+        finally:
+            self.detach(process)
+        self.check()
+        if check and return_code != 0:
+            raise subprocess.CalledProcessError(return_code, command)
+        return subprocess.CompletedProcess(command, return_code)
+
+    def _stop(self, process):
+        if process.poll() is not None:
+            return
+        try:
+            process.terminate()
+        except OSError:
+            return
+        threading.Thread(target=self._reap, args=(process,), daemon=True).start()
+
+    def _reap(self, process):
+        try:
+            process.wait(timeout=self.grace)
+        except subprocess.TimeoutExpired:
+            process.kill()
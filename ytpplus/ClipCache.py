@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+CACHE_VERSION = 1
+
+
+class ClipCache:
+    """Finished clips stored by the hash of everything that produced them.
+
+    The key covers the source's content hash, the cut points, the effect chain
+    with the content hash of every picked asset, and the render options that
+    change the output, so the same seed or an unchanged clip of a tweaked
+    preset is linked back instead of re-encoded. Entries are evicted least
+    recently used first once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, probe_cache, cache_dir, max_bytes=2 * 1024**3):
+        self.probe_cache = probe_cache
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.size = None
+
+    def key(self, plan, options=None):
+        steps = [
+            [effect, [self.probe_cache.fingerprint(asset) for asset in assets]] for effect, assets in plan.steps
+        ]
+        payload = {
+            "version": CACHE_VERSION,
+            "source": self.probe_cache.fingerprint(plan.source),
+            "start": plan.start,
+            "end": plan.end,
+            "steps": steps,
+            "options": options or {},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return self.cache_dir / key[:2] / f"{key}.mp4"
+
+    def fetch(self, key, dest):
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+            _link_or_copy(path, dest)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key, clip_path):
+        path = self.path_for(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(f".{threading.get_ident()}.partial")
+        _link_or_copy(clip_path, partial)
+        os.replace(partial, path)
+        with self.lock:
+            if self.size is None:
+                self.size = self._scan_size()
+            else:
+                self.size += path.stat().st_size
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob("*/*.mp4"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self.size <= target:
+                break
+            path.unlink(missing_ok=True)
+            self.size -= size
+
+
+def _link_or_copy(source, dest):
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
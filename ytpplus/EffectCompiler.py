@@ -0,0 +1,227 @@
+import subprocess
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+from ytpplus.EffectRegistry import EFFECTS, OVERLAY_VIDEO
+from ytpplus.EffectsFactory import STILL_EXTENSIONS
+
+SCALED_OVERLAY_VIDEO = "[{v}][{i0}:v]overlay=W-w-20:H-h-20:shortest=1[{vo}]"
+
+
+@dataclass
+class EffectStage:
+    video: str = None
+    audio: str = None
+    inputs: list = field(default_factory=list)
+    shortest: bool = False
+
+
+@dataclass
+class CompiledGraph:
+    filters: list
+    video: str
+    audio: str
+    inputs: list
+    input_count: int = 0
+    shortest: bool = False
+
+    def filter_complex(self):
+        return ";".join(self.filters)
+
+
+def _still(overlay):
+    return overlay.lower().endswith(STILL_EXTENSIONS)
+
+
+def _stage(spec, *assets):
+    inputs = [["-loop", "1", "-i", asset] if _still(asset) else ["-i", asset] for asset in assets]
+    return EffectStage(video=spec.video_filter, audio=spec.audio_filter, inputs=inputs, shortest=spec.shortest)
+
+
+STAGES = {
+    effect: partial(_stage, spec)
+    for effect, spec in enumerate(EFFECTS)
+    if spec.video_filter is not None or spec.audio_filter is not None
+}
+
+
+def _stream_label(label):
+    return label if ":" in label else f"[{label}]"
+
+
+class EffectCompiler:
+    """Fuses a chain of stacked effects into a single ffmpeg filtergraph.
+
+    Each step of a chain is an ``(effect, assets)`` pair where ``assets`` are the
+    files picked for that effect up front, so the fused graph and the
+    per-effect fallback use the same sounds and overlays. With ``conform`` set
+    to a ``(video_filter, audio_filter)`` pair every rendered chain is scaled
+    back to a common format, in the fused graph or by one more encode after
+    effects applied on their own, so clips can still be concatenated by
+    stream copy.
+    """
+
+    def __init__(self, effects_factory, apply_effect, conform=None):
+        self.effects_factory = effects_factory
+        self.tool_box = effects_factory.tool_box
+        self.apply_effect = apply_effect
+        self.conform = conform
+        self.audio_dsp = None
+
+    def resolve(self, effect, rng=None):
+        assets = [self.effects_factory.pick_asset(need, rng=rng) for need in EFFECTS[effect].assets]
+        if EFFECTS[effect].video_only:
+            for asset in assets:
+                self.tool_box.scaled_overlay(asset, wait=False)
+        return assets
+
+    def stage(self, effect, assets):
+        builder = STAGES.get(effect)
+        if builder is None:
+            return None
+        stage = builder(*assets)
+        if stage.video == OVERLAY_VIDEO:
+            scaled = self.tool_box.scaled_overlay(stage.inputs[0][-1])
+            if scaled is not None:
+                stage.inputs[0][-1] = scaled
+                stage.video = SCALED_OVERLAY_VIDEO
+        return stage
+
+    def compile(self, steps, video="0:v", audio="0:a", input_offset=1, prefix="fx"):
+        filters = []
+        inputs = []
+        input_count = 0
+        shortest = False
+        for n, (effect, assets) in enumerate(steps):
+            stage = self.stage(effect, assets)
+            if stage is None:
+                raise ValueError(f"Effect {effect} has no filtergraph stage")
+            names = {
+                "v": video,
+                "a": audio,
+                "vo": f"{prefix}{n}v",
+                "ao": f"{prefix}{n}a",
+                "p": f"{prefix}{n}_",
+            }
+            for k, input_args in enumerate(stage.inputs):
+                names[f"i{k}"] = str(input_offset + input_count)
+                inputs.extend(input_args)
+                input_count += 1
+            if stage.video:
+                filters.append(self._expand(stage.video, "v", names))
+                video = names["vo"]
+            if stage.audio:
+                filters.append(self._expand(stage.audio, "a", names))
+                audio = names["ao"]
+            shortest = shortest or stage.shortest
+        return CompiledGraph(
+            filters=filters,
+            video=video,
+            audio=audio,
+            inputs=inputs,
+            input_count=input_count,
+            shortest=shortest,
+        )
+
+    def render(self, clip, steps, has_audio=None, fuse=True):
+        """Apply ``steps`` to ``clip``.
+
+        Audio-only runs go through ``audio_dsp`` when it is set and the rest
+        as fused graphs, or one effect at a time without ``fuse``. A clip that
+        any effect was applied to on its own is conformed afterwards.
+        """
+        run = []
+        dsp_run = []
+        unconformed = False
+        for effect, assets in steps:
+            if EFFECTS[effect].audio and has_audio is None:
+                has_audio = self.tool_box.has_audio_stream(clip)
+            if has_audio and self.audio_dsp is not None and self.audio_dsp.supports(effect):
+                unconformed |= self._render_run(clip, run)
+                run = []
+                dsp_run.append((effect, assets))
+                continue
+            unconformed |= self._render_dsp(clip, dsp_run)
+            dsp_run = []
+            stage = self.stage(effect, assets) if fuse else None
+            if stage is None or (stage.audio and not has_audio):
+                unconformed |= self._render_run(clip, run)
+                run = []
+                self.apply_effect(clip, effect, assets)
+                unconformed = True
+                continue
+            run.append((effect, assets))
+        unconformed |= self._render_run(clip, run)
+        unconformed |= self._render_dsp(clip, dsp_run)
+        if unconformed and self.conform is not None:
+            self.conform_clip(clip)
+
+    def conform_clip(self, clip):
+        video_filter, audio_filter = self.conform
+        with self.tool_box.tracer.span("conform"):
+            self.effects_factory.filter_video(clip, video_filter=video_filter, audio_filter=audio_filter)
+
+    def _render_dsp(self, clip, run):
+        """Render an audio-only run with ``audio_dsp``; True if it fell back to applying effects one by one."""
+        if not run:
+            return False
+        try:
+            self.audio_dsp.render(clip, run)
+        except subprocess.CalledProcessError:
+            print(f"YTPGEN AUDIO DSP FAILED: {[effect for effect, _ in run]}, applying one by one")
+            for effect, assets in run:
+                self.apply_effect(clip, effect, assets)
+            return True
+        return False
+
+    def _render_run(self, clip, run):
+        """Render a run as one fused graph; True if its effects were applied one by one instead."""
+        if not run:
+            return False
+        if len(run) == 1 and self.conform is None:
+            effect, assets = run[0]
+            self.apply_effect(clip, effect, assets)
+            return True
+
+        graph = self.compile(run)
+        if self.conform is not None:
+            self._conform(graph)
+        temp = Path(self.tool_box.getTempVideoName(clip))
+        Path(clip).rename(temp)
+        args = ["-i", str(temp), *graph.inputs, "-filter_complex", graph.filter_complex()]
+        audio_map = "0:a?" if graph.audio == "0:a" else _stream_label(graph.audio)
+        args += ["-map", _stream_label(graph.video), "-map", audio_map]
+        if graph.video == "0:v":
+            args += ["-c:v", "copy"]
+        if graph.audio == "0:a":
+            args += ["-c:a", "copy"]
+        if graph.shortest:
+            args.append("-shortest")
+        try:
+            with self.tool_box.tracer.span("fused_effects", effect="+".join(str(effect) for effect, _ in run)):
+                self.effects_factory.run_ffmpeg(*args, str(clip))
+        except subprocess.CalledProcessError:
+            print(f"YTPGEN FUSED EFFECTS FAILED: {[effect for effect, _ in run]}, applying one by one")
+            Path(clip).unlink(missing_ok=True)
+            temp.rename(clip)
+            for effect, assets in run:
+                self.apply_effect(clip, effect, assets)
+            return True
+        temp.unlink(missing_ok=True)
+        return False
+
+    def _conform(self, graph):
+        video_filter, audio_filter = self.conform
+        if ":" not in graph.video:
+            graph.filters.append(f"[{graph.video}]{video_filter}[conformv]")
+            graph.video = "conformv"
+        if ":" not in graph.audio:
+            graph.filters.append(f"[{graph.audio}]{audio_filter}[conforma]")
+            graph.audio = "conforma"
+
+    @staticmethod
+    def _expand(template, kind, names):
+        if "{" + kind + "}" not in template:
+            template = "[{" + kind + "}]" + template + "[{" + kind + "o}]"
+        return template.format(**names)
@@ -0,0 +1,354 @@
+from dataclasses import dataclass
+
+from ytpplus.EffectsFactory import IMAGE_PATTERNS, MIXED_PATTERNS, SOUND_PATTERNS, VIDEO_PATTERNS
+
+# An asset need is a (resource folder, patterns) pair; folder None is the
+# top-level sounds folder that pick_sound draws from.
+SOUND = (None, ["*.mp3"])
+
+
+# Filtergraph fragments for the fused graph. A fragment without stream labels
+# reads {v}/{a} and writes {vo}/{ao}; {iN} is the Nth asset input and {p} a
+# prefix unique to the step.
+RANDOM_SOUND_AUDIO = (
+    "[{a}]channelsplit=channel_layout=stereo[{p}a1][{p}a2];"
+    "[{i0}:a]volume=1,apad,channelsplit=channel_layout=stereo[{p}a3][{p}a4];"
+    "[{p}a1][{p}a2][{p}a3][{p}a4]amerge=inputs=4,pan=stereo|c0<c0+c2|c1<c1+c3[{ao}]"
+)
+# The per-effect version bounds the padded sound with -shortest. Inside a fused
+# graph later stages still need a finite stream, so the clip's own audio is
+# merged in and dropped again purely to end the sound where the clip ends.
+RANDOM_SOUND_MUTE_AUDIO = (
+    "[{a}]aformat=channel_layouts=stereo[{p}og];"
+    "[{i0}:a]volume=1,apad,aformat=channel_layouts=stereo[{p}snd];"
+    "[{p}og][{p}snd]amerge=inputs=2,pan=stereo|c0=c2|c1=c3[{ao}]"
+)
+MIRROR_VIDEO = "[{v}]split[{p}left][{p}right];[{p}left]hflip[{p}flip];[{p}flip][{p}right]hstack[{vo}]"
+OVERLAY_VIDEO = "[{i0}:v]scale=iw*0.3:ih*0.3[{p}ov];[{v}][{p}ov]overlay=W-w-20:H-h-20:shortest=1[{vo}]"
+OVERLAY_AUDIO = "[{a}][{i0}:a]amix=inputs=2:duration=shortest[{ao}]"
+
+
+@dataclass(frozen=True)
+class EffectSpec:
+    """What one effect does to a clip, for planning without running it.
+
+    ``video``/``audio`` say which streams the effect rewrites; the other one
+    is stream-copied. ``duration`` is the output/input length ratio of the
+    streams it touches (None when it depends on the clip or its assets) and
+    ``resizes`` marks effects whose output frame size differs from the input.
+    ``cost`` is its render time relative to Invert Colors, about a plain
+    re-encode of the clip, as printed for the ``effect=N`` cases of
+    ``python -m ytpplus.Benchmark``.
+    ``video_filter``/``audio_filter`` are its fragments in the fused graph
+    (None when it cannot be fused), with ``shortest`` set when the graph must
+    end with the clip's shortest stream. ``dsp`` names the AudioDSP method
+    that renders it, if any.
+    """
+
+    name: str
+    handler: str
+    video: bool = False
+    audio: bool = False
+    duration: float = 1.0
+    resizes: bool = False
+    assets: tuple = ()
+    cost: float = 1.0
+    video_filter: str = None
+    audio_filter: str = None
+    shortest: bool = False
+    dsp: str = None
+
+    @property
+    def audio_only(self):
+        return self.audio and not self.video
+
+    @property
+    def video_only(self):
+        return self.video and not self.audio
+
+    @property
+    def keeps_duration(self):
+        return self.duration == 1.0
+
+
+EFFECTS = (
+    EffectSpec(
+        "Random Sound",
+        "effect_random_sound",
+        audio=True,
+        assets=(SOUND,),
+        audio_filter=RANDOM_SOUND_AUDIO,
+        shortest=True,
+        dsp="random_sound",
+        cost=0.3,
+    ),
+    EffectSpec(
+        "Random Sound (Mute OG)",
+        "effect_random_sound_mute",
+        audio=True,
+        assets=(SOUND,),
+        audio_filter=RANDOM_SOUND_MUTE_AUDIO,
+        shortest=True,
+        dsp="random_sound_mute",
+        cost=0.3,
+    ),
+    EffectSpec(
+        "Reverse Clip",
+        "effect_reverse",
+        video=True,
+        audio=True,
+        video_filter="reverse",
+        audio_filter="areverse",
+        cost=1.6,
+    ),
+    EffectSpec(
+        "Speed Up",
+        "effect_speed_up",
+        video=True,
+        audio=True,
+        duration=0.5,
+        video_filter="setpts=0.5*PTS",
+        audio_filter="atempo=2.0",
+        cost=0.7,
+    ),
+    EffectSpec(
+        "Slow Down",
+        "effect_slow_down",
+        video=True,
+        audio=True,
+        duration=2.0,
+        video_filter="setpts=2*PTS",
+        audio_filter="atempo=0.5",
+        cost=1.8,
+    ),
+    EffectSpec(
+        "Chorus Effect",
+        "effect_chorus",
+        audio=True,
+        audio_filter="aecho=0.8:0.88:60:0.4",
+        dsp="chorus",
+        cost=0.2,
+    ),
+    EffectSpec(
+        "Vibrato / Pitch Bend",
+        "effect_vibrato",
+        audio=True,
+        audio_filter="vibrato=f=6.5",
+        dsp="vibrato",
+        cost=0.2,
+    ),
+    EffectSpec(
+        "High Pitch",
+        "effect_high_pitch",
+        video=True,
+        audio=True,
+        duration=0.5,
+        video_filter="setpts=0.5*PTS",
+        audio_filter="asetrate=44100*2,aresample=44100",
+        cost=0.7,
+    ),
+    EffectSpec(
+        "Low Pitch",
+        "effect_low_pitch",
+        video=True,
+        audio=True,
+        duration=2.0,
+        video_filter="setpts=2*PTS",
+        audio_filter="asetrate=44100*0.5,aresample=44100",
+        cost=1.8,
+    ),
+    EffectSpec(
+        "Dance Mode",
+        "effect_dance",
+        video=True,
+        resizes=True,
+        video_filter="scale=iw*1.1:ih*1.1,eq=contrast=1.2",
+        cost=1.2,
+    ),
+    EffectSpec("Squidward Mode", "effect_squidward", video=True, video_filter="hue=s=0,eq=brightness=0.05", cost=1.0),
+    EffectSpec("Invert Colors", "effect_invert", video=True, video_filter="negate", cost=1.0),
+    EffectSpec("Rainbow Overlay", "effect_rainbow", video=True, video_filter="hue=H=2*PI*t", cost=1.1),
+    EffectSpec("Flip / Mirror", "effect_flip", video=True, video_filter="hflip", cost=1.0),
+    EffectSpec("Mirror Mode", "effect_mirror", video=True, resizes=True, video_filter=MIRROR_VIDEO, cost=2.0),
+    EffectSpec(
+        "Sus Effect",
+        "effect_sus",
+        audio=True,
+        duration=1 / (1.15 * 0.9),
+        audio_filter="asetrate=44100*1.15,atempo=0.9",
+        dsp="sus",
+        cost=0.2,
+    ),
+    EffectSpec(
+        "Stutter Loop",
+        "effect_stutter_loop",
+        video=True,
+        audio=True,
+        duration=None,
+        video_filter="tpad=stop_mode=clone:stop_duration=0.1",
+        audio_filter="aloop=loop=3:size=4410",
+        cost=1.2,
+    ),
+    EffectSpec(
+        "Loop Frames",
+        "effect_loop_frames",
+        video=True,
+        duration=None,
+        video_filter="loop=loop=2:size=30:start=0",
+        cost=1.3,
+    ),
+    EffectSpec("Shuffle Frames", "effect_shuffle_frames", video=True, video_filter="shuffleframes=0:1:2:3", cost=1.0),
+    EffectSpec(
+        "Audio Crust",
+        "effect_audio_crust",
+        audio=True,
+        audio_filter="volume=8,highpass=f=200,lowpass=f=3000",
+        dsp="crust",
+        cost=0.2,
+    ),
+    EffectSpec(
+        "Image Overlay (resources/images)",
+        "effect_overlay_image",
+        video=True,
+        assets=(("images", IMAGE_PATTERNS),),
+        video_filter=OVERLAY_VIDEO,
+        cost=1.2,
+    ),
+    EffectSpec(
+        "Meme Overlay (resources/memes)",
+        "effect_overlay_meme",
+        video=True,
+        assets=(("memes", IMAGE_PATTERNS),),
+        video_filter=OVERLAY_VIDEO,
+        cost=1.2,
+    ),
+    EffectSpec(
+        "Meme Sound (resources/meme_sounds)",
+        "effect_meme_sound",
+        audio=True,
+        duration=None,
+        assets=(("meme_sounds", SOUND_PATTERNS),),
+        audio_filter=OVERLAY_AUDIO,
+        shortest=True,
+        dsp="mix",
+        cost=0.3,
+    ),
+    EffectSpec(
+        "Resource Sound Mix (resources/sounds)",
+        "effect_resource_sound",
+        audio=True,
+        duration=None,
+        assets=(("sounds", SOUND_PATTERNS),),
+        audio_filter=OVERLAY_AUDIO,
+        shortest=True,
+        dsp="mix",
+        cost=0.3,
+    ),
+    EffectSpec(
+        "Overlay Video (resources/overlay_videos)",
+        "effect_overlay_video",
+        video=True,
+        duration=None,
+        assets=(("overlay_videos", VIDEO_PATTERNS),),
+        video_filter=OVERLAY_VIDEO,
+        cost=1.6,
+    ),
+    EffectSpec(
+        "Advert Overlay (resources/adverts)",
+        "effect_advert_overlay",
+        video=True,
+        duration=None,
+        assets=(("adverts", VIDEO_PATTERNS),),
+        video_filter=OVERLAY_VIDEO,
+        cost=1.6,
+    ),
+    EffectSpec(
+        "Error/Glitch Overlay (resources/errors)",
+        "effect_error_overlay",
+        video=True,
+        duration=None,
+        assets=(("errors", MIXED_PATTERNS),),
+        video_filter=OVERLAY_VIDEO,
+        cost=1.4,
+    ),
+    EffectSpec(
+        "Spadinner Overlay (resources/spadinner)",
+        "effect_spadinner_overlay",
+        video=True,
+        duration=None,
+        assets=(("spadinner", MIXED_PATTERNS),),
+        video_filter=OVERLAY_VIDEO,
+        cost=1.4,
+    ),
+    EffectSpec(
+        "Spadinner Sound (resources/spadinner_sounds)",
+        "effect_spadinner_sound",
+        audio=True,
+        duration=None,
+        assets=(("spadinner_sounds", SOUND_PATTERNS),),
+        audio_filter=OVERLAY_AUDIO,
+        shortest=True,
+        dsp="mix",
+        cost=0.3,
+    ),
+    EffectSpec(
+        "YTP Generated Chaos (small export)",
+        "effect_chaos_small_export",
+        video=True,
+        audio=True,
+        duration=None,
+        resizes=True,
+        video_filter="fps=20,scale=iw*0.6:ih*0.6,eq=contrast=1.4:saturation=1.6,noise=alls=20:allf=t",
+        audio_filter="aecho=0.8:0.9:60:0.4,asetrate=44100*1.05,atempo=0.95,volume=1.4",
+        shortest=True,
+        cost=1.1,
+    ),
+)
+
+
+def effect_names():
+    return [spec.name for spec in EFFECTS]
+
+
+def effect_index(name):
+    """Index of the effect called ``name``, or of its handler method name."""
+    for index, spec in enumerate(EFFECTS):
+        if name in (spec.name, spec.handler):
+            return index
+    raise KeyError(f"Unknown effect: {name}")
+
+
+def chain_cost(steps):
+    """Estimated render time of a chain, in the units of ``EffectSpec.cost``.
+
+    Each step is weighted by the clip length it sees, so a step after a slow
+    down counts double; effects whose duration change is unknown count as 1.
+    """
+    total, length = 0.0, 1.0
+    for effect, _ in steps:
+        spec = EFFECTS[effect]
+        total += spec.cost * length
+        length *= spec.duration or 1.0
+    return total
+
+
+def order_steps(steps):
+    """Reorder a chain so its audio-only steps sit next to each other.
+
+    A video-only step moves ahead of the audio-only steps directly before it
+    when neither changes duration; they rewrite different streams, so the
+    clip comes out the same, but the audio-only steps now form one run that
+    the audio engine can render in a single pass with the video copied.
+    Every other step keeps its place.
+    """
+    ordered = []
+    for effect, assets in steps:
+        spec = EFFECTS[effect]
+        position = len(ordered)
+        if spec.video_only and spec.keeps_duration:
+            while position and EFFECTS[ordered[position - 1][0]].audio_only:
+                if not EFFECTS[ordered[position - 1][0]].keeps_duration:
+                    break
+                position -= 1
+        ordered.insert(position, (effect, assets))
+    return ordered
@@ -1,48 +1,90 @@
 import random
-import subprocess
 from pathlib import Path
 
+IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.webp", "*.gif"]
+SOUND_PATTERNS = ["*.mp3", "*.wav", "*.ogg"]
+VIDEO_PATTERNS = ["*.mp4", "*.webm", "*.mov", "*.mkv"]
+MIXED_PATTERNS = VIDEO_PATTERNS + ["*.png", "*.jpg"]
+STILL_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+
 
 class EffectsFactory:
     def __init__(self, tool_box):
         self.tool_box = tool_box
 
-    def pick_sound(self):
-        files = list(Path(self.tool_box.getSOUNDS()).glob("*.mp3"))
-        return str(random.choice(files))
+    def pick_sound(self, rng=None):
+        files = self.tool_box.asset_catalog.files(self.tool_box.getSOUNDS(), ["*.mp3"])
+        return str((rng or random).choice(files))
 
-    def pick_source(self):
-        files = list(Path(self.tool_box.getSOURCES()).glob("*.mp4"))
-        return str(random.choice(files))
+    def pick_source(self, rng=None):
+        files = self.tool_box.asset_catalog.files(self.tool_box.getSOURCES(), ["*.mp4"])
+        return str((rng or random).choice(files))
 
-    def pick_music(self):
-        files = list(Path(self.tool_box.getMUSIC()).glob("*.mp3"))
-        return str(random.choice(files))
+    def pick_music(self, rng=None):
+        files = self.tool_box.asset_catalog.files(self.tool_box.getMUSIC(), ["*.mp3"])
+        return str((rng or random).choice(files))
 
-    def pick_resource_file(self, folder_name, patterns):
-        base = Path(self.tool_box.get_resource_subdir(folder_name))
-        files = []
-        for pattern in patterns:
-            files.extend(base.glob(pattern))
+    def pick_resource_file(self, folder_name, patterns, rng=None):
+        base = self.tool_box.get_resource_subdir(folder_name)
+        files = self.tool_box.asset_catalog.files(base, patterns)
         if not files:
             raise FileNotFoundError(f"No matching assets found in resources/{folder_name}")
-        return str(random.choice(files))
+        return str((rng or random).choice(files))
+
+    def asset_files(self, need):
+        """The files matching ``need`` and a check that passes over sounds without an audio stream."""
+        folder, patterns = need
+        catalog = self.tool_box.asset_catalog
+        base = self.tool_box.getSOUNDS() if folder is None else self.tool_box.get_resource_subdir(folder)
+        sounds = set(catalog.files_of_type(base, "audio")) if catalog.probe_cache is not None else set()
+
+        def usable(file_path):
+            if file_path not in sounds:
+                return True
+            info = catalog.info(file_path)
+            return info is not None and info.has_audio
+
+        return catalog.files(base, patterns), usable
+
+    def pick_asset(self, need, rng=None):
+        rng = rng or random
+        files, usable = self.asset_files(need)
+        files = list(files)
+        while files:
+            file_path = rng.choice(files)
+            if usable(file_path):
+                return str(file_path)
+            files.remove(file_path)
+        raise FileNotFoundError(f"No usable assets found for {need[0] or 'sounds'}")
+
+    def has_asset(self, need):
+        files, usable = self.asset_files(need)
+        return any(usable(file_path) for file_path in files)
 
     def run_ffmpeg(self, *args):
-        subprocess.run(["ffmpeg", *args, "-v", "warning", "-nostdin", "-y"], check=True)
+        self.tool_box.run_ffmpeg("-v", "warning", *args)
+
+    def filter_video(self, video, video_filter=None, audio_filter=None):
+        temp = Path(self.tool_box.getTempVideoName(video))
+        Path(video).rename(temp)
+        try:
+            self.tool_box.filter_video(str(temp), str(video), video_filter, audio_filter)
+        finally:
+            temp.unlink(missing_ok=True)
 
     def run_magick(self, *args):
-        subprocess.run(["magick", *args], check=True)
+        self.tool_box.cancel_token.run(["magick", *args])
 
-    def effect_random_sound(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
+    def effect_random_sound(self, video, sound=None):
+        sound = sound or self.pick_sound()
+        temp = Path(self.tool_box.getTempVideoName(video))
         Path(video).rename(temp)
         try:
             self.run_ffmpeg(
                 "-i",
                 str(temp),
                 "-i",
-                self.pick_sound(),
+                sound,
                 "-filter_complex",
                 "[0:a]channelsplit=channel_layout=stereo[a1][a2];"
                 "[1:a]volume=1,apad,channelsplit=channel_layout=stereo[a3][a4];"
@@ -54,20 +96,23 @@ class EffectsFactory:
                 "-map",
                 "[out]",
                 "-shortest",
+                "-c:v",
+                "copy",
                 str(video),
             )
         finally:
             temp.unlink(missing_ok=True)
 
-    def effect_random_sound_mute(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
+    def effect_random_sound_mute(self, video, sound=None):
+        sound = sound or self.pick_sound()
+        temp = Path(self.tool_box.getTempVideoName(video))
         Path(video).rename(temp)
         try:
             self.run_ffmpeg(
                 "-i",
                 str(temp),
                 "-i",
-                self.pick_sound(),
+                sound,
                 "-filter_complex",
                 "[1:a]volume=1,apad[aud]",
                 "-map",
@@ -75,137 +120,51 @@ class EffectsFactory:
                 "-map",
                 "[aud]",
                 "-shortest",
+                "-c:v",
+                "copy",
                 str(video),
             )
         finally:
             temp.unlink(missing_ok=True)
 
     def effect_reverse(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "reverse", "-af", "areverse", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="reverse", audio_filter="areverse")
 
     def effect_speed_up(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-filter:v", "setpts=0.5*PTS", "-filter:a", "atempo=2.0", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="setpts=0.5*PTS", audio_filter="atempo=2.0")
 
     def effect_slow_down(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-filter:v", "setpts=2*PTS", "-filter:a", "atempo=0.5", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="setpts=2*PTS", audio_filter="atempo=0.5")
 
     def effect_chorus(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg(
-                "-i",
-                str(temp),
-                "-af",
-                "aecho=0.8:0.88:60:0.4",
-                str(video),
-            )
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, audio_filter="aecho=0.8:0.88:60:0.4")
 
     def effect_vibrato(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg(
-                "-i",
-                str(temp),
-                "-af",
-                "vibrato=f=6.5",
-                str(video),
-            )
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, audio_filter="vibrato=f=6.5")
 
     def effect_low_pitch(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg(
-                "-i",
-                str(temp),
-                "-filter:v",
-                "setpts=2*PTS",
-                "-af",
-                "asetrate=44100*0.5,aresample=44100",
-                str(video),
-            )
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="setpts=2*PTS", audio_filter="asetrate=44100*0.5,aresample=44100")
 
     def effect_high_pitch(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg(
-                "-i",
-                str(temp),
-                "-filter:v",
-                "setpts=0.5*PTS",
-                "-af",
-                "asetrate=44100*2,aresample=44100",
-                str(video),
-            )
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="setpts=0.5*PTS", audio_filter="asetrate=44100*2,aresample=44100")
 
     def effect_dance(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "scale=iw*1.1:ih*1.1,eq=contrast=1.2", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="scale=iw*1.1:ih*1.1,eq=contrast=1.2")
 
     def effect_squidward(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "hue=s=0,eq=brightness=0.05", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="hue=s=0,eq=brightness=0.05")
 
     def effect_invert(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "negate", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="negate")
 
     def effect_rainbow(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "hue=H=2*PI*t", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="hue=H=2*PI*t")
 
     def effect_flip(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "hflip", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="hflip")
 
     def effect_mirror(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
+        temp = Path(self.tool_box.getTempVideoName(video))
         Path(video).rename(temp)
         try:
             self.run_ffmpeg(
@@ -213,27 +172,18 @@ class EffectsFactory:
                 str(temp),
                 "-vf",
                 "split[left][right];[left]hflip[left];[left][right]hstack",
+                "-c:a",
+                "copy",
                 str(video),
             )
         finally:
             temp.unlink(missing_ok=True)
 
     def effect_sus(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg(
-                "-i",
-                str(temp),
-                "-af",
-                "asetrate=44100*1.15,atempo=0.9",
-                str(video),
-            )
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, audio_filter="asetrate=44100*1.15,atempo=0.9")
 
     def effect_stutter_loop(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
+        temp = Path(self.tool_box.getTempVideoName(video))
         Path(video).rename(temp)
         try:
             self.run_ffmpeg(
@@ -252,73 +202,52 @@ class EffectsFactory:
             temp.unlink(missing_ok=True)
 
     def effect_loop_frames(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "loop=loop=2:size=30:start=0", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="loop=loop=2:size=30:start=0")
 
     def effect_shuffle_frames(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg("-i", str(temp), "-vf", "shuffleframes=0:1:2:3", str(video))
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, video_filter="shuffleframes=0:1:2:3")
 
     def effect_audio_crust(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
-        Path(video).rename(temp)
-        try:
-            self.run_ffmpeg(
-                "-i",
-                str(temp),
-                "-af",
-                "volume=8,highpass=f=200,lowpass=f=3000",
-                str(video),
-            )
-        finally:
-            temp.unlink(missing_ok=True)
+        self.filter_video(video, audio_filter="volume=8,highpass=f=200,lowpass=f=3000")
 
-    def effect_overlay_image(self, video):
-        overlay = self.pick_resource_file("images", ["*.png", "*.jpg", "*.jpeg", "*.webp", "*.gif"])
+    def effect_overlay_image(self, video, overlay=None):
+        overlay = overlay or self.pick_resource_file("images", IMAGE_PATTERNS)
         self._overlay_visual(video, overlay, loop=True)
 
-    def effect_overlay_meme(self, video):
-        overlay = self.pick_resource_file("memes", ["*.png", "*.jpg", "*.jpeg", "*.webp", "*.gif"])
+    def effect_overlay_meme(self, video, overlay=None):
+        overlay = overlay or self.pick_resource_file("memes", IMAGE_PATTERNS)
         self._overlay_visual(video, overlay, loop=True)
 
-    def effect_meme_sound(self, video):
-        sound = self.pick_resource_file("meme_sounds", ["*.mp3", "*.wav", "*.ogg"])
+    def effect_meme_sound(self, video, sound=None):
+        sound = sound or self.pick_resource_file("meme_sounds", SOUND_PATTERNS)
         self._overlay_audio(video, sound)
 
-    def effect_resource_sound(self, video):
-        sound = self.pick_resource_file("sounds", ["*.mp3", "*.wav", "*.ogg"])
+    def effect_resource_sound(self, video, sound=None):
+        sound = sound or self.pick_resource_file("sounds", SOUND_PATTERNS)
         self._overlay_audio(video, sound)
 
-    def effect_overlay_video(self, video):
-        overlay = self.pick_resource_file("overlay_videos", ["*.mp4", "*.webm", "*.mov", "*.mkv"])
+    def effect_overlay_video(self, video, overlay=None):
+        overlay = overlay or self.pick_resource_file("overlay_videos", VIDEO_PATTERNS)
         self._overlay_visual(video, overlay, loop=False)
 
-    def effect_advert_overlay(self, video):
-        overlay = self.pick_resource_file("adverts", ["*.mp4", "*.webm", "*.mov", "*.mkv"])
+    def effect_advert_overlay(self, video, overlay=None):
+        overlay = overlay or self.pick_resource_file("adverts", VIDEO_PATTERNS)
         self._overlay_visual(video, overlay, loop=False)
 
-    def effect_error_overlay(self, video):
-        overlay = self.pick_resource_file("errors", ["*.mp4", "*.webm", "*.mov", "*.mkv", "*.png", "*.jpg"])
-        self._overlay_visual(video, overlay, loop=overlay.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".gif")))
+    def effect_error_overlay(self, video, overlay=None):
+        overlay = overlay or self.pick_resource_file("errors", MIXED_PATTERNS)
+        self._overlay_visual(video, overlay, loop=overlay.lower().endswith(STILL_EXTENSIONS))
 
-    def effect_spadinner_overlay(self, video):
-        overlay = self.pick_resource_file("spadinner", ["*.mp4", "*.webm", "*.mov", "*.mkv", "*.png", "*.jpg"])
-        self._overlay_visual(video, overlay, loop=overlay.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".gif")))
+    def effect_spadinner_overlay(self, video, overlay=None):
+        overlay = overlay or self.pick_resource_file("spadinner", MIXED_PATTERNS)
+        self._overlay_visual(video, overlay, loop=overlay.lower().endswith(STILL_EXTENSIONS))
 
-    def effect_spadinner_sound(self, video):
-        sound = self.pick_resource_file("spadinner_sounds", ["*.mp3", "*.wav", "*.ogg"])
+    def effect_spadinner_sound(self, video, sound=None):
+        sound = sound or self.pick_resource_file("spadinner_sounds", SOUND_PATTERNS)
         self._overlay_audio(video, sound)
 
     def effect_chaos_small_export(self, video):
-        temp = Path(self.tool_box.getTempVideoName())
+        temp = Path(self.tool_box.getTempVideoName(video))
         Path(video).rename(temp)
         try:
             self.run_ffmpeg(
@@ -338,26 +267,33 @@ class EffectsFactory:
             temp.unlink(missing_ok=True)
 
     def _overlay_visual(self, video, overlay, loop):
-        temp = Path(self.tool_box.getTempVideoName())
+        temp = Path(self.tool_box.getTempVideoName(video))
         Path(video).rename(temp)
         try:
             input_args = ["-i", str(temp), "-i", overlay]
             if loop:
                 input_args = ["-i", str(temp), "-loop", "1", "-i", overlay]
+            scaled = self.tool_box.scaled_overlay(overlay)
+            if scaled is not None:
+                input_args[-1] = scaled
+                filter_graph = "[0:v][1:v]overlay=W-w-20:H-h-20:shortest=1"
+            else:
+                filter_graph = "[1:v]scale=iw*0.3:ih*0.3[ov];[0:v][ov]overlay=W-w-20:H-h-20:shortest=1"
             self.run_ffmpeg(
                 *input_args,
                 "-filter_complex",
-                "[1:v]scale=iw*0.3:ih*0.3[ov];"
-                "[0:v][ov]overlay=W-w-20:H-h-20:shortest=1",
+                filter_graph,
                 "-map",
                 "0:a?",
+                "-c:a",
+                "copy",
                 str(video),
             )
         finally:
             temp.unlink(missing_ok=True)
 
     def _overlay_audio(self, video, sound):
-        temp = Path(self.tool_box.getTempVideoName())
+        temp = Path(self.tool_box.getTempVideoName(video))
         Path(video).rename(temp)
         try:
             self.run_ffmpeg(
@@ -372,6 +308,8 @@ class EffectsFactory:
                 "-map",
                 "[aout]",
                 "-shortest",
+                "-c:v",
+                "copy",
                 str(video),
             )
         finally:
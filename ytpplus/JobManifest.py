@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+CLIP_LOG_NAME = "clips.jsonl"
+
+
+class JobManifest:
+    """Settings, seed and per-clip state of one job, kept in its job folder.
+
+    ``manifest.json`` holds what the job was started with and is written once;
+    ``clips.jsonl`` is an append-only log of ``plan``/``done`` records flushed
+    as each clip is planned and finished. Replaying the log gives the plan of
+    every clip that was started and the set of clips whose file is complete,
+    so a resumed job renders only what is missing.
+    """
+
+    def __init__(self, job_dir, header):
+        self.job_dir = Path(job_dir)
+        self.header = header
+        self.lock = threading.Lock()
+        self.plans = {}
+        self.completed = set()
+        self.log = None
+
+    @classmethod
+    def create(cls, job_dir, header):
+        manifest = cls(job_dir, dict(header, created=time.time()))
+        path = manifest.job_dir / MANIFEST_NAME
+        partial = path.with_suffix(".partial")
+        with open(partial, "w", encoding="utf-8") as file_handle:
+            json.dump(manifest.header, file_handle, indent=2)
+        os.replace(partial, path)
+        (manifest.job_dir / CLIP_LOG_NAME).unlink(missing_ok=True)
+        return manifest
+
+    @classmethod
+    def load(cls, job_dir):
+        job_dir = Path(job_dir)
+        path = job_dir / MANIFEST_NAME
+        if not path.exists():
+            raise FileNotFoundError(f"No job manifest in {job_dir}")
+        with open(path, encoding="utf-8") as file_handle:
+            manifest = cls(job_dir, json.load(file_handle))
+
+        log_path = job_dir / CLIP_LOG_NAME
+        if log_path.exists():
+            with open(log_path, encoding="utf-8") as file_handle:
+                for line in file_handle:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    manifest._replay(record)
+        return manifest
+
+    def _replay(self, record):
+        index = record["index"]
+        if record["event"] == "plan":
+            self.plans[index] = record["plan"]
+            self.completed.discard(index)
+        elif record["event"] == "done":
+            self.completed.add(index)
+
+    def is_complete(self, index, clip_path):
+        return index in self.completed and os.path.exists(clip_path)
+
+    def record_plan(self, index, plan):
+        self._append({"event": "plan", "index": index, "plan": plan})
+
+    def record_done(self, index):
+        self._append({"event": "done", "index": index})
+
+    def _append(self, record):
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            self._replay(record)
+            if self.log is None:
+                self.log = open(self.job_dir / CLIP_LOG_NAME, "a", encoding="utf-8")
+            self.log.write(line)
+            self.log.flush()
+
+    def close(self):
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
@@ -0,0 +1,40 @@
+from bisect import bisect_left
+
+from ytpplus.TimeIndex import TimeIndex
+
+
+class KeyframeIndex(TimeIndex):
+    """Keyframe timestamps per source from a packet scan that reads no frame data."""
+
+    suffix = ".kf"
+    label = "keyframe"
+
+    def build(self, tool_box, source, option, log):
+        lines = self.capture(
+            tool_box,
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "packet=pts_time,flags",
+                "-of",
+                "csv=p=0",
+                source,
+            ],
+            source,
+            log,
+        )
+        times = []
+        for line in lines:
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                times.append(float(pts_time))
+        return times
+
+    def next_keyframe(self, tool_box, source, time):
+        keyframes = self.get(tool_box, source)
+        pos = bisect_left(keyframes, time - 1e-6)
+        return keyframes[pos] if pos < len(keyframes) else None
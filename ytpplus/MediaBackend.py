@@ -0,0 +1,372 @@
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from fractions import Fraction
+
+from ytpplus.Cancellation import JobCancelled
+from ytpplus.ProbeCache import MediaInfo, ffprobe
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class MediaBackend(ABC):
+    """The media operations ToolBox and EffectsFactory can run without ffmpeg's CLI.
+
+    ``probe`` returns a MediaInfo, ``snip`` stream-copies ``[start, end)`` of a
+    source like ``ffmpeg -ss -t -c copy`` and ``filter`` re-encodes a clip
+    through a linear video and/or audio filter chain, copying whichever
+    stream has no chain. Everything else (multi input graphs, concat, smart
+    snips, timeline chunks) stays on ffmpeg.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def probe(self, path):
+        pass
+
+    @abstractmethod
+    def snip(self, source, start, end, dest):
+        pass
+
+    @abstractmethod
+    def filter(self, source, dest, video_filter=None, audio_filter=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class SubprocessBackend(MediaBackend):
+    name = "subprocess"
+
+    def __init__(self, tool_box):
+        self.tool_box = tool_box
+
+    def probe(self, path):
+        return ffprobe(path)
+
+    def snip(self, source, start, end, dest):
+        duration = max(0.01, end - start)
+        self.tool_box.run_ffmpeg(
+            "-ss",
+            str(start),
+            "-t",
+            str(duration),
+            "-i",
+            source,
+            "-c",
+            "copy",
+            dest,
+            stage="snip",
+        )
+
+    def filter(self, source, dest, video_filter=None, audio_filter=None):
+        args = ["-v", "warning", "-i", source]
+        if video_filter:
+            args += ["-vf", video_filter]
+        else:
+            args += ["-c:v", "copy"]
+        if audio_filter:
+            args += ["-af", audio_filter]
+        else:
+            args += ["-c:a", "copy"]
+        self.tool_box.run_ffmpeg(*args, dest, stage="filter")
+
+
+def parse_chain(chain):
+    """``"a=x,b=y"`` as ``[("a", "x"), ("b", "y")]``; None for labelled graphs."""
+    if not chain:
+        return []
+    if any(char in chain for char in "[];'\\"):
+        return None
+    steps = []
+    for part in chain.split(","):
+        name, _, args = part.strip().partition("=")
+        steps.append((name, args or None))
+    return steps
+
+
+class PyAVBackend(MediaBackend):
+    """In-process libav through PyAV, falling back to ffmpeg per operation.
+
+    Demuxers for the last ``max_open`` sources stay open between clips, so
+    cutting many snips from one source seeks an already probed container
+    instead of starting a process. Filter chains run in an ``av.filter.Graph``
+    in this process. Anything PyAV cannot do, or that fails, is handed to the
+    subprocess backend.
+    """
+
+    name = "pyav"
+
+    def __init__(self, tool_box, max_open=8):
+        self.tool_box = tool_box
+        self.fallback = SubprocessBackend(tool_box)
+        self.max_open = max_open
+        self.lock = threading.Lock()
+        self.inputs = OrderedDict()
+
+    def _input(self, path):
+        with self.lock:
+            entry = self.inputs.pop(path, None)
+            if entry is None:
+                entry = (av.open(path), threading.Lock())
+            self.inputs[path] = entry
+            while len(self.inputs) > self.max_open:
+                _, (container, container_lock) = self.inputs.popitem(last=False)
+                with container_lock:
+                    container.close()
+        return entry
+
+    def close(self):
+        with self.lock:
+            for container, container_lock in self.inputs.values():
+                with container_lock:
+                    container.close()
+            self.inputs.clear()
+
+    def probe(self, path):
+        try:
+            with av.open(path) as container:
+                return self._media_info(container)
+        except av.error.FFmpegError:
+            return self.fallback.probe(path)
+
+    def _media_info(self, container):
+        info = MediaInfo()
+        durations = []
+        for stream in container.streams:
+            codec_type = stream.type
+            info.streams.append(codec_type)
+            if stream.duration is not None and stream.time_base is not None:
+                durations.append(float(stream.duration * stream.time_base))
+            if codec_type == "video" and info.video_codec is None:
+                info.video_codec = stream.codec_context.name
+                info.width = stream.codec_context.width
+                info.height = stream.codec_context.height
+                rate = stream.average_rate or stream.base_rate
+                info.fps = float(rate) if rate else None
+            elif codec_type == "audio" and info.audio_codec is None:
+                info.audio_codec = stream.codec_context.name
+                info.sample_rate = stream.codec_context.sample_rate or None
+                info.channels = stream.codec_context.channels
+        if container.duration is not None:
+            info.duration = container.duration / av.time_base
+        else:
+            info.duration = max(durations, default=None)
+        return info
+
+    def snip(self, source, start, end, dest):
+        try:
+            container, container_lock = self._input(source)
+            # Wait for the source's demuxer before taking a scheduler slot, so
+            # snips queued on one source do not hold slots other work could use.
+            with container_lock, self.tool_box.scheduler.slot(), self.tool_box.tracer.span("snip", backend=self.name):
+                self._snip(container, start, end, dest)
+        except (JobCancelled, FileNotFoundError):
+            raise
+        except Exception as exc:
+            print(f"YTPGEN PYAV SNIP FAILED ({exc}), using ffmpeg")
+            self.fallback.snip(source, start, end, dest)
+
+    def _snip(self, container, start, end, dest):
+        token = self.tool_box.cancel_token
+        with av.open(dest, "w") as output:
+            streams = [
+                stream for stream in (_first(container.streams.video), _first(container.streams.audio)) if stream
+            ]
+            mapping = {stream.index: _copy_stream(output, stream) for stream in streams}
+            container.seek(int(start * av.time_base), backward=True)
+
+            base = None
+            finished = set()
+            for packet in container.demux(*streams):
+                token.check()
+                if packet.dts is None or packet.stream.index in finished:
+                    continue
+                time = float((packet.pts if packet.pts is not None else packet.dts) * packet.time_base)
+                if time >= end:
+                    finished.add(packet.stream.index)
+                    if len(finished) == len(streams):
+                        break
+                    continue
+                if base is None:
+                    base = time
+                shift = int(base / packet.time_base)
+                if packet.pts is not None:
+                    packet.pts -= shift
+                packet.dts -= shift
+                packet.stream = mapping[packet.stream.index]
+                output.mux(packet)
+
+    def filter(self, source, dest, video_filter=None, audio_filter=None):
+        video_chain = parse_chain(video_filter)
+        audio_chain = parse_chain(audio_filter)
+        if video_chain is None or audio_chain is None:
+            self.fallback.filter(source, dest, video_filter, audio_filter)
+            return
+        try:
+            with self.tool_box.scheduler.slot(), self.tool_box.tracer.span("filter", backend=self.name):
+                self._filter(source, dest, video_chain, audio_chain)
+        except JobCancelled:
+            raise
+        except Exception as exc:
+            print(f"YTPGEN PYAV FILTER FAILED ({exc}), using ffmpeg")
+            self.fallback.filter(source, dest, video_filter, audio_filter)
+
+    def _filter(self, source, dest, video_chain, audio_chain):
+        token = self.tool_box.cancel_token
+        with av.open(source) as container, av.open(dest, "w") as container_out:
+            output = _HeldOutput(container_out)
+            video = _first(container.streams.video)
+            audio = _first(container.streams.audio)
+            streams = [stream for stream in (video, audio) if stream]
+            pipes = {}
+            copied = {}
+            if video is not None and not video_chain:
+                copied[video.index] = _copy_stream(container_out, video)
+            elif video is not None:
+                pipes[video.index] = _VideoPipe(output, video, video_chain, self.tool_box.encoder_options())
+            if audio is not None and not audio_chain:
+                copied[audio.index] = _copy_stream(container_out, audio)
+            elif audio is not None:
+                pipes[audio.index] = _AudioPipe(output, audio, audio_chain)
+
+            output.pipes = list(pipes.values())
+            for packet in container.demux(*streams):
+                token.check()
+                if packet.stream.index in copied:
+                    if packet.dts is not None:
+                        packet.stream = copied[packet.stream.index]
+                        output.mux(packet)
+                    continue
+                for frame in packet.decode():
+                    pipes[packet.stream.index].push(frame)
+            for pipe in pipes.values():
+                pipe.push(None)
+            output.release()
+
+
+class _HeldOutput:
+    """An output container that holds packets back until every filtered stream exists.
+
+    The encoders add their streams on their first filtered frame. Adding a
+    stream after the first mux has written the header crashes libav.
+    """
+
+    def __init__(self, container):
+        self.container = container
+        self.pipes = []
+        self.held = []
+
+    def add_stream(self, *args, **kwargs):
+        return self.container.add_stream(*args, **kwargs)
+
+    def mux(self, packet):
+        if self.held is not None:
+            if any(pipe.stream is None for pipe in self.pipes):
+                self.held.append(packet)
+                return
+            self.release()
+        self.container.mux(packet)
+
+    def release(self):
+        held, self.held = self.held or [], None
+        for packet in held:
+            self.container.mux(packet)
+
+
+def _first(streams):
+    return streams[0] if len(streams) else None
+
+
+def _copy_stream(output, template):
+    # PyAV 14 moved stream-copy setup to add_stream_from_template; older releases take template=.
+    if hasattr(output, "add_stream_from_template"):
+        return output.add_stream_from_template(template)
+    return output.add_stream(template=template)
+
+
+def _graph(source_node, graph, chain, sink):
+    last = source_node
+    for name, args in chain:
+        node = graph.add(name, args)
+        last.link_to(node)
+        last = node
+    sink_node = graph.add(sink)
+    last.link_to(sink_node)
+    graph.configure()
+
+
+class _Pipe:
+    def __init__(self, output):
+        self.output = output
+        self.stream = None
+
+    def push(self, frame):
+        self.graph.push(frame)
+        while True:
+            try:
+                filtered = self.graph.pull()
+            except BlockingIOError:
+                break
+            except EOFError:
+                self.flush()
+                break
+            self.encode(filtered)
+
+    def flush(self):
+        if self.stream is not None:
+            for packet in self.stream.encode(None):
+                self.output.mux(packet)
+
+
+class _VideoPipe(_Pipe):
+    def __init__(self, output, stream, chain, options=None):
+        super().__init__(output)
+        self.options = options or {}
+        self.rate = stream.average_rate or stream.base_rate or Fraction(30)
+        self.graph = av.filter.Graph()
+        _graph(self.graph.add_buffer(template=stream), self.graph, chain, "buffersink")
+
+    def encode(self, frame):
+        if self.stream is None:
+            self.stream = self.output.add_stream("libx264", rate=self.rate, options=self.options)
+            self.stream.width = frame.width // 2 * 2
+            self.stream.height = frame.height // 2 * 2
+            self.stream.pix_fmt = "yuv420p"
+            self.stream.time_base = frame.time_base
+        frame = frame.reformat(width=self.stream.width, height=self.stream.height, format="yuv420p")
+        for packet in self.stream.encode(frame):
+            self.output.mux(packet)
+
+
+class _AudioPipe(_Pipe):
+    def __init__(self, output, stream, chain):
+        super().__init__(output)
+        self.graph = av.filter.Graph()
+        _graph(self.graph.add_abuffer(template=stream), self.graph, chain, "abuffersink")
+        # Rate-changing chains (asetrate) are resampled back to the source's rate, which
+        # for normalized sources is the mezzanine profile's.
+        self.rate = stream.codec_context.sample_rate or 44100
+        self.resampler = av.AudioResampler(format="fltp", layout="stereo", rate=self.rate)
+
+    def encode(self, frame):
+        if self.stream is None:
+            self.stream = self.output.add_stream("aac", rate=self.rate)
+            self.stream.layout = "stereo"
+        frame.pts = None
+        for resampled in self.resampler.resample(frame) or []:
+            for packet in self.stream.encode(resampled):
+                self.output.mux(packet)
+
+
+def create_backend(name, tool_box):
+    if name == "pyav":
+        if av is not None:
+            return PyAVBackend(tool_box)
+        print("YTPGEN BACKEND: PyAV is not installed, using ffmpeg subprocesses")
+    return SubprocessBackend(tool_box)
@@ -0,0 +1,127 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+DRAFT_CRF = 30
+DRAFT_PRESET = "ultrafast"
+
+
+@dataclass
+class MezzanineProfile:
+    width: int = 1280
+    height: int = 720
+    fps: int = 30
+    sample_rate: int = 44100
+    gop: int = 1
+    crf: int = 18
+    preset: str = "veryfast"
+
+    @classmethod
+    def proxy(cls, width=640, height=360, fps=15):
+        """A draft profile: small, low frame rate and encoded with the fastest x264 preset."""
+        return cls(width=width, height=height, fps=fps, crf=DRAFT_CRF, preset=DRAFT_PRESET)
+
+    def tag(self):
+        gop = "intra" if self.gop <= 1 else f"g{self.gop}"
+        return f"{self.width}x{self.height}_{self.fps}fps_{self.sample_rate}hz_{gop}_crf{self.crf}_{self.preset}"
+
+    def video_filter(self):
+        return (
+            f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,"
+            f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={self.fps},format=yuv420p"
+        )
+
+    def audio_filter(self):
+        return f"aformat=sample_fmts=fltp:sample_rates={self.sample_rate}:channel_layouts=stereo"
+
+
+class MezzanineCache:
+    """Sources transcoded once to one uniform format for copy-safe snipping.
+
+    Every mezzanine shares the profile's resolution, fps, pixel format and
+    audio layout, and uses a short GOP (all-intra by default), so ``-ss`` with
+    ``-c copy`` cuts on the requested frame and the final concat can stream
+    copy. Files are named after the source's content hash and the profile, so
+    renamed or re-added sources reuse the same mezzanine. Calls take the
+    calling job's ToolBox, so each transcode runs under that job's cancel
+    token and tracer. A job waiting on another job's transcode that fails
+    or is cancelled transcodes the source itself.
+    """
+
+    def __init__(self, cache_dir, profile=None):
+        self.cache_dir = Path(cache_dir)
+        self.profile = profile or MezzanineProfile()
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def path_for(self, tool_box, source):
+        fingerprint = tool_box.probe_cache.fingerprint(source)
+        return self.cache_dir / f"{fingerprint[:32]}_{self.profile.tag()}.mp4"
+
+    def get(self, tool_box, source):
+        target = self.path_for(tool_box, source)
+        while not target.exists():
+            with self.lock:
+                event = self.pending.get(target)
+                owner = event is None
+                if owner:
+                    event = self.pending[target] = threading.Event()
+            if not owner:
+                event.wait()
+                tool_box.cancel_token.check()
+                continue
+            try:
+                self.transcode(tool_box, source, target)
+            finally:
+                with self.lock:
+                    self.pending.pop(target, None)
+                event.set()
+        return str(target)
+
+    def ingest(self, tool_box, sources):
+        unique = list(dict.fromkeys(sources))
+        with ThreadPoolExecutor(max_workers=tool_box.scheduler.max_processes) as executor:
+            return dict(zip(unique, executor.map(lambda source: self.get(tool_box, source), unique)))
+
+    def transcode(self, tool_box, source, target):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        profile = self.profile
+        partial = target.with_suffix(".partial.mp4")
+        args = ["-v", "warning", "-i", source]
+        if tool_box.probe(source).has_audio:
+            args += ["-map", "0:v:0", "-map", "0:a:0"]
+        else:
+            args += ["-f", "lavfi", "-i", f"anullsrc=channel_layout=stereo:sample_rate={profile.sample_rate}"]
+            args += ["-map", "0:v:0", "-map", "1:a", "-shortest"]
+        args += [
+            "-vf",
+            profile.video_filter(),
+            "-af",
+            profile.audio_filter(),
+            "-c:v",
+            "libx264",
+            "-preset",
+            profile.preset,
+            "-crf",
+            str(profile.crf),
+            "-g",
+            str(max(1, profile.gop)),
+            "-keyint_min",
+            str(max(1, profile.gop)),
+            "-sc_threshold",
+            "0",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "192k",
+            "-movflags",
+            "+faststart",
+            str(partial),
+        ]
+        try:
+            tool_box.run_ffmpeg(*args, stage="ingest")
+            os.replace(partial, target)
+        finally:
+            partial.unlink(missing_ok=True)
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ytpplus.Cancellation import JobCancelled
+from ytpplus.EffectsFactory import STILL_EXTENSIONS
+
+CACHE_VERSION = 1
+OVERLAY_SCALE = 0.3
+
+
+class OverlayCache:
+    """Overlay assets pre-scaled once and stored in a cheap-to-decode format.
+
+    The overlay effects shrink their asset to ``OVERLAY_SCALE`` of its size,
+    capped to the ``target`` frame size when one is given. Stills become a
+    small PNG, GIFs a small GIF and videos a video-only MJPEG file, stored as
+    ``cache_dir/<path hash>_<state hash>.<ext>`` where the state covers the
+    asset's mtime and size, the target and the cache version. A changed asset
+    gets a new entry and its old entries are deleted. Builds start in a
+    thread pool as soon as a plan picks the asset (``prefetch``); ``get``
+    waits for the build and returns None when it failed, in which case the
+    effect scales the original as before. A failed asset is not retried until
+    it changes. Builds run under the cancel token of the job that started
+    them; one cancelled with its job is started again by the next ``get``.
+    """
+
+    def __init__(self, cache_dir, max_workers=4):
+        self.cache_dir = Path(cache_dir)
+        self.lock = threading.Lock()
+        self.builds = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="overlay")
+
+    def key(self, asset, target=None):
+        stat = os.stat(asset)
+        path_hash = hashlib.sha1(os.path.abspath(asset).encode("utf-8")).hexdigest()[:16]
+        state = f"{CACHE_VERSION}:{stat.st_mtime_ns}:{stat.st_size}:{target}"
+        return path_hash, hashlib.sha1(state.encode("utf-8")).hexdigest()[:16]
+
+    def prefetch(self, tool_box, asset, target=None):
+        target = tuple(target) if target else None
+        try:
+            path_hash, state_hash = self.key(asset, target)
+        except FileNotFoundError:
+            return None
+        dest = self.cache_dir / f"{path_hash}_{state_hash}{_cached_suffix(asset)}"
+        with self.lock:
+            future = self.builds.get(dest)
+            if future is None:
+                future = self.executor.submit(self._build, tool_box, asset, dest, path_hash, target)
+                self.builds[dest] = future
+        return future
+
+    def get(self, tool_box, asset, target=None):
+        while True:
+            future = self.prefetch(tool_box, asset, target)
+            if future is None:
+                return None
+            try:
+                path = future.result()
+            except JobCancelled:
+                tool_box.cancel_token.check()
+                continue
+            if path is None or os.path.exists(path):
+                return path
+            with self.lock:
+                self.builds.pop(Path(path), None)
+
+    def _build(self, tool_box, asset, dest, path_hash, target):
+        if dest.exists():
+            return str(dest)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in self.cache_dir.glob(f"{path_hash}_*"):
+            stale.unlink(missing_ok=True)
+        partial = dest.with_name(f"{dest.stem}.partial{dest.suffix}")
+        args = ["-v", "error", "-i", asset, "-vf", scale_filter(target)]
+        if dest.suffix == ".png":
+            args += ["-frames:v", "1", "-update", "1"]
+        elif dest.suffix == ".mkv":
+            args += ["-an", "-c:v", "mjpeg", "-q:v", "3"]
+        try:
+            tool_box.run_ffmpeg(*args, str(partial), stage="overlay_cache")
+            os.replace(partial, dest)
+        except JobCancelled:
+            partial.unlink(missing_ok=True)
+            with self.lock:
+                self.builds.pop(dest, None)
+            raise
+        except subprocess.CalledProcessError as exc:
+            partial.unlink(missing_ok=True)
+            print(f"YTPGEN OVERLAY CACHE FAILED: {asset} ({exc}), scaling it per clip")
+            return None
+        return str(dest)
+
+
+def scale_filter(target=None):
+    width, height = f"iw*{OVERLAY_SCALE}", f"ih*{OVERLAY_SCALE}"
+    if target is not None:
+        width, height = f"min({width}\\,{target[0]})", f"min({height}\\,{target[1]})"
+    return f"scale=w={width}:h={height}:force_original_aspect_ratio=decrease:force_divisible_by=2"
+
+
+def _cached_suffix(asset):
+    suffix = Path(asset).suffix.lower()
+    if suffix == ".gif":
+        return ".gif"
+    if suffix in STILL_EXTENSIONS:
+        return ".png"
+    return ".mkv"
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from fractions import Fraction
+from pathlib import Path
+
+
+@dataclass
+class MediaInfo:
+    duration: float = None
+    streams: list = field(default_factory=list)
+    video_codec: str = None
+    audio_codec: str = None
+    fps: float = None
+    width: int = None
+    height: int = None
+    sample_rate: int = None
+    channels: int = None
+
+    @property
+    def has_audio(self):
+        return "audio" in self.streams
+
+    @property
+    def has_video(self):
+        return "video" in self.streams
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_fps(rate):
+    try:
+        fps = Fraction(rate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return float(fps) if fps > 0 else None
+
+
+def parse_ffprobe(data):
+    info = MediaInfo()
+    durations = []
+    for stream in data.get("streams", []):
+        codec_type = stream.get("codec_type")
+        info.streams.append(codec_type)
+        durations.append(_to_float(stream.get("duration")))
+        if codec_type == "video" and info.video_codec is None:
+            info.video_codec = stream.get("codec_name")
+            info.width = stream.get("width")
+            info.height = stream.get("height")
+            info.fps = _to_fps(stream.get("avg_frame_rate")) or _to_fps(stream.get("r_frame_rate"))
+        elif codec_type == "audio" and info.audio_codec is None:
+            info.audio_codec = stream.get("codec_name")
+            info.sample_rate = int(stream.get("sample_rate") or 0) or None
+            info.channels = stream.get("channels")
+    info.duration = _to_float(data.get("format", {}).get("duration"))
+    if info.duration is None:
+        info.duration = max((d for d in durations if d is not None), default=None)
+    return info
+
+
+def ffprobe(path):
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_streams",
+            "-show_format",
+            "-of",
+            "json",
+            path,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_ffprobe(json.loads(result.stdout or "{}"))
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_handle:
+        for chunk in iter(lambda: file_handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProbeCache:
+    """Media metadata keyed by path, size and mtime.
+
+    Every file is probed once with ``prober`` (``ffprobe`` by default); the
+    results, and the content hash when asked for, live in memory and are
+    persisted to a JSON index so later runs start without probing unchanged
+    files.
+    """
+
+    def __init__(self, index_path, tracer=None, prober=None):
+        self.index_path = Path(index_path)
+        self.tracer = tracer
+        self.prober = prober or ffprobe
+        self.lock = threading.Lock()
+        self.entries = None
+        self.dirty = False
+
+    def get(self, path):
+        return MediaInfo(**self.cached(path, "info", lambda file_path: asdict(self.probe(file_path))))
+
+    def fingerprint(self, path):
+        return self.cached(path, "fingerprint", self._digest)
+
+    def cached(self, path, name, compute):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        with self.lock:
+            self._load()
+            entry = self.entries.get(path)
+            if entry and entry["key"] == key and name in entry:
+                return entry[name]
+
+        value = compute(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if not entry or entry["key"] != key:
+                entry = self.entries[path] = {"key": key}
+            entry[name] = value
+            self.dirty = True
+        return value
+
+    def probe(self, path):
+        with self._span("probe", path=path):
+            return self.prober(path)
+
+    def _digest(self, path):
+        with self._span("fingerprint", path=path):
+            return file_digest(path)
+
+    def _span(self, name, **args):
+        return self.tracer.span(name, **args) if self.tracer else nullcontext()
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = {path: entry for path, entry in self.entries.items() if os.path.exists(path)}
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.index_path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as file_handle:
+                json.dump(entries, file_handle)
+            temp_path.replace(self.index_path)
+            self.entries = entries
+            self.dirty = False
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(self.index_path, encoding="utf-8") as file_handle:
+                self.entries = json.load(file_handle)
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,90 @@
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class ProgressEvent:
+    kind: str
+    stage: str
+    percent: float
+    clips_done: int
+    clips_total: int
+    elapsed: float
+    clips_per_second: float
+    eta: float = None
+    clip: int = None
+    error: str = ""
+
+
+class ProgressTracker:
+    """Thread-safe job progress that fans out ProgressEvent snapshots.
+
+    Workers call ``advance``/``clip_done``/``set_stage`` from any thread; the
+    counters are updated under one lock and each change is delivered to the
+    listeners as an immutable event. Listeners run on the calling thread, so a
+    GUI should hand them a ``queue.put`` and drain the queue on its own loop.
+    """
+
+    def __init__(self, clips_total, listeners=()):
+        self.clips_total = clips_total
+        self.listeners = [listener for listener in listeners if listener]
+        self.lock = threading.Lock()
+        self.fraction = 0.0
+        self.clips_done = 0
+        self.stage = "starting"
+        self.started = time.monotonic()
+
+    def set_stage(self, stage):
+        with self.lock:
+            self.stage = stage
+            event = self._snapshot("stage")
+        self._emit(event)
+
+    def advance(self, fraction, clips=0):
+        with self.lock:
+            self.fraction = min(1.0, self.fraction + fraction)
+            self.clips_done = min(self.clips_total, self.clips_done + clips)
+            event = self._snapshot("progress")
+        self._emit(event)
+
+    def clip_done(self, index, fraction=0.0):
+        with self.lock:
+            self.fraction = min(1.0, self.fraction + fraction)
+            self.clips_done += 1
+            event = self._snapshot("clip", clip=index)
+        self._emit(event)
+
+    def finish(self, error=None):
+        with self.lock:
+            if error is None:
+                self.fraction = 1.0
+                self.stage = "done"
+            event = self._snapshot("error" if error is not None else "done", error=str(error or ""))
+        self._emit(event)
+
+    def snapshot(self):
+        with self.lock:
+            return self._snapshot("progress")
+
+    def _snapshot(self, kind, clip=None, error=""):
+        elapsed = time.monotonic() - self.started
+        eta = None
+        if 0.0 < self.fraction < 1.0:
+            eta = elapsed * (1.0 - self.fraction) / self.fraction
+        return ProgressEvent(
+            kind=kind,
+            stage=self.stage,
+            percent=min(100.0, self.fraction * 100),
+            clips_done=self.clips_done,
+            clips_total=self.clips_total,
+            elapsed=elapsed,
+            clips_per_second=self.clips_done / elapsed if elapsed > 0 else 0.0,
+            eta=eta,
+            clip=clip,
+            error=error,
+        )
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            listener(event)
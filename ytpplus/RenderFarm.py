@@ -0,0 +1,486 @@
+import argparse
+import collections
+import hmac
+import ipaddress
+import json
+import os
+import re
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from ytpplus.Cancellation import JobCancelled
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct(">I")
+CHUNK_SIZE = 1024 * 1024
+HEARTBEAT_INTERVAL = 5.0
+MAX_RESPAWNS = 3
+FINGERPRINT = re.compile(r"[0-9a-f]{64}")
+FILE_SUFFIXES = {
+    ".mp4",
+    ".mkv",
+    ".mov",
+    ".avi",
+    ".wmv",
+    ".webm",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".webp",
+    ".gif",
+    ".mp3",
+    ".wav",
+    ".ogg",
+}
+# Settings that describe the worker's machine rather than the job; a worker keeps its own.
+LOCAL_SETTINGS = (
+    "scratch_dir",
+    "scratch_budget_mb",
+    "trace_file",
+    "cpu_budget",
+    "threads_per_process",
+    "farm_address",
+    "farm_secret",
+    "farm_local_workers",
+)
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    host, _, port = address.rpartition(":")
+    return host or default_host, int(port)
+
+
+def is_loopback(host):
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        return False
+    return all(ipaddress.ip_address(info[4][0].partition("%")[0]).is_loopback for info in infos)
+
+
+def local_file(files_dir, fingerprint, suffix):
+    """Where a worker keeps the file a coordinator calls ``fingerprint``, refusing anything that is not a plain hash."""
+    if not isinstance(fingerprint, str) or not FINGERPRINT.fullmatch(fingerprint):
+        raise ValueError(f"invalid file fingerprint {fingerprint!r}")
+    suffix = suffix.lower() if isinstance(suffix, str) and suffix.lower() in FILE_SUFFIXES else ""
+    files_dir = Path(files_dir).resolve()
+    path = (files_dir / f"{fingerprint[:32]}{suffix}").resolve()
+    if path.parent != files_dir:
+        raise ValueError(f"file {fingerprint!r} resolves outside {files_dir}")
+    return path
+
+
+def send_message(sock, message, path=None):
+    """One length-prefixed JSON message, followed by the bytes of ``path`` if given.
+
+    The file's size goes into the message as ``size`` so the receiver knows
+    how many raw bytes follow the JSON.
+    """
+    if path is not None:
+        message = dict(message, size=os.path.getsize(path))
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+    if path is not None:
+        with open(path, "rb") as file_handle:
+            sock.sendfile(file_handle)
+
+
+def recv_message(sock):
+    (length,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return json.loads(_recv_exactly(sock, length))
+
+
+def recv_file(sock, size, dest):
+    partial = Path(f"{dest}.{threading.get_ident()}.partial")
+    with open(partial, "wb") as file_handle:
+        remaining = size
+        while remaining:
+            chunk = sock.recv(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ConnectionError("connection closed during file transfer")
+            file_handle.write(chunk)
+            remaining -= len(chunk)
+    os.replace(partial, dest)
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+class FarmCoordinator:
+    """Hands a job's clips to render workers over TCP and collects the results.
+
+    Each worker connection takes one clip at a time: the coordinator sends
+    the clip's plan, the worker asks for any source or asset it does not have
+    yet (files are addressed by content fingerprint and cached on the
+    worker), renders the clip exactly as ``render_clips`` would and sends it
+    back. Workers send a heartbeat while rendering; a connection that drops
+    or stays silent for ``task_timeout`` seconds has its clip put back in
+    the queue for another worker. Clips that fail on a worker count against
+    ``max_failed_clips`` like local failures. Local workers that exit are
+    started again, ``MAX_RESPAWNS`` times per worker in all, and the job
+    fails once no worker has been connected or started for ``task_timeout``
+    seconds. Listening on anything but a loopback address needs a
+    ``secret``, since any worker that connects is sent every source.
+    """
+
+    def __init__(self, generator, address, secret="", task_timeout=60.0, local_workers=0):
+        self.generator = generator
+        self.tool_box = generator.toolBox
+        self.address = parse_address(address)
+        if not secret and not is_loopback(self.address[0]):
+            raise ValueError(f"farm_secret is required to listen on {self.address[0]}, which is not a loopback address")
+        self.secret = secret
+        self.task_timeout = task_timeout
+        self.local_workers = local_workers
+        self.condition = threading.Condition()
+        self.pending = collections.deque()
+        self.in_flight = set()
+        self.finished = set()
+        self.server = None
+        self.worker_address = None
+        self.connections = set()
+        self.processes = []
+        self.respawns = 0
+
+    def run(self, indices):
+        token = self.tool_box.cancel_token
+        with self.condition:
+            self.pending.extend(indices)
+            total = len(self.pending)
+        if not total:
+            return
+        self.server = socket.create_server(self.address)
+        host, port = self.server.getsockname()[:2]
+        print(f"YTPGEN FARM: coordinator on {host}:{port}, {total} clips to render")
+        threading.Thread(target=self._accept, name="farm-accept", daemon=True).start()
+        self.worker_address = f"{host}:{port}"
+        self.processes = [self._spawn_local_worker(n) for n in range(self.local_workers)]
+        idle_since = time.monotonic()
+        try:
+            with self.condition:
+                while len(self.finished) < total and not token.cancelled:
+                    self.condition.wait(timeout=0.5)
+                    if self.connections or self._respawn_local_workers():
+                        idle_since = time.monotonic()
+                        continue
+                    if time.monotonic() - idle_since > self.task_timeout:
+                        raise RuntimeError(
+                            f"no farm worker connected for {self.task_timeout:g}s,"
+                            f" {total - len(self.finished)} clips not rendered"
+                        )
+        finally:
+            self._shut_down()
+
+    def worker_command(self, n):
+        base_dir = self.tool_box.temp_root / f"farm_worker_{n}"
+        command = [sys.executable, "-m", "ytpplus.RenderFarm", "worker", self.worker_address]
+        command += ["--base-dir", str(base_dir)]
+        if self.secret:
+            command += ["--secret", self.secret]
+        return command
+
+    def _spawn_local_worker(self, n):
+        return subprocess.Popen(self.worker_command(n), cwd=Path(__file__).resolve().parent.parent)
+
+    def _respawn_local_workers(self):
+        respawned = False
+        for n, process in enumerate(self.processes):
+            if process.poll() is None or self.respawns >= MAX_RESPAWNS * self.local_workers:
+                continue
+            self.respawns += 1
+            print(f"YTPGEN FARM: local worker {n} exited ({process.returncode}), starting it again")
+            self.processes[n] = self._spawn_local_worker(n)
+            respawned = True
+        return respawned
+
+    def _shut_down(self):
+        self.server.close()
+        with self.condition:
+            self.condition.notify_all()
+            if not self.tool_box.cancel_token.cancelled:
+                self.condition.wait_for(lambda: not self.connections, timeout=5.0)
+            connections = list(self.connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, peer = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection, peer), daemon=True).start()
+
+    def _serve(self, connection, peer):
+        name = f"{peer[0]}:{peer[1]}"
+        with self.condition:
+            self.connections.add(connection)
+        index = None
+        try:
+            hello = recv_message(connection)
+            secret = str(hello.get("secret", "")).encode("utf-8")
+            if hello.get("version") != PROTOCOL_VERSION or not hmac.compare_digest(secret, self.secret.encode("utf-8")):
+                send_message(connection, {"type": "bye", "reason": "rejected"})
+                return
+            name = hello.get("name") or name
+            send_message(connection, {"type": "job", "settings": self.generator.settings.to_dict()})
+            print(f"YTPGEN FARM: worker {name} joined")
+            while True:
+                index = self._next_task()
+                if index is None:
+                    send_message(connection, {"type": "bye", "reason": "done"})
+                    return
+                self._run_task(connection, name, index)
+                index = None
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            # Dropped connections and malformed messages both end the connection.
+            print(f"YTPGEN FARM: worker {name} lost ({exc!r})")
+        finally:
+            with self.condition:
+                self.connections.discard(connection)
+                if index is not None and index in self.in_flight:
+                    self.in_flight.discard(index)
+                    self.pending.appendleft(index)
+                    print(f"YTPGEN FARM: clip {index} reassigned")
+                self.condition.notify_all()
+            connection.close()
+
+    def _next_task(self):
+        token = self.tool_box.cancel_token
+        with self.condition:
+            while not token.cancelled:
+                if self.pending:
+                    index = self.pending.popleft()
+                    self.in_flight.add(index)
+                    return index
+                if not self.in_flight:
+                    return None
+                self.condition.wait(timeout=0.5)
+        return None
+
+    def _run_task(self, connection, name, index):
+        generator = self.generator
+        plan = generator.recorded_plan(index)
+        plan.source = generator.resolve_source(plan.source)
+        paths = [plan.source] + [asset for _, assets in plan.steps for asset in assets]
+        fingerprints = {path: self.tool_box.probe_cache.fingerprint(path) for path in paths}
+        files = {fingerprint: path for path, fingerprint in fingerprints.items()}
+        send_message(
+            connection,
+            {
+                "type": "task",
+                "index": index,
+                "plan": plan.to_dict(),
+                "paths": {path: [fingerprint, Path(path).suffix] for path, fingerprint in fingerprints.items()},
+            },
+        )
+
+        connection.settimeout(self.task_timeout)
+        while True:
+            message = recv_message(connection)
+            kind = message["type"]
+            if kind == "need":
+                for fingerprint in message["files"]:
+                    if fingerprint not in files:
+                        raise ValueError(f"worker asked for a file not in clip {index}: {fingerprint!r}")
+                    send_message(connection, {"type": "file", "fingerprint": fingerprint}, path=files[fingerprint])
+            elif kind == "done":
+                clip_path = generator.clip_path(index)
+                recv_file(connection, message["size"], clip_path)
+                self._finish(index, clip_path=clip_path)
+                print(f"YTPGEN CLIP {index} DONE on {name}: {round(generator.doneCount * 100)}% Complete")
+                return
+            elif kind == "failed":
+                self._finish(index, error=RuntimeError(f"{message['error']} (on {name})"))
+                return
+
+    def _finish(self, index, clip_path=None, error=None):
+        generator = self.generator
+        if error is not None:
+            generator.clip_failed(index, error)
+        else:
+            if generator.clipCache is not None:
+                key = generator.clipCache.key(generator.recorded_plan(index), generator.render_options())
+                generator.clipCache.store(key, clip_path)
+            generator.manifest.record_done(index)
+        generator.progress.clip_done(index, 1.0 / (generator.MAX_CLIPS + 1))
+        with self.condition:
+            self.in_flight.discard(index)
+            self.finished.add(index)
+            self.condition.notify_all()
+
+
+class FarmWorker:
+    """One worker connection: renders the clips a coordinator sends until it says bye.
+
+    Sources and assets are fetched on first use and kept under
+    ``temp/farm_files/`` by fingerprint, so a worker serving many clips or
+    jobs from the same sources downloads each file once. The job's settings
+    come from the coordinator, except ``LOCAL_SETTINGS``, which are taken
+    from ``local_settings``.
+    """
+
+    def __init__(self, tool_box, address, secret="", name=None, local_settings=None):
+        self.tool_box = tool_box
+        self.local_settings = local_settings
+        self.address = parse_address(address)
+        self.secret = secret
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self.files_dir = tool_box.temp_root / "farm_files"
+        self.send_lock = threading.Lock()
+        self.generator = None
+
+    def run(self):
+        # Imported here: YTPGenerator imports this module for the coordinator side.
+        from Utilities import YTPSettings
+        from YTPGenerator import ClipPlan, YTPGenerator
+
+        self.plan_class = ClipPlan
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        with socket.create_connection(self.address) as sock:
+            send_message(sock, {"type": "hello", "version": PROTOCOL_VERSION, "name": self.name, "secret": self.secret})
+            message = recv_message(sock)
+            if message["type"] != "job":
+                print(f"YTPGEN FARM WORKER: coordinator refused ({message.get('reason')})")
+                return
+            local = self.local_settings or YTPSettings()
+            settings = replace(
+                YTPSettings.from_dict(message["settings"]),
+                **{name: getattr(local, name) for name in LOCAL_SETTINGS},
+            )
+            self.tool_box.configure_job(settings)
+            self.generator = YTPGenerator.from_settings(self.tool_box, "", settings)
+            self.tool_box.start_job()
+            try:
+                while True:
+                    message = recv_message(sock)
+                    if message["type"] != "task":
+                        return
+                    self._render(sock, message)
+            finally:
+                self.tool_box.probe_cache.save()
+                self.tool_box.backend.close()
+                self.generator.clean_up()
+
+    def _render(self, sock, task):
+        index = task["index"]
+        # Paths in the plan are the coordinator's; each maps to a local copy by fingerprint.
+        try:
+            local = {
+                path: local_file(self.files_dir, fingerprint, suffix)
+                for path, (fingerprint, suffix) in task["paths"].items()
+            }
+        except ValueError as exc:
+            with self.send_lock:
+                send_message(sock, {"type": "failed", "index": index, "error": str(exc)})
+            return
+        missing = {
+            fingerprint: local[path] for path, (fingerprint, _) in task["paths"].items() if not local[path].exists()
+        }
+        if missing:
+            send_message(sock, {"type": "need", "files": list(missing)})
+            for _ in missing:
+                message = recv_message(sock)
+                if message.get("fingerprint") not in missing:
+                    raise ValueError(f"coordinator sent a file that was not asked for: {message.get('fingerprint')!r}")
+                recv_file(sock, message["size"], missing[message["fingerprint"]])
+
+        plan = self.plan_class.from_dict(task["plan"])
+        plan.source = str(local[plan.source])
+        plan.steps = [(effect, tuple(str(local[asset]) for asset in assets)) for effect, assets in plan.steps]
+        if self.generator.mezzanine is not None:
+            # The coordinator sends its mezzanine, which must not be normalized again.
+            self.generator.sourceMap[plan.source] = plan.source
+        clip_path = Path(self.tool_box.scratch_file(f"farm_{index}.mp4"))
+        heartbeat = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(sock, index, heartbeat), daemon=True).start()
+        try:
+            self.generator.render_plan(plan, str(clip_path))
+        except JobCancelled:
+            raise
+        except Exception as exc:
+            heartbeat.set()
+            with self.send_lock:
+                send_message(sock, {"type": "failed", "index": index, "error": str(exc)})
+            clip_path.unlink(missing_ok=True)
+            return
+        heartbeat.set()
+        with self.send_lock:
+            send_message(sock, {"type": "done", "index": index}, path=clip_path)
+        clip_path.unlink(missing_ok=True)
+
+    def _heartbeat(self, sock, index, stop):
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self.send_lock:
+                    if stop.is_set():
+                        return
+                    send_message(sock, {"type": "working", "index": index})
+            except OSError:
+                self.tool_box.cancel_token.cancel("coordinator lost")
+                return
+
+
+def run_workers(address, base_dir=None, slots=1, secret="", persist=False, retry=2.0):
+    """Serve ``address`` with ``slots`` connections, each on its own ToolBox fork."""
+    from Utilities import ToolBox
+
+    tool_box = ToolBox(base_dir)
+
+    def serve(slot):
+        while True:
+            try:
+                FarmWorker(tool_box.fork(), address, secret, name=f"{socket.gethostname()}-{os.getpid()}-{slot}").run()
+            except (OSError, ValueError, KeyError, JobCancelled) as exc:
+                print(f"YTPGEN FARM WORKER {slot}: {exc!r}")
+            if not persist:
+                return
+            threading.Event().wait(retry)
+
+    threads = [threading.Thread(target=serve, args=(slot,), daemon=True) for slot in range(max(1, slots))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ytpplus.RenderFarm", description="YTP render farm worker.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker = subparsers.add_parser("worker", help="render clips for a coordinator")
+    worker.add_argument("address", help="coordinator HOST:PORT (its farm_address)")
+    worker.add_argument("--base-dir", help="worker folder for temp/ (default: current folder)")
+    worker.add_argument("--slots", type=int, default=1, help="clips rendered at the same time")
+    worker.add_argument("--secret", default=os.environ.get("YTPGEN_FARM_SECRET", ""), help="farm_secret of the job")
+    worker.add_argument("--persist", action="store_true", help="reconnect after each job instead of exiting")
+    args = parser.parse_args(argv)
+    try:
+        run_workers(args.address, args.base_dir, args.slots, args.secret, args.persist)
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
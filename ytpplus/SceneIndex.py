@@ -0,0 +1,38 @@
+from ytpplus.TimeIndex import TimeIndex
+
+DETECT_WIDTH = 160
+
+
+class SceneIndex(TimeIndex):
+    """Scene-cut timestamps per source and ``scdet`` threshold (the index option).
+
+    Detection decodes the first video stream once, downscaled to
+    ``DETECT_WIDTH`` pixels wide. The generator prefetches every source at
+    job start, so detection overlaps ingest and planning, and a source whose
+    detection fails keeps its random starts.
+    """
+
+    suffix = ".sc"
+    label = "scene"
+
+    def build(self, tool_box, source, option, log):
+        command = tool_box.ffmpeg_command(
+            "-v",
+            "error",
+            "-i",
+            source,
+            "-map",
+            "0:v:0",
+            "-vf",
+            f"scale={DETECT_WIDTH}:-2,scdet=threshold={option}:sc_pass=1,"
+            "metadata=mode=print:key=lavfi.scd.time:file=-",
+            "-f",
+            "null",
+            "-",
+        )
+        times = []
+        for line in self.capture(tool_box, command, source, log):
+            name, _, value = line.strip().partition("=")
+            if name == "lavfi.scd.time" and value not in ("", "N/A", "nan"):
+                times.append(float(value))
+        return times
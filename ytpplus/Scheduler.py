@@ -0,0 +1,100 @@
+import math
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+
+def available_memory():
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as file_handle:
+            for line in file_handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class FFmpegScheduler:
+    """Caps concurrent ffmpeg processes and their threads to a core budget.
+
+    ``max_processes * threads_per_process`` never exceeds ``cpu_budget``. The
+    number of processes allowed to start is re-evaluated at most once per
+    ``sample_interval`` and shrinks when the load average is above the core
+    count, when available memory drops below ``min_free_memory`` or when the
+    temp folder has less than ``min_free_disk`` bytes left.
+    """
+
+    def __init__(
+        self,
+        cpu_budget=0,
+        threads_per_process=0,
+        temp_dir=None,
+        min_free_memory=512 * 1024 * 1024,
+        min_free_disk=1024 * 1024 * 1024,
+        sample_interval=1.0,
+    ):
+        self.temp_dir = temp_dir
+        self.min_free_memory = min_free_memory
+        self.min_free_disk = min_free_disk
+        self.sample_interval = sample_interval
+        self.condition = threading.Condition()
+        self.active = 0
+        self.sampled_at = 0.0
+        self.sampled_capacity = 1
+        self.configure(cpu_budget, threads_per_process)
+
+    def configure(self, cpu_budget=0, threads_per_process=0):
+        cores = os.cpu_count() or 1
+        self.cpu_budget = max(1, min(cpu_budget or cores, cores))
+        if not threads_per_process:
+            threads_per_process = 2 if self.cpu_budget >= 8 else 1
+        self.threads_per_process = max(1, min(threads_per_process, self.cpu_budget))
+        self.max_processes = max(1, self.cpu_budget // self.threads_per_process)
+        self.sampled_at = 0.0
+
+    def capacity(self):
+        now = time.monotonic()
+        if now - self.sampled_at < self.sample_interval:
+            return self.sampled_capacity
+
+        capacity = self.max_processes
+        cores = os.cpu_count() or 1
+        if hasattr(os, "getloadavg"):
+            overload = os.getloadavg()[0] - cores
+            if overload > 0:
+                capacity -= math.ceil(overload / self.threads_per_process)
+
+        free_memory = available_memory()
+        if free_memory is not None and free_memory < self.min_free_memory:
+            capacity = 1
+
+        if self.temp_dir is not None and os.path.isdir(self.temp_dir):
+            if shutil.disk_usage(self.temp_dir).free < self.min_free_disk:
+                capacity = 1
+
+        self.sampled_capacity = max(1, capacity)
+        self.sampled_at = now
+        return self.sampled_capacity
+
+    @contextmanager
+    def slot(self):
+        with self.condition:
+            while self.active >= self.capacity():
+                self.condition.wait(timeout=self.sample_interval)
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify()
+
+    def global_args(self, threads=None):
+        threads = str(threads or self.threads_per_process)
+        return ["-filter_threads", threads, "-filter_complex_threads", threads]
+
+    def output_args(self, threads=None):
+        return ["-threads", str(threads or self.threads_per_process)]
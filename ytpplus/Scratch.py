@@ -0,0 +1,209 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+# Size charged for each new file until the first sample has seen some files.
+DEFAULT_FILE_ESTIMATE = 1024**2
+# Past this share of the limit every allocation samples the disk instead of trusting the last sample.
+NEAR_LIMIT = 0.8
+
+
+def _dir_size(path):
+    """Total bytes and number of files directly in ``path``."""
+    total = 0
+    files = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                        files += 1
+                except FileNotFoundError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return total, files
+
+
+def _file_size(path):
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+class ScratchBudget:
+    """A byte budget on one scratch root, shared by every ScratchSpace placing files there.
+
+    ToolBox forks running jobs side by side share one budget, so together
+    they stay within ``limit`` instead of each getting all of it. Usage is
+    the sampled size of all their scratch folders plus a charge for every
+    file handed out that has not reached the mean file size on disk yet, so
+    a burst of allocations between two samples cannot all pass the check.
+    A charge ends when its file is that big, when a file seen by an earlier
+    sample is gone, or after ``stale`` seconds. Close to the limit every
+    allocation samples the disk.
+    """
+
+    def __init__(self, root=None, limit=0, sample_interval=0.25, stale=10.0):
+        self.root = Path(root) if root else None
+        self.limit = max(0, limit)
+        self.sample_interval = sample_interval
+        self.stale = stale
+        self.lock = threading.Lock()
+        self.spaces = set()
+        self.charges = {}
+        self.usage = 0
+        self.pending = 0
+        self.estimate = DEFAULT_FILE_ESTIMATE
+        self.sampled_at = 0.0
+
+    def add(self, space):
+        with self.lock:
+            self.spaces.add(space)
+
+    def discard(self, space):
+        with self.lock:
+            self.spaces.discard(space)
+            for path in [path for path in self.charges if path.parent == space.dir]:
+                del self.charges[path]
+
+    def sample(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.sampled_at < self.sample_interval:
+                return self.usage
+            self.sampled_at = now
+            spaces = list(self.spaces)
+        usage = files = 0
+        for space in spaces:
+            size, count = space.measure()
+            usage += size
+            files += count
+        with self.lock:
+            charges = list(self.charges.items())
+            estimate = usage // files if files else self.estimate
+        pending = 0
+        for path, (charged_at, seen) in charges:
+            size = _file_size(path)
+            if (size is None and seen) or (size or 0) >= estimate or now - charged_at > self.stale:
+                with self.lock:
+                    self.charges.pop(path, None)
+                continue
+            if size is not None:
+                with self.lock:
+                    if path in self.charges:
+                        self.charges[path] = (charged_at, True)
+            pending += estimate - (size or 0)
+        with self.lock:
+            self.usage = usage
+            self.estimate = max(1, estimate)
+            self.pending = pending
+        return usage
+
+    def allocate(self, path):
+        """Charge a file about to be written at ``path``; False if it would take the budget past its limit."""
+        with self.lock:
+            near = self.usage + self.pending + self.estimate >= self.limit * NEAR_LIMIT
+        self.sample(force=near)
+        with self.lock:
+            if self.usage + self.pending + self.estimate > self.limit:
+                return False
+            self.charges[path] = (time.monotonic(), False)
+            self.pending += self.estimate
+        return True
+
+
+class ScratchSpace:
+    """Per-job scratch folder on a fast root, spilling to ``temp/`` past a byte budget.
+
+    Intermediates (snips, effect temps, finished clips) are placed under the
+    budget's root (e.g. ``/dev/shm`` or a local NVMe) while the sampled
+    usage of every job sharing that ScratchBudget is below its limit; once
+    it is over, new files spill to the job folder under ``temp/``. With no
+    root configured both are the same folder. Peak usage of both is recorded
+    for the end-of-job report.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or ScratchBudget()
+        self.lock = threading.Lock()
+        self.dir = None
+        self.spill_dir = None
+        self.reset_stats()
+
+    @property
+    def root(self):
+        return self.budget.root
+
+    def configure(self, budget):
+        if budget is not self.budget:
+            self.budget.discard(self)
+            self.budget = budget
+            if self.separate:
+                budget.add(self)
+
+    def reset_stats(self):
+        self.peak = 0
+        self.peak_spill = 0
+        self.spills = 0
+
+    def start(self, spill_dir):
+        self.spill_dir = Path(spill_dir)
+        self.dir = self.root / self.spill_dir.name if self.root else self.spill_dir
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.reset_stats()
+        if self.separate:
+            self.budget.add(self)
+        return self.dir
+
+    @property
+    def separate(self):
+        return self.dir is not None and self.dir != self.spill_dir
+
+    def path(self, name):
+        if not self.separate:
+            return self.dir / name
+        path = self.dir / name
+        if self.budget.limit and not self.budget.allocate(path):
+            with self.lock:
+                self.spills += 1
+            return self.spill_dir / name
+        return path
+
+    def find(self, name):
+        for folder in (self.dir, self.spill_dir):
+            if folder is not None and (folder / name).exists():
+                return folder / name
+        return None
+
+    def measure(self):
+        """Bytes and files in this job's scratch folder, recording its peak and the spill folder's."""
+        usage, files = _dir_size(self.dir)
+        spill = _dir_size(self.spill_dir)[0] if self.separate else 0
+        with self.lock:
+            self.peak = max(self.peak, usage)
+            self.peak_spill = max(self.peak_spill, spill)
+        return usage, files
+
+    def sample(self, force=False):
+        if not self.separate:
+            return self.measure()[0] if self.dir is not None else 0
+        return self.budget.sample(force)
+
+    def report(self):
+        if self.dir is not None:
+            self.measure()
+        line = f"peak {self.peak / 1024**2:.1f} MB in {self.dir}"
+        if self.separate:
+            line += f", peak {self.peak_spill / 1024**2:.1f} MB spilled to {self.spill_dir} ({self.spills} files)"
+        return line
+
+    def remove(self):
+        self.budget.discard(self)
+        if self.separate and self.dir.exists():
+            shutil.rmtree(self.dir)
@@ -0,0 +1,62 @@
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SourceIndex:
+    """Durations of a job's sources and a cumulative table for weighted picks.
+
+    Each usable source contributes the span its clips may start in (its
+    length minus ``max_duration``, the longest clip), so one uniform draw
+    over the summed spans picks a source and a start together, in
+    proportion to footage, by binary search. Sources that cannot be probed
+    or are shorter than ``min_length`` (by default ``max_duration``) are
+    left out and listed in ``excluded``. A source shorter than a clip
+    always starts at 0.
+    """
+
+    def __init__(self, sources, lengths, max_duration, min_length=None):
+        self.max_duration = max_duration
+        min_length = max_duration if min_length is None else min_length
+        self.sources = []
+        self.lengths = array("d")
+        self.cumulative = array("d")
+        self.excluded = []
+        total = 0.0
+        for source, length in zip(sources, lengths):
+            if length is None or length < min_length:
+                self.excluded.append(source)
+                continue
+            total += max(length - max_duration, 0.001)
+            self.sources.append(source)
+            self.lengths.append(length)
+            self.cumulative.append(total)
+
+    @classmethod
+    def build(cls, tool_box, sources, max_duration, min_length=None, workers=None):
+        def length(source):
+            try:
+                return tool_box.probe(source).duration
+            except Exception:
+                return None
+
+        with tool_box.tracer.span("source_index", sources=len(sources)):
+            with ThreadPoolExecutor(max_workers=workers or tool_box.scheduler.max_processes) as executor:
+                lengths = list(executor.map(length, sources))
+        return cls(sources, lengths, max_duration, min_length)
+
+    @property
+    def total(self):
+        return self.cumulative[-1] if self.cumulative else 0.0
+
+    def __len__(self):
+        return len(self.sources)
+
+    def pick(self, rng):
+        """A ``(source, start, length)`` drawn uniformly over all usable footage."""
+        if not self.sources:
+            raise ValueError("No source is long enough for the configured clip duration")
+        point = rng.uniform(0, self.total)
+        i = min(bisect_right(self.cumulative, point), len(self.sources) - 1)
+        start = point - (self.cumulative[i - 1] if i else 0.0)
+        return self.sources[i], min(start, max(0.0, self.lengths[i] - self.max_duration)), self.lengths[i]
@@ -0,0 +1,146 @@
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+
+class StreamingConcat:
+    """Muxes finished clips into the output in order while others still render.
+
+    One long-running ffmpeg reads MPEG-TS from its stdin and stream-copies it
+    into ``output_file``. As soon as the next clip in order is ready it is
+    remuxed to MPEG-TS with its timestamps shifted to follow the previous one,
+    piped into the muxer and deleted, so temp disk holds only the clips that
+    are still waiting for an earlier one. The intro and outro are passed
+    through ``conform`` first, if given, so they match the clips' format.
+    """
+
+    def __init__(self, tool_box, output_file, total, include_intro_outro=True, conform=None):
+        self.tool_box = tool_box
+        self.output_file = output_file
+        self.total = total
+        self.include_intro_outro = include_intro_outro
+        self.conform = conform
+        self.condition = threading.Condition()
+        self.ready = {}
+        self.closing = False
+        self.aborted = False
+        self.offset = 0.0
+        self.error = None
+        self.muxer = None
+        self.feeder = None
+
+    def start(self):
+        command = self.tool_box.ffmpeg_command(
+            "-v",
+            "warning",
+            "-f",
+            "mpegts",
+            "-i",
+            "pipe:0",
+            "-map",
+            "0",
+            "-c",
+            "copy",
+            "-bsf:a",
+            "aac_adtstoasc",
+            self.output_file,
+        )
+        self.muxer = self.tool_box.cancel_token.attach(subprocess.Popen(command, stdin=subprocess.PIPE))
+        self.feeder = threading.Thread(target=self._feed, name="ytp-streaming-concat", daemon=True)
+        self.feeder.start()
+
+    def add(self, index, clip_path):
+        with self.condition:
+            self.ready[index] = clip_path
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.feeder.join()
+        return_code = self.muxer.wait()
+        self.tool_box.cancel_token.detach(self.muxer)
+        self.tool_box.cancel_token.check()
+        if self.error is not None:
+            raise self.error
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, self.muxer.args)
+        if not self.tool_box.has_audio_stream(self.output_file):
+            self.tool_box.add_silent_audio(self.output_file)
+
+    def abort(self):
+        with self.condition:
+            self.closing = True
+            self.aborted = True
+            self.condition.notify_all()
+        self.feeder.join()
+        if self.muxer.poll() is None:
+            self.muxer.terminate()
+        self.muxer.wait()
+        self.tool_box.cancel_token.detach(self.muxer)
+        Path(self.output_file).unlink(missing_ok=True)
+
+    def _feed(self):
+        try:
+            intro, outro = self.tool_box.intro_outro(self.conform) if self.include_intro_outro else (None, None)
+            if intro:
+                self._append(intro, consume=False)
+            for index in range(self.total):
+                with self.condition:
+                    while index not in self.ready and not self.closing:
+                        self.condition.wait()
+                    if self.aborted:
+                        return
+                    clip_path = self.ready.pop(index, None)
+                if clip_path and Path(clip_path).exists():
+                    self._append(clip_path, consume=True)
+            if outro and not self.aborted:
+                self._append(outro, consume=False)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            try:
+                self.muxer.stdin.close()
+            except OSError:
+                pass
+
+    def _append(self, clip_path, consume):
+        info = self.tool_box.probe(clip_path)
+        args = ["-v", "warning", "-i", clip_path]
+        if info.has_audio:
+            args += ["-map", "0:v", "-map", "0:a", "-c", "copy"]
+        else:
+            args += [
+                "-f",
+                "lavfi",
+                "-i",
+                "anullsrc=channel_layout=stereo:sample_rate=44100",
+                "-map",
+                "0:v",
+                "-map",
+                "1:a",
+                "-shortest",
+                "-c:v",
+                "copy",
+                "-c:a",
+                "aac",
+            ]
+        args += ["-output_ts_offset", str(self.offset), "-f", "mpegts", "pipe:1"]
+
+        command = self.tool_box.ffmpeg_command(*args)
+        with self.tool_box.tracer.span("stream_append", cmd=subprocess.list2cmdline(command)):
+            remux = self.tool_box.cancel_token.attach(subprocess.Popen(command, stdout=subprocess.PIPE))
+            try:
+                shutil.copyfileobj(remux.stdout, self.muxer.stdin)
+            finally:
+                remux.stdout.close()
+                return_code = remux.wait()
+                self.tool_box.cancel_token.detach(remux)
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, remux.args)
+
+        self.offset += info.duration or 0.0
+        if consume:
+            Path(clip_path).unlink(missing_ok=True)
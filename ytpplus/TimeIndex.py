@@ -0,0 +1,107 @@
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ytpplus.Cancellation import JobCancelled
+
+
+class TimeIndex(ABC):
+    """Sorted timestamps per source, built once and stored as raw doubles.
+
+    Subclasses scan a source in ``build`` and name their files with
+    ``suffix``. The sorted ``array('d')`` is written to
+    ``index_dir/<content hash>[_<option>]<suffix>``, so later runs load it
+    directly. Builds run in a thread pool, one per source and option
+    however many threads ask for it. ``prefetch`` starts one without
+    waiting and ``get`` waits for it. Every call takes the calling job's
+    ToolBox, whose cancel token and tracer the build runs under. A build
+    cancelled with another job is started again for the next job that
+    needs it. A source whose scan fails has no times for this run and is
+    scanned again next run.
+    """
+
+    suffix = ".idx"
+    label = "index"
+
+    def __init__(self, index_dir, max_workers=4):
+        self.index_dir = Path(index_dir)
+        self.lock = threading.Lock()
+        self.builds = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.label)
+
+    def prefetch(self, tool_box, source, option=None):
+        fingerprint = tool_box.probe_cache.fingerprint(source)
+        key = (fingerprint, option)
+        with self.lock:
+            future = self.builds.get(key)
+            if future is None:
+                future = self.executor.submit(self._load, tool_box, source, fingerprint, option)
+                self.builds[key] = future
+        return future
+
+    def get(self, tool_box, source, option=None):
+        while True:
+            try:
+                return self.prefetch(tool_box, source, option).result()
+            except JobCancelled:
+                # Raise only if this job was cancelled; a build cancelled with another job starts over.
+                tool_box.cancel_token.check()
+
+    def nearest(self, tool_box, source, time, option=None, latest=None):
+        """The stored time closest to ``time`` and no later than ``latest``, or ``time`` if there is none."""
+        times = self.get(tool_box, source, option)
+        hi = len(times) if latest is None else bisect_right(times, latest)
+        if hi == 0:
+            return time
+        pos = bisect_left(times, time, 0, hi)
+        candidates = [times[i] for i in (pos - 1, pos) if 0 <= i < hi]
+        return min(candidates, key=lambda candidate: abs(candidate - time))
+
+    def path(self, fingerprint, option=None):
+        name = fingerprint[:32] if option is None else f"{fingerprint[:32]}_{option:g}"
+        return self.index_dir / f"{name}{self.suffix}"
+
+    def _load(self, tool_box, source, fingerprint, option):
+        path = self.path(fingerprint, option)
+        times = array("d")
+        if path.exists():
+            with open(path, "rb") as file_handle:
+                times.frombytes(file_handle.read())
+            return times
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        log = path.with_suffix(".log")
+        try:
+            times = array("d", sorted(self.build(tool_box, source, option, log)))
+        except JobCancelled:
+            with self.lock:
+                self.builds.pop((fingerprint, option), None)
+            raise
+        except subprocess.CalledProcessError as exc:
+            print(f"YTPGEN {self.label.upper()} INDEX FAILED: {source} ({exc})")
+            return times
+        finally:
+            log.unlink(missing_ok=True)
+
+        partial = path.with_suffix(".partial")
+        with open(partial, "wb") as file_handle:
+            times.tofile(file_handle)
+        partial.replace(path)
+        return times
+
+    @abstractmethod
+    def build(self, tool_box, source, option, log):
+        """The times found in ``source``, in any order; ``log`` is a scratch file for the scan's output."""
+
+    def capture(self, tool_box, command, source, log):
+        """Run ``command`` under the scheduler and the job's cancel token, returning its stdout lines."""
+        tool_box.cancel_token.check()
+        with tool_box.scheduler.slot(), tool_box.tracer.span(f"{self.label}_index", path=source):
+            with open(log, "wb") as file_handle:
+                tool_box.cancel_token.run(command, stdout=file_handle)
+        with open(log, encoding="utf-8", errors="replace") as file_handle:
+            return file_handle.read().splitlines()
@@ -0,0 +1,170 @@
+import os
+from pathlib import Path
+
+# Seconds of decoding a chunk accepts to cut two clips from one input instead of seeking a second input.
+SEEK_GAP = 10.0
+
+
+class TimelineRenderer:
+    """Renders a whole clip plan with one ffmpeg process per chunk.
+
+    Clips from the same stretch of a source share one input, seeked with
+    ``-ss``/``-t`` to that stretch and cut with ``trim``/``atrim``, so a
+    chunk decodes only around its clips rather than every source from the
+    start. Clips more than ``SEEK_GAP`` seconds apart get inputs of their
+    own. The per-clip effect stages come from the EffectCompiler and the
+    conformed segments are joined with the ``concat`` filter. Chunks are
+    split off once a graph passes ``max_segments`` clips or ``max_inputs``
+    inputs and are joined afterwards with the concat demuxer.
+    """
+
+    def __init__(self, tool_box, effect_compiler, max_segments=64, max_inputs=32):
+        self.tool_box = tool_box
+        self.effect_compiler = effect_compiler
+        self.max_segments = max(1, max_segments)
+        self.max_inputs = max(2, max_inputs)
+
+    def render(self, plans, output_file, progress_callback=None):
+        intro, outro = self.tool_box.intro_outro()
+        segments = [(plan.source, plan.start, plan.end, plan.steps) for plan in plans]
+        if intro:
+            segments.insert(0, (intro, None, None, []))
+        if outro:
+            segments.append((outro, None, None, []))
+        if not segments:
+            return
+
+        width, height, fps = self.target_format(segments[0][0])
+        chunks = self.split(segments)
+        if len(chunks) == 1:
+            self.render_chunk(chunks[0], output_file, width, height, fps, "timeline_0")
+            if progress_callback:
+                progress_callback(1.0)
+            return
+
+        chunk_files = []
+        for n, chunk in enumerate(chunks):
+            chunk_file = self.tool_box.scratch_file(f"timeline_{n}.mp4")
+            self.render_chunk(chunk, chunk_file, width, height, fps, f"timeline_{n}")
+            chunk_files.append(chunk_file)
+            if progress_callback:
+                progress_callback(len(chunk) / len(segments))
+        concat_file = self.tool_box.build_concat_file(chunk_files, include_intro_outro=False)
+        self.tool_box.concat_demuxer(output_file, concat_file=concat_file)
+        for chunk_file in chunk_files:
+            os.remove(chunk_file)
+
+    def target_format(self, source):
+        info = self.tool_box.probe(source)
+        width = (info.width or 1280) // 2 * 2
+        height = (info.height or 720) // 2 * 2
+        fps = round(info.fps or 30, 3)
+        return width, height, fps
+
+    def split(self, segments):
+        chunks = []
+        chunk = []
+        assets = 0
+        for segment in segments:
+            extra = self.effect_compiler.compile(segment[3]).input_count
+            needed = len(self.plan_inputs(chunk + [segment])[0]) + assets + extra
+            if chunk and (len(chunk) >= self.max_segments or needed > self.max_inputs):
+                chunks.append(chunk)
+                chunk, assets = [], 0
+            chunk.append(segment)
+            assets += extra
+        chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def plan_inputs(segments):
+        """The ``[source, start, end]`` inputs a chunk opens, and the input index of each segment.
+
+        ``start`` None opens the whole file, as for the intro and outro.
+        """
+        inputs = []
+        assignment = []
+        for source, start, end, _ in segments:
+            for index, window in enumerate(inputs):
+                if window[0] != source:
+                    continue
+                if start is None or window[1] is None:
+                    window[1:] = [None, None]
+                elif start <= window[2] + SEEK_GAP and end >= window[1] - SEEK_GAP:
+                    window[1:] = [min(window[1], start), max(window[2], end)]
+                else:
+                    continue
+                assignment.append(index)
+                break
+            else:
+                assignment.append(len(inputs))
+                inputs.append([source, start, end])
+        return inputs, assignment
+
+    def render_chunk(self, segments, output_file, width, height, fps, name):
+        inputs, assignment = self.plan_inputs(segments)
+        input_args = []
+        for source, start, end in inputs:
+            if start is not None:
+                input_args += ["-ss", str(start), "-t", str(end - start)]
+            input_args += ["-i", source]
+        input_count = len(inputs)
+
+        filters = []
+        concat_inputs = []
+        for n, (source, start, end, steps) in enumerate(segments):
+            info = self.tool_box.probe(source)
+            index = assignment[n]
+            offset = inputs[index][1]
+            if start is None:
+                trim = ""
+            elif offset is None:
+                trim = f"=start={start}:end={end}"
+            else:
+                # Input timestamps start at the input's -ss.
+                trim = f"=start={start - offset}:end={end - offset}"
+            filters.append(f"[{index}:v]trim{trim},setpts=PTS-STARTPTS[c{n}v]")
+            if info.has_audio:
+                filters.append(f"[{index}:a]atrim{trim},asetpts=PTS-STARTPTS[c{n}a]")
+            else:
+                duration = end - start if start is not None else info.duration
+                filters.append(f"aevalsrc=0:c=stereo:s=44100:d={duration}[c{n}a]")
+
+            graph = self.effect_compiler.compile(
+                steps,
+                video=f"c{n}v",
+                audio=f"c{n}a",
+                input_offset=input_count,
+                prefix=f"c{n}fx",
+            )
+            filters.extend(graph.filters)
+            input_args += graph.inputs
+            input_count += graph.input_count
+
+            filters.append(
+                f"[{graph.video}]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p[n{n}v]"
+            )
+            filters.append(
+                f"[{graph.audio}]aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo[n{n}a]"
+            )
+            concat_inputs.append(f"[n{n}v][n{n}a]")
+
+        filters.append(f"{''.join(concat_inputs)}concat=n={len(segments)}:v=1:a=1[outv][outa]")
+
+        script = Path(self.tool_box.get_temp()) / f"{name}.filtergraph"
+        script.write_text(";\n".join(filters), encoding="utf-8")
+        self.tool_box.run_ffmpeg(
+            "-v",
+            "warning",
+            *input_args,
+            "-filter_complex_script",
+            str(script),
+            "-map",
+            "[outv]",
+            "-map",
+            "[outa]",
+            output_file,
+            threads=self.tool_box.scheduler.cpu_budget,
+            stage="timeline_chunk",
+        )
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Timing spans for one job, exported as Chrome trace / Perfetto JSON.
+
+    Spans nest per thread. The clip index set with ``clip()`` is attached to
+    every span opened on that thread, so ffmpeg commands are attributed to the
+    clip and effect that spawned them. A disabled tracer records nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.events = []
+        self.threads = {}
+        self.origin = time.perf_counter_ns()
+
+    def start(self):
+        with self.lock:
+            self.events = []
+            self.threads = {}
+            self.origin = time.perf_counter_ns()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    @contextmanager
+    def clip(self, index):
+        previous = getattr(self.local, "clip", None)
+        self.local.clip = index
+        try:
+            yield
+        finally:
+            self.local.clip = previous
+
+    @contextmanager
+    def span(self, name, **args):
+        if not self.enabled:
+            yield
+            return
+        clip = getattr(self.local, "clip", None)
+        if clip is not None:
+            args.setdefault("clip", clip)
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            ended = time.perf_counter_ns()
+            thread = threading.current_thread()
+            with self.lock:
+                tid = self.threads.setdefault(thread.ident, (len(self.threads) + 1, thread.name))[0]
+                self.events.append(
+                    {
+                        "name": name,
+                        "cat": "ytp",
+                        "ph": "X",
+                        "ts": (started - self.origin) / 1000,
+                        "dur": (ended - started) / 1000,
+                        "pid": os.getpid(),
+                        "tid": tid,
+                        "args": args,
+                    }
+                )
+
+    def export(self, path):
+        with self.lock:
+            events = list(self.events)
+            threads = list(self.threads.values())
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in threads
+        ]
+        with open(path, "w", encoding="utf-8") as file_handle:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, file_handle)
+
+    def summary(self):
+        totals = {}
+        with self.lock:
+            for event in self.events:
+                key = event["name"]
+                if "effect" in event["args"]:
+                    key = f"{key}:{event['args']['effect']}"
+                count, total, longest = totals.get(key, (0, 0.0, 0.0))
+                totals[key] = (count + 1, total + event["dur"], max(longest, event["dur"]))
+
+        lines = [f"{'stage':48} {'count':>7} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for key, (count, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"{key[:48]:48} {count:7d} {total / 1e6:10.3f} {total / count / 1e3:10.2f} {longest / 1e3:10.2f}"
+            )
+        return "\n".join(lines)
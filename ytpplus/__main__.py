@@ -0,0 +1,143 @@
+import argparse
+import signal
+import sys
+from dataclasses import fields
+from pathlib import Path
+
+from Utilities import SETTING_CHOICES, YTPSettings
+from YTPGenerator import generate
+from ytpplus.Cancellation import CancelToken, JobCancelled
+from ytpplus.EffectRegistry import effect_index
+
+VIDEO_EXTENSIONS = (".mp4", ".wmv", ".avi", ".mkv")
+DEFAULT_OUTPUT = "output/ytp_deluxe.mp4"
+
+
+def parse_bool(value):
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise argparse.ArgumentTypeError(f"expected a boolean, got {value!r}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ytpplus",
+        description="Generate a YTP without the Tkinter GUI.",
+    )
+    parser.add_argument("sources", nargs="*", help="source videos or folders of videos")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help=f"output file (default: {DEFAULT_OUTPUT}, or the recorded output with --resume)",
+    )
+    parser.add_argument("-c", "--config", help="settings file (.json or .toml) with YTPSettings fields")
+    parser.add_argument("--base-dir", help="project folder holding sources/, resources/, temp/ (default: cwd)")
+    parser.add_argument(
+        "--mode",
+        choices=["default", "plus", "chaos"],
+        default="default",
+        help="same presets as the Generate YTP / YTP+ / Chaos Small Export buttons",
+    )
+    parser.add_argument(
+        "--effects",
+        help="comma-separated effect numbers or handler names (e.g. effect_invert) to enable; all others are disabled",
+    )
+    parser.add_argument(
+        "--resume",
+        type=int,
+        metavar="JOB_ID",
+        help="finish a failed job from temp/job_<JOB_ID>/ with its recorded settings and clip plans",
+    )
+
+    for item in fields(YTPSettings):
+        if item.name == "effects_enabled":
+            continue
+        kind = type(item.default)
+        choices = SETTING_CHOICES.get(item.name)
+        parser.add_argument(
+            "--" + item.name.replace("_", "-"),
+            dest=item.name,
+            type=parse_bool if kind is bool else kind,
+            choices=choices,
+            default=None,
+            metavar=None if choices else kind.__name__.upper(),
+        )
+    return parser
+
+
+def collect_sources(paths):
+    sources = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            sources.extend(sorted(str(p) for p in path.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS))
+        else:
+            sources.append(str(path))
+    return sources
+
+
+def build_settings(args):
+    settings = YTPSettings.from_file(args.config) if args.config else YTPSettings()
+    for item in fields(YTPSettings):
+        value = getattr(args, item.name, None)
+        if value is not None:
+            setattr(settings, item.name, value)
+
+    if args.effects:
+        enabled = {
+            int(name) if name.strip().isdigit() else effect_index(name.strip())
+            for name in args.effects.split(",")
+            if name.strip()
+        }
+        settings.effects_enabled = [idx in enabled for idx in range(len(settings.effect_names()))]
+
+    if args.mode == "plus":
+        settings.effect_probability = 70
+        settings.max_stack_level = 5
+    elif args.mode == "chaos":
+        settings.effects_enabled = [False] * len(settings.effects_enabled)
+        settings.effects_enabled[effect_index("effect_chaos_small_export")] = True
+    return settings
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sources = collect_sources(args.sources)
+    if not sources and args.resume is None:
+        print("No sources found.", file=sys.stderr)
+        return 1
+
+    settings = build_settings(args)
+    output = args.output
+    if output is None and args.resume is None:
+        output = DEFAULT_OUTPUT
+    token = CancelToken()
+
+    def interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        print("Cancelling (press Ctrl+C again to force quit)...", file=sys.stderr)
+        token.cancel("interrupted")
+
+    signal.signal(signal.SIGINT, interrupt)
+    try:
+        generator = generate(
+            sources,
+            output,
+            settings=settings,
+            base_dir=args.base_dir,
+            cancel_token=token,
+            resume_job=args.resume,
+        )
+    except JobCancelled:
+        print("Generation cancelled.", file=sys.stderr)
+        return 130
+    except Exception as exc:
+        print(f"Generation failed: {exc}", file=sys.stderr)
+        return 1
+    print(f"Wrote {generator.OUTPUT_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())